@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+Configuration of the tests.
+"""
+import sys
+
+
+# The asynchronous API uses `async def`, which cannot even be compiled
+# before Python 3.5
+collect_ignore = []
+if sys.version_info < (3, 5):
+    collect_ignore = [
+        'txlib/http/tests/test_async_requests.py',
+        'txlib/api/tests/test_async_models.py',
+    ]
@@ -20,6 +20,10 @@ setup(
         "requests",
         "six"
     ],
+    extras_require={
+        'async': ['aiohttp'],
+        'json': ['orjson'],
+    },
 
     long_description=open('README.rst').read(),
 
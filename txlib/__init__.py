@@ -3,10 +3,27 @@
 The txlib package.
 """
 
-__version__ = '0.1.0'
+import sys
+
 __author__ = 'Indifex Ltd. <info@indifex.com>'
 __all__ = []
 
-from ._version import get_versions
-__version__ = get_versions()['version']
-del get_versions
+
+def __getattr__(name):
+    """Resolve the version of the package on first use.
+
+    In a source checkout, versioneer runs `git` to find the version, which
+    is too slow to do on every import.
+    """
+    if name == '__version__':
+        from ._version import get_versions
+        version = globals()['__version__'] = get_versions()['version']
+        return version
+    raise AttributeError(
+        "module '%s' has no attribute '%s'" % (__name__, name)
+    )
+
+
+# Module attributes cannot be resolved lazily before Python 3.7
+if sys.version_info < (3, 7):  # pragma: no cover
+    __version__ = __getattr__('__version__')
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""Awaitable counterparts of the model API.
+
+The mixins of this module are part of the Transifex models under Python 3.
+The operations of a model that make requests have awaitable counterparts,
+prefixed with `a`, which perform the same requests through the
+`async_http_handler` of the registry instead of the `http_handler`:
+
+>>> from txlib.http.async_requests import AsyncHttpRequest
+>>> registry.setup({'async_http_handler': AsyncHttpRequest(host, auth)})
+>>> resource = await Resource.aget(project_slug='project', slug='resource')
+>>> await resource.asave(name='New name')
+>>> translation = await Translation.aget(
+>>>     project_slug='project', slug='resource', lang='el'
+>>> )
+
+The requests themselves are described by the `_*_request()` methods of
+the models, so both APIs always send exactly the same requests.
+"""
+
+from txlib.registry import registry
+from txlib.utils import DEFAULT_CHUNK_SIZE, atomic_write
+
+
+class AsyncModelMixin(object):
+    """Awaitable operations for all models."""
+
+    @classmethod
+    async def aget(cls, lazy=False, details=True, **kwargs):
+        """Retrieve an object from Transifex, without blocking.
+
+        See `BaseModel.get()` for the arguments. A lazy object is retrieved
+        with a blocking request, when one of its fields is first read,
+        unless `arefresh()` is awaited first.
+        """
+        deadline = kwargs.pop('deadline', None)
+        model = cls._from_url_kwargs(kwargs)
+        model._details = details or not cls._path_to_light_item
+        if lazy:
+            model._lazy = True
+            model._populate_kwargs = kwargs
+            return model
+        with model._deadline_scope(deadline):
+            await model._apopulate(**kwargs)
+        return model
+
+    async def asave(self, **fields):
+        """Save the instance to the remote Transifex server,
+        without blocking.
+
+        See `BaseModel.save()` for the arguments.
+        """
+        deadline = fields.pop('deadline', None)
+        self._stage_fields(fields)
+
+        with self._deadline_scope(deadline):
+            if self._populated_fields or self._lazy:
+                await self._aupdate(**self._modified_fields)
+            else:
+                await self._acreate(**self._modified_fields)
+
+        self._commit_fields(fields)
+
+    async def adelete(self, deadline=None):
+        """Delete the instance from the remote Transifex server,
+        without blocking.
+
+        See `BaseModel.delete()` for the arguments.
+        """
+        with self._deadline_scope(deadline):
+            await self._adelete()
+
+    async def arefresh(self, deadline=None):
+        """Re-populate the instance with the current values from the
+        remote Transifex server, without blocking.
+
+        See `BaseModel.refresh()`.
+        """
+        with self._deadline_scope(deadline):
+            await self._apopulate(**self._populate_kwargs)
+
+    async def _apopulate(self, **kwargs):
+        """Populate the instance with the values from the server."""
+        self._populated_fields = await self._aget(**kwargs)
+        self._populate_kwargs = kwargs
+        self._lazy = False
+
+    async def _aget(self, **kwargs):
+        """Get the resource from a remote Transifex server."""
+        return await self._aperform(*self._get_request(**kwargs))
+
+    async def _acreate(self, **kwargs):
+        """Create a resource in the remote Transifex server."""
+        return await self._aperform(*self._create_request(**kwargs))
+
+    async def _aupdate(self, **kwargs):
+        """Update a resource in a remote Transifex server."""
+        if not kwargs:
+            return
+        return await self._aperform(*self._update_request(**kwargs))
+
+    async def _adelete(self, **kwargs):
+        """Delete a resource from a remote Transifex server."""
+        return await self._aperform(*self._delete_request(**kwargs))
+
+    async def _adownload(self, path, path_or_fileobj, params=None,
+                         chunk_size=DEFAULT_CHUNK_SIZE):
+        """Download the body of the response to a GET request to a file,
+        without blocking.
+
+        See `BaseModel._download()`.
+        """
+        if hasattr(path_or_fileobj, 'write'):
+            return await self._aperform(
+                'download', path, path_or_fileobj, params, chunk_size
+            )
+        with atomic_write(path_or_fileobj) as fileobj:
+            return await self._aperform(
+                'download', path, fileobj, params, chunk_size
+            )
+
+    async def _aperform(self, method, *args):
+        """Perform a request with the asynchronous HTTP handler.
+
+        Args:
+            `method`: The name of the handler method to call
+                (`get`, `post`, `put` or `delete`).
+            `args`: The positional arguments of the handler method.
+        Returns:
+            The content of the response.
+        """
+        handler = registry.async_http_handler
+        if self._deadline is not None:
+            return await getattr(handler, method)(*args,
+                                                  deadline=self._deadline)
+        return await getattr(handler, method)(*args)
+
+
+class AsyncResourceMixin(object):
+    """Awaitable operations specific to resources."""
+
+    async def aretrieve_content(self, deadline=None):
+        """Retrieve the content of a resource, without blocking.
+
+        See `Resource.retrieve_content()`.
+        """
+        path = self._construct_path_to_source_content()
+        with self._deadline_scope(deadline):
+            res = await self._aperform('get', path)
+        self._populated_fields['content'] = res['content']
+        return res['content']
+
+    async def adownload_to(self, path_or_fileobj,
+                           chunk_size=DEFAULT_CHUNK_SIZE, deadline=None):
+        """Download the source file of a resource, without blocking.
+
+        See `Resource.download_to()`.
+        """
+        with self._deadline_scope(deadline):
+            return await self._adownload(
+                self._construct_path_to_source_file(), path_or_fileobj,
+                chunk_size=chunk_size
+            )
+
+    async def aget_stats(self, deadline=None):
+        """Get the resource stats, without blocking.
+
+        See `Resource.get_stats()` for the format of the response.
+        """
+        with self._deadline_scope(deadline):
+            res = await self._aperform('get',
+                                       self._construct_path_to_stats())
+        self._populated_fields['stats'] = res
+        return res
+
+    async def _aupdate(self, **kwargs):
+        """Use separate URL for updating the source file."""
+        if 'content' in kwargs:
+            content = kwargs.pop('content')
+            await self._aperform(
+                *self._update_content_request(content, **kwargs)
+            )
+        await super(AsyncResourceMixin, self)._aupdate(**kwargs)
+
+
+class AsyncTranslationMixin(object):
+    """Awaitable operations specific to translations."""
+
+    async def adownload_to(self, path_or_fileobj, mode=None,
+                           chunk_size=DEFAULT_CHUNK_SIZE, deadline=None):
+        """Download the translation file, without blocking.
+
+        See `Translation.download_to()`.
+        """
+        with self._deadline_scope(deadline):
+            return await self._adownload(
+                self._construct_path_to_file(), path_or_fileobj,
+                self._file_params(mode), chunk_size
+            )
@@ -55,11 +55,22 @@ that the traceback is lost, which makes it extremely hard to debug,
 since the actual exception raised isn't shown anywhere.
 """
 
+import sys
+from contextlib import contextmanager
 
-import json
+import six
 
-from txlib.utils import _logger
+from txlib.utils import DEFAULT_CHUNK_SIZE, _logger, atomic_write
 from txlib.registry import registry
+from txlib.api.pagination import DEFAULT_PAGE_SIZE, iter_pages
+from txlib.http.json_codecs import get_codec
+from txlib.http.timeouts import Deadline
+
+# The asynchronous API requires `async def`
+if sys.version_info >= (3, 5):
+    from txlib.api.async_models import AsyncModelMixin
+else:  # pragma: no cover
+    AsyncModelMixin = object
 
 
 # Used for designating what type of attribute is missing
@@ -67,8 +78,75 @@ ATTR_TYPE_READ = 'read'
 ATTR_TYPE_WRITE = 'write'
 ATTR_TYPE_URL = 'url'
 
+# The default prefix of the urls of the models
+DEFAULT_PREFIX = '/api/2/'
+
+
+def _join_subpaths(*args):
+    """Join subpaths (given as arguments) to form a
+    well-defined URL path.
+    """
+    return '/'.join(args).replace('///', '/').replace('//', '/')
+
+
+class _FieldAccessor(object):
+    """Read access to a writable field of a model, without going through
+    `BaseModel.__getattr__()`.
+
+    Fields that have no value yet are left to `__getattr__()`, which
+    retrieves them or raises the appropriate error.
+    """
+
+    __slots__ = ('name', )
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        fields = obj._modified_fields
+        if self.name in fields:
+            return fields[self.name]
+        fields = obj._populated_fields
+        if self.name in fields:
+            return fields[self.name]
+        raise AttributeError(self.name)
+
+
+class ModelMeta(type):
+    """Metaclass of the models.
+
+    The per-instance work that only depends on the class is done once,
+    when the class is created:
+      a) the URL templates (`_path_to_*`) are joined with the default
+         prefix
+      b) the writable fields get accessors, so that reading them does not
+         go through `__getattr__()`
+    """
+
+    def __init__(cls, name, bases, namespace):
+        super(ModelMeta, cls).__init__(name, bases, namespace)
+        cls.url_fields = frozenset(cls.url_fields)
+        cls.writable_fields = frozenset(cls.writable_fields)
+
+        cls._templates = {}
+        for attr in dir(cls):
+            value = getattr(cls, attr)
+            if attr.startswith('_path_to_') and \
+                    isinstance(value, six.string_types):
+                cls._templates[attr, DEFAULT_PREFIX] = _join_subpaths(
+                    DEFAULT_PREFIX, value
+                )
 
-class BaseModel(object):
+        for field in cls.writable_fields - cls.url_fields:
+            if not hasattr(cls, field) or \
+                    isinstance(getattr(cls, field), _FieldAccessor):
+                setattr(cls, field, _FieldAccessor(field))
+
+
+@six.add_metaclass(ModelMeta)
+class BaseModel(AsyncModelMixin):
     """Base class for Transifex models.
 
     Each model has a list of fields. The model works as a proxy between the
@@ -95,6 +173,10 @@ class BaseModel(object):
     # (shouldn't start with a slash)
     _path_to_item = ''
 
+    # The URL for retrieving a single item without its details, if the
+    # item has details that are expensive to compute
+    _path_to_light_item = ''
+
     # All fields defined here will be used for constructing
     # the URL of the request
     url_fields = set()
@@ -105,8 +187,12 @@ class BaseModel(object):
     # Initially False, set to True when an instance of the class is created
     _is_initialized = False
 
+    # Fields that are not part of the response of `get()`, mapped to the
+    # names of the methods that load them on demand
+    _lazy_loaders = {}
+
     @classmethod
-    def get(cls, **kwargs):
+    def get(cls, lazy=False, details=True, **kwargs):
         """Retrieve an object by making a GET request to Transifex.
 
         Each value in `kwargs` that corresponds to a field
@@ -118,11 +204,26 @@ class BaseModel(object):
         which will contain additional query parameters to be used in the
         request, e.g. `GET https://some.url?param1=3&param2=4
 
+        A `deadline` in `kwargs`, either a number of seconds or a
+        `txlib.http.timeouts.Deadline`, limits the time the request may
+        take, including its retries.
+
+        If `lazy` is True, no request is made yet; the object is retrieved
+        when one of its fields, other than the URL fields, is first read.
+        Operations that only need the URL fields, like `save()` or
+        `delete()`, do not retrieve it at all.
+
+        If `details` is False, the object is retrieved without its details,
+        which are expensive for the server to compute, if the model has
+        any. The details are retrieved when one of their fields is read.
+
         Raises:
             AttributeError: if not all values for parameters in `url_fields`
                 are passed as kwargs
             txlib.http.exceptions.NotFoundError: if the object with these
                 attributes is not found on the remote server
+            txlib.http.exceptions.DeadlineExceededError: if the object
+                could not be retrieved before the deadline
             txlib.http.exceptions.ServerError subclass: depending on
                 the particular server response
 
@@ -130,19 +231,96 @@ class BaseModel(object):
         # Note: also catch exceptions
         >>> obj = MyModel.get(attr1=value1, attr2=value2)
         """
+        deadline = kwargs.pop('deadline', None)
+        # Create an instance of the model class and make the GET request
+        model = cls._from_url_kwargs(kwargs)
+        # Models with no light endpoint always get their details
+        model._details = details or not cls._path_to_light_item
+        if lazy:
+            model._lazy = True
+            model._populate_kwargs = kwargs
+            return model
+        with model._deadline_scope(deadline):
+            model._populate(**kwargs)
+        return model
+
+    @classmethod
+    def _from_url_kwargs(cls, kwargs):
+        """Create an instance from the URL fields found in `kwargs`.
+
+        The URL fields are removed from `kwargs`.
+
+        Raises:
+            AttributeError: if not all values for parameters in `url_fields`
+                are found in `kwargs`
+        """
         fields = {}
         for field in cls.url_fields:
             value = kwargs.pop(field, None)
             if value is None:
                 cls._handle_wrong_field(field, ATTR_TYPE_URL)
             fields[field] = value
+        return cls(**fields)
 
-        # Create an instance of the model class and make the GET request
-        model = cls(**fields)
-        model._populate(**kwargs)
+    @classmethod
+    def iter_all(cls, page_size=DEFAULT_PAGE_SIZE, prefetch=True, **kwargs):
+        """Iterate over all objects of a collection.
+
+        The collection is retrieved a page at a time and the next page is
+        fetched while the objects of the current one are processed, so
+        that large collections are never held in memory as a whole.
+
+        Args:
+            `page_size`: The number of objects to request per page.
+            `prefetch`: Whether to fetch the next page in the background.
+            `kwargs`: The values of the URL fields of the collection,
+                e.g. `project_slug` for resources.
+        Yields:
+            Instances of the model, populated with the fields found in
+            the collection. Call `refresh()` on them to retrieve all of
+            their fields.
+        Raises:
+            AttributeError: if a value for a URL field of the collection
+                is missing
+            txlib.http.exceptions.ServerError subclass: depending on
+                the particular server response
+
+        Example:
+        >>> for resource in Resource.iter_all(project_slug='project'):
+        >>>     print(resource.slug)
+        """
+        collection = cls(**kwargs)
+        try:
+            path = collection.get_path_to_collection_template() % kwargs
+        except KeyError as e:
+            cls._handle_wrong_field(e.args[0], ATTR_TYPE_URL)
+
+        def fetch(start, end):
+            return collection._perform(
+                'get', path, {'start': start, 'end': end}
+            )
+
+        for page in iter_pages(fetch, page_size, prefetch):
+            for item in page:
+                yield cls._from_collection_item(item, kwargs)
+
+    @classmethod
+    def _from_collection_item(cls, item, url_values):
+        """Create an instance from an item of a collection.
+
+        Args:
+            `item`: The fields of the object, as found in the collection.
+            `url_values`: The values of the URL fields of the collection.
+        """
+        url_values = dict(url_values)
+        for field in cls.url_fields:
+            if field not in url_values and field in item:
+                url_values[field] = item[field]
+        model = cls(**url_values)
+        model._populated_fields = item
         return model
 
-    def __init__(self, prefix='/api/2/', **url_values):
+    def __init__(self, prefix=DEFAULT_PREFIX, **url_values):
         """Constructor.
 
         Initializes various variables, setup the HTTP handler and
@@ -158,10 +336,14 @@ class BaseModel(object):
         self._prefix = prefix
         self._modified_fields = {}
         self._populated_fields = {}
+        self._populate_kwargs = {}
+        self._deadline = None
+        self._lazy = False
+        self._details = True
 
         for field in url_values:
             if field in self.url_fields:
-                setattr(self, field, url_values[field])
+                self.__dict__[field] = url_values[field]
             else:
                 self._handle_wrong_field(field, ATTR_TYPE_URL)
 
@@ -175,6 +357,9 @@ class BaseModel(object):
         """Return the value of the field with the given name.
 
         Looks in `self._modified_fields` and `self._populated_fields`.
+        Fields that have not been retrieved yet, either because the object
+        was retrieved lazily or without its details, or because they are
+        loaded on demand (see `_lazy_loaders`), are retrieved first.
 
         Raises:
             AttributeError: if the requested attribute does not exist
@@ -185,6 +370,28 @@ class BaseModel(object):
         elif name in self._populated_fields:
             return self._populated_fields[name]
 
+        elif name.startswith('_'):
+            self._handle_wrong_field(name, ATTR_TYPE_READ)
+
+        elif name in self._lazy_loaders and \
+                (self._lazy or self._populated_fields):
+            getattr(self, self._lazy_loaders[name])()
+            return self._populated_fields[name]
+
+        elif self._lazy:
+            self._load()
+            return getattr(self, name)
+
+        elif not self._details:
+            # The details are requested only while the flag is set
+            self._details = True
+            try:
+                self._load()
+            except Exception:
+                self._details = False
+                raise
+            return getattr(self, name)
+
         else:
             self._handle_wrong_field(name, ATTR_TYPE_READ)
 
@@ -214,6 +421,29 @@ class BaseModel(object):
         else:
             self._handle_wrong_field(name, ATTR_TYPE_WRITE)
 
+    def has_field(self, name):
+        """Return whether the field with the given name has a value.
+
+        Unlike reading the field, this never raises an error and never
+        makes a request; only the values the instance already has are
+        considered.
+        """
+        return (name in self._modified_fields or
+                name in self._populated_fields or
+                (name in self.url_fields and name in self.__dict__))
+
+    def get_field(self, name, default=None):
+        """Return the value of the field with the given name, or `default`
+        if it has none.
+
+        See `has_field()`.
+        """
+        if name in self.url_fields and name in self.__dict__:
+            return self.__dict__[name]
+        if name in self._modified_fields:
+            return self._modified_fields[name]
+        return self._populated_fields.get(name, default)
+
     def save(self, **fields):
         """Save the instance to the remote Transifex server.
 
@@ -224,67 +454,201 @@ class BaseModel(object):
         on the object. The same goes for any other values already set
         to the object by `model_instance.attr = value`.
 
+        A `deadline` in `fields` limits the time the requests may take
+        (see `get()`).
+
+        Raises:
+            AttributeError: if a given field is not included in
+                `self.writable_fields`,
+        """
+        deadline = fields.pop('deadline', None)
+        self._stage_fields(fields)
+
+        # Then do the actual update / create
+        with self._deadline_scope(deadline):
+            if self._populated_fields or self._lazy:
+                self._update(**self._modified_fields)
+            else:
+                self._create(**self._modified_fields)
+
+        self._commit_fields(fields)
+
+    def _stage_fields(self, fields):
+        """Add the given fields to the ones to be sent on save.
+
+        We want to do this manually, and not through setattr(), so we won't
+        overwrite any url_field that would cause the update call to fail.
+
         Raises:
             AttributeError: if a given field is not included in
                 `self.writable_fields`,
         """
-        # First update the object's _modified_fields. We want to do this
-        # manually, and not through setattr(), so we won't overwrite any
-        # url_field that would cause the update call to fail.
         for field in fields:
             if field in self.writable_fields:
                 self._modified_fields[field] = fields[field]
             else:
                 self._handle_wrong_field(field, ATTR_TYPE_WRITE)
 
-        # Then do the actual update / create
-        if self._populated_fields:
-            self._update(**self._modified_fields)
-        else:
-            self._create(**self._modified_fields)
-
-        # Finally update the object with its final values
+    def _commit_fields(self, fields):
+        """Update the object with the final values of a successful save."""
         for field in fields:
             if field in self.writable_fields:
                 setattr(self, field, fields[field])
 
-    def delete(self):
-        """Delete the instance from the remote Transifex server."""
-        self._delete()
+    def _mark_saved(self):
+        """Treat the modified fields as the current values on the server,
+        so that they are not sent again by the next save.
+        """
+        self._populated_fields.update(self._modified_fields)
+        self._modified_fields = {}
+
+    def delete(self, deadline=None):
+        """Delete the instance from the remote Transifex server.
+
+        Args:
+            `deadline`: The number of seconds, or the
+                `txlib.http.timeouts.Deadline`, the request may take.
+        """
+        with self._deadline_scope(deadline):
+            self._delete()
+
+    def refresh(self, deadline=None):
+        """Re-populate the instance with the current values from the
+        remote Transifex server.
+
+        The same query parameters as the ones of the initial `get()`
+        are used. If the HTTP handler has a `cache`, a response that is
+        still fresh in it is used as is; otherwise, the request is
+        conditional and, if nothing has changed, the server responds
+        with an empty `304 Not Modified`.
+
+        Args:
+            `deadline`: The number of seconds, or the
+                `txlib.http.timeouts.Deadline`, the request may take.
+        """
+        with self._deadline_scope(deadline):
+            self._populate(**self._populate_kwargs)
+
+    @contextmanager
+    def _deadline_scope(self, deadline):
+        """Make the requests of the instance in the block share the given
+        deadline.
+
+        A deadline of an enclosing block is kept, if `deadline` is None.
+
+        Args:
+            `deadline`: The number of seconds, or the `Deadline`, the
+                requests may take in total.
+        """
+        previous = self._deadline
+        if deadline is not None:
+            self._deadline = Deadline.coerce(deadline)
+        try:
+            yield
+        finally:
+            self._deadline = previous
 
     def _populate(self, **kwargs):
         """Populate the instance with the values from the server."""
         self._populated_fields = self._get(**kwargs)
+        self._populate_kwargs = kwargs
+        self._lazy = False
+
+    def _load(self):
+        """Retrieve an object that was retrieved lazily or without its
+        details.
+
+        Fields already loaded on demand are kept.
+        """
+        loaded = dict(self._populated_fields)
+        self._populate(**self._populate_kwargs)
+        for field, value in loaded.items():
+            self._populated_fields.setdefault(field, value)
 
     def _get(self, **kwargs):
         """Get the resource from a remote Transifex server."""
-        path = self._construct_path_to_item()
-        return self._http.get(path, params=kwargs.pop('params', None))
+        return self._perform(*self._get_request(**kwargs))
 
     def _create(self, **kwargs):
         """Create a resource in the remote Transifex server."""
-        path = self._construct_path_to_collection()
-
-        # Use the fields for which we have values
-        for field in self.writable_fields:
-            try:
-                value = getattr(self, field)
-                kwargs[field] = value
-            except AttributeError:
-                pass
-        return self._http.post(path, json.dumps(kwargs))
+        return self._perform(*self._create_request(**kwargs))
 
     def _update(self, **kwargs):
         """Update a resource in a remote Transifex server."""
-        path = self._construct_path_to_item()
         if not kwargs:
             return
-        return self._http.put(path, json.dumps(kwargs))
+        return self._perform(*self._update_request(**kwargs))
 
     def _delete(self, **kwargs):
         """Delete a resource from a remote Transifex server."""
+        return self._perform(*self._delete_request(**kwargs))
+
+    def _perform(self, method, *args):
+        """Perform a request with the HTTP handler.
+
+        Args:
+            `method`: The name of the handler method to call
+                (`get`, `post`, `put` or `delete`).
+            `args`: The positional arguments of the handler method.
+        Returns:
+            The content of the response.
+        """
+        if self._deadline is not None:
+            return getattr(self._http, method)(*args, deadline=self._deadline)
+        return getattr(self._http, method)(*args)
+
+    def _download(self, path, path_or_fileobj, params=None,
+                  chunk_size=DEFAULT_CHUNK_SIZE):
+        """Download the body of the response to a GET request to a file.
+
+        Args:
+            `path`: The path of the request.
+            `path_or_fileobj`: The path of the file to write to, or a file
+                object opened in binary mode. A file at the given path is
+                replaced atomically, once the download has finished.
+            `params`: The query parameters of the request.
+            `chunk_size`: The size of the chunks to write, in bytes.
+        Returns:
+            The number of bytes written.
+        """
+        if hasattr(path_or_fileobj, 'write'):
+            return self._perform(
+                'download', path, path_or_fileobj, params, chunk_size
+            )
+        with atomic_write(path_or_fileobj) as fileobj:
+            return self._perform('download', path, fileobj, params, chunk_size)
+
+    # The `_*_request()` methods below describe the request each operation
+    # needs, as a `(method, *args)` tuple for `_perform()`. This way the
+    # blocking and the awaitable API share the same logic.
+
+    def _get_request(self, **kwargs):
+        """Return the request that retrieves this object."""
+        if self._details or not self._path_to_light_item:
+            path = self._construct_path_to_item()
+        else:
+            path = self._construct_path_to_light_item()
+        return 'get', path, kwargs.pop('params', None)
+
+    def _create_request(self, **kwargs):
+        """Return the request that creates this object."""
+        path = self._construct_path_to_collection()
+
+        # Use the fields for which we have values
+        for field in self.writable_fields:
+            if self.has_field(field):
+                kwargs[field] = self.get_field(field)
+        return 'post', path, get_codec().dumps(kwargs)
+
+    def _update_request(self, **kwargs):
+        """Return the request that updates the given fields of this object."""
         path = self._construct_path_to_item()
-        return self._http.delete(path)
+        return 'put', path, get_codec().dumps(kwargs)
+
+    def _delete_request(self, **kwargs):
+        """Return the request that deletes this object."""
+        path = self._construct_path_to_item()
+        return 'delete', path
 
     def _construct_path_to_collection(self):
         """Construct the path to an actual collection."""
@@ -295,26 +659,55 @@ class BaseModel(object):
         """Construct the path to an actual item."""
         return self.get_path_to_item_template() % self.get_url_parameters()
 
+    def _construct_path_to_light_item(self):
+        """Construct the path to an actual item, without its details."""
+        template = self.get_path_to_light_item_template()
+        return template % self.get_url_parameters()
+
     def get_url_parameters(self):
         """Create a dictionary of parameters used in URLs for this model."""
-        url_fields = {}
-        for field in self.url_fields:
-            url_fields[field] = getattr(self, field)
-        return url_fields
+        values = self.__dict__
+        try:
+            return dict((field, values[field]) for field in self.url_fields)
+        except KeyError:
+            # Raise the appropriate error for the missing field
+            return dict(
+                (field, getattr(self, field)) for field in self.url_fields
+            )
 
     def get_path_to_collection_template(self):
         """The URL to access the collection of the model."""
-        return self._join_subpaths(self._prefix, self._path_to_collection)
+        return self._path_template('_path_to_collection')
 
     def get_path_to_item_template(self):
         """The URL to access a specific item of the model."""
-        return self._join_subpaths(self._prefix, self._path_to_item)
+        return self._path_template('_path_to_item')
+
+    def get_path_to_light_item_template(self):
+        """The URL to access a specific item of the model, without its
+        details.
+        """
+        return self._path_template('_path_to_light_item')
+
+    def _path_template(self, name):
+        """Return the URL template with the given attribute name, joined
+        with the prefix of the instance.
+
+        The templates are joined once per class and prefix.
+        """
+        key = (name, self._prefix)
+        template = self._templates.get(key)
+        if template is None:
+            template = self._templates[key] = _join_subpaths(
+                self._prefix, getattr(self, name)
+            )
+        return template
 
     def _join_subpaths(self, *args):
         """Join subpaths (given as arguments) to form a
         well-defined URL path.
         """
-        return '/'.join(args).replace('///', '/').replace('//', '/')
+        return _join_subpaths(*args)
 
     @classmethod
     def _handle_wrong_field(cls, field_name, field_type):
@@ -348,4 +741,27 @@ class BaseModel(object):
 
 class LegacyModel(BaseModel):
     """Base class for Transifex models in the old v2 API."""
-    _prefix = '/api/2/'
+    _prefix = DEFAULT_PREFIX
+
+
+def endpoint_templates():
+    """Return the URL templates of the endpoints of all models.
+
+    The templates are the `_path_to_*` attributes of the models, e.g.
+    `project/%(project_slug)s/resource/%(slug)s/stats/`. They are used
+    to group the requests reported by `txlib.http.instrumentation`.
+    """
+    # Make sure the built-in models are defined
+    from txlib.api import project, resources, translations  # noqa
+
+    templates = set()
+    models = [BaseModel]
+    while models:
+        model = models.pop()
+        models.extend(model.__subclasses__())
+        for name in dir(model):
+            value = getattr(model, name)
+            if name.startswith('_path_to_') and \
+                    isinstance(value, six.string_types) and value:
+                templates.add(value)
+    return sorted(templates)
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent execution of many model operations.
+
+Operations are described with `get()`, `save()` and `delete()` and run
+by `execute()` in a bounded number of threads, which share the HTTP
+handler of the registry:
+
+>>> from txlib.api import bulk
+>>> ops = [
+>>>     bulk.save(Translation(project_slug='project', slug=slug, lang=lang),
+>>>               content=content)
+>>>     for slug, lang, content in translations
+>>> ]
+>>> results = bulk.execute(ops, max_workers=8)
+
+The results are in the order of the operations. An operation that failed
+has the exception it raised as its result, so that a single failure does
+not make the results of the rest get lost:
+
+>>> failed = [(op, r) for op, r in zip(ops, results)
+>>>           if isinstance(r, Exception)]
+
+Authentication and authorization errors are fatal: once an operation
+fails with one, the operations that have not started yet are not run and
+get a `BulkAbortedError` as their result.
+"""
+
+import threading
+
+from requests.adapters import DEFAULT_POOLSIZE
+
+from txlib.api.exceptions import BulkAbortedError
+from txlib.http.exceptions import AuthenticationError, AuthorizationError
+from txlib.utils import _logger
+
+
+# The default number of threads; it matches the default size of the
+# connection pool of `HttpRequest`, so that no thread waits for a connection
+DEFAULT_MAX_WORKERS = DEFAULT_POOLSIZE
+
+# The exceptions that stop a bulk execution
+FATAL_ERRORS = (AuthenticationError, AuthorizationError)
+
+
+class Operation(object):
+    """An operation on a model, to be run by `execute()`.
+
+    Use `get()`, `save()` and `delete()` to create operations.
+    """
+
+    def __init__(self, name, target, kwargs):
+        """Initializer.
+
+        Args:
+            `name`: The name of the operation (`get`, `save` or `delete`).
+            `target`: The model class (for `get`) or instance to operate on.
+            `kwargs`: The keyword arguments of the operation.
+        """
+        self.name = name
+        self.target = target
+        self.kwargs = kwargs
+
+    def __call__(self):
+        """Run the operation.
+
+        Returns:
+            The model retrieved or saved, or None for deletions.
+        """
+        result = getattr(self.target, self.name)(**self.kwargs)
+        if self.name == 'save':
+            return self.target
+        return result
+
+    def __repr__(self):
+        return '<Operation %s %r>' % (self.name, self.target)
+
+
+def get(model_class, **kwargs):
+    """Describe the retrieval of an object.
+
+    See `BaseModel.get()` for the arguments.
+    """
+    return Operation('get', model_class, kwargs)
+
+
+def save(model, **fields):
+    """Describe the saving of a model instance.
+
+    See `BaseModel.save()` for the arguments.
+    """
+    return Operation('save', model, fields)
+
+
+def delete(model, **kwargs):
+    """Describe the deletion of a model instance.
+
+    See `BaseModel.delete()` for the arguments.
+    """
+    return Operation('delete', model, kwargs)
+
+
+def execute(ops, max_workers=DEFAULT_MAX_WORKERS, progress=None,
+            fatal_errors=FATAL_ERRORS):
+    """Run the given operations concurrently.
+
+    Args:
+        `ops`: The operations to run (see `get()`, `save()` and
+            `delete()`). Any callable that takes no arguments can be used
+            as an operation, too.
+        `max_workers`: The maximum number of operations to run at the
+            same time.
+        `progress`: A function to call with the number of finished
+            operations and the total number of them, after each
+            operation finishes. It is called from the worker threads.
+        `fatal_errors`: The exception classes that stop the execution.
+    Returns:
+        A list with the result of each operation, in the order of `ops`.
+        The result of a failed operation is the exception it raised; the
+        result of an operation that was not run, because of a fatal
+        error, is a `BulkAbortedError`.
+    """
+    ops = list(ops)
+    total = len(ops)
+    results = [None] * total
+    pending = iter(enumerate(ops))
+    aborted = threading.Event()
+    lock = threading.Lock()
+    counter = [0]
+
+    def finish(index, result):
+        results[index] = result
+        with lock:
+            counter[0] += 1
+            done = counter[0]
+        if progress is not None:
+            try:
+                progress(done, total)
+            except Exception:
+                _logger.exception("Progress callback %r failed.", progress)
+
+    def work():
+        while True:
+            with lock:
+                index, op = next(pending, (None, None))
+            if index is None:
+                return
+            if aborted.is_set():
+                finish(index, BulkAbortedError(
+                    "Not run because of a fatal error."
+                ))
+                continue
+            try:
+                result = op()
+            except Exception as e:
+                if isinstance(e, fatal_errors):
+                    _logger.error("Fatal error in %r, aborting the rest of "
+                                  "the operations: %s", op, e)
+                    aborted.set()
+                result = e
+            finish(index, result)
+
+    workers = [threading.Thread(target=work)
+               for _ in range(max(1, min(max_workers, total)))]
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
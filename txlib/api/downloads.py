@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent download of the translations of many resources.
+
+The languages of each resource are found from its stats, and the files of
+all of them are downloaded concurrently, with `txlib.api.bulk`. Each file
+is written atomically, as soon as it has been downloaded, so that a
+failed or interrupted run never leaves partial files behind. The result is
+a manifest, with an entry for each file:
+
+>>> manifest = download_translations(
+>>>     Resource.iter_all(project_slug='project'), 'locale',
+>>>     path_template='%(slug)s/%(lang)s.po',
+>>> )
+>>> failed = [entry for entry in manifest if entry['error'] is not None]
+
+Use `Resource.download_all_translations()` and
+`Project.download_all_translations()` instead of calling this directly.
+"""
+
+import os
+
+from txlib.api import bulk
+from txlib.api.translations import Translation
+
+
+# The default path of each file, relative to the destination directory.
+# It may use the URL fields of translations as placeholders.
+DEFAULT_PATH_TEMPLATE = os.path.join('%(slug)s', '%(lang)s')
+
+
+def download_translations(resources, dest_dir, languages=None,
+                          max_workers=None, mode=None,
+                          path_template=DEFAULT_PATH_TEMPLATE, progress=None,
+                          select=None, dry_run=False):
+    """Download the translation files of the given resources concurrently.
+
+    Args:
+        `resources`: The resources, as `Resource` instances.
+        `dest_dir`: The directory to write the files to. It is created,
+            along with any subdirectories of the files, if missing.
+        `languages`: The codes of the languages to download. `None` for
+            all the languages in the stats of each resource, including
+            the source language.
+        `max_workers`: The maximum number of requests to make at the
+            same time. `None` for `bulk.DEFAULT_MAX_WORKERS`.
+        `mode`: The mode of the files (see `Translation.download_to()`).
+        `path_template`: The path of each file, relative to `dest_dir`,
+            with `%(project_slug)s`, `%(slug)s` and `%(lang)s`
+            placeholders.
+        `progress`: A function to call with the number of downloaded
+            files and the total number of them (see `bulk.execute()`).
+        `select`: A function that is given the entry of each file in the
+            manifest and the stats of its language, and returns whether
+            to download it. `None` to download all files.
+        `dry_run`: Whether to only return the manifest of the files that
+            would be downloaded, without downloading them.
+    Returns:
+        The manifest: a list of dictionaries, one for each file, with the
+        `project_slug`, `slug` and `lang` of the translation, its
+        `last_update` according to the stats, the `path` of the file, its
+        `size` in bytes and the `error` the download failed with, if any.
+        If the stats of a resource could not be retrieved, its entry has
+        a `lang` and `path` of `None`, instead.
+    """
+    if max_workers is None:
+        max_workers = bulk.DEFAULT_MAX_WORKERS
+    resources = list(resources)
+    all_stats = bulk.execute(
+        [resource.get_stats for resource in resources],
+        max_workers=max_workers,
+    )
+
+    manifest = []
+    ops = []
+    for resource, stats in zip(resources, all_stats):
+        if isinstance(stats, Exception):
+            manifest.append(_entry(resource.get_url_parameters(), error=stats))
+            continue
+        for lang in _languages(stats, languages):
+            translation = Translation(
+                lang=lang, **resource.get_url_parameters()
+            )
+            url_parameters = translation.get_url_parameters()
+            path = os.path.join(dest_dir, path_template % url_parameters)
+            entry = _entry(url_parameters, path)
+            entry['last_update'] = stats[lang].get('last_update')
+            if select is not None and not select(entry, stats[lang]):
+                continue
+            manifest.append(entry)
+            ops.append(_download_op(translation, path, mode))
+    if dry_run:
+        return manifest
+
+    directories = set(os.path.dirname(entry['path'])
+                      for entry in manifest if entry['path'] is not None)
+    for directory in directories:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    results = iter(bulk.execute(ops, max_workers=max_workers,
+                                progress=progress))
+    for entry in manifest:
+        if entry['path'] is None:
+            continue
+        result = next(results)
+        if isinstance(result, Exception):
+            entry['error'] = result
+        else:
+            entry['size'] = result
+    return manifest
+
+
+def _languages(stats, languages):
+    """Return the languages to download, given the stats of a resource."""
+    if languages is None:
+        return sorted(stats)
+    return [lang for lang in languages if lang in stats]
+
+
+def _entry(url_parameters, path=None, error=None):
+    """Return an entry of the manifest."""
+    return {
+        'project_slug': url_parameters['project_slug'],
+        'slug': url_parameters['slug'],
+        'lang': url_parameters.get('lang'),
+        'last_update': None,
+        'path': path,
+        'size': None,
+        'error': error,
+    }
+
+
+def _download_op(translation, path, mode):
+    """Return an operation that downloads a translation to a path."""
+    def download():
+        return translation.download_to(path, mode=mode)
+    return download
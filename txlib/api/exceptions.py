@@ -10,3 +10,30 @@ class ApiError(Exception):
 
 class MissingArgumentsError(ApiError):
     """Exception used when arguments are missing."""
+
+
+class BulkAbortedError(ApiError):
+    """Exception used for the operations of a bulk execution that were
+    not run, because another operation failed with a fatal error."""
+
+
+class SessionFlushError(ApiError):
+    """Exception used when some of the changes of a session could not be
+    saved.
+
+    Attributes:
+        `failures`: A list of `(model, exception)` tuples, with the models
+            whose changes were not saved and the exceptions they failed
+            with.
+    """
+
+    def __init__(self, failures):
+        self.failures = failures
+        super(SessionFlushError, self).__init__(
+            '%s of the changes could not be saved: %s' % (
+                len(failures), ', '.join(
+                    '%s (%r)' % (model, exception)
+                    for model, exception in failures
+                )
+            )
+        )
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Iteration over paginated collections.
+
+Pages are requested with the `start` and `end` query parameters of the
+API (1-based and inclusive). While the items of a page are processed, the
+next page is fetched in a background thread, so that the time of the
+requests overlaps with the time of the processing. At most two pages are
+held in memory at any time.
+"""
+
+import threading
+
+
+# The default number of items to request per page
+DEFAULT_PAGE_SIZE = 100
+
+
+class _PageFetch(object):
+    """The fetching of a page in a background thread."""
+
+    def __init__(self, func, *args):
+        self._result = None
+        self._exception = None
+        self._thread = threading.Thread(target=self._run, args=(func, args))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, func, args):
+        try:
+            self._result = func(*args)
+        except Exception as e:
+            self._exception = e
+
+    def result(self):
+        """Wait for the page and return it.
+
+        Raises:
+            The exception raised while fetching the page.
+        """
+        self._thread.join()
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+
+def iter_pages(fetch, page_size=DEFAULT_PAGE_SIZE, prefetch=True):
+    """Iterate over the pages of a collection.
+
+    Iteration stops at the first page that is not full. A page that is
+    larger than `page_size`, or the same as the previous one, means that
+    the collection is not paginated, so iteration stops there, too.
+
+    Args:
+        `fetch`: A function that returns the list of items from `start`
+            to `end` (inclusive), given as `fetch(start, end)`.
+        `page_size`: The number of items to request per page.
+        `prefetch`: Whether to fetch the next page in the background,
+            while the current one is processed.
+    Yields:
+        The lists of items of the pages.
+    """
+    start = 1
+    pending = None
+    if prefetch:
+        pending = _PageFetch(fetch, start, start + page_size - 1)
+    previous = None
+    while True:
+        if pending is not None:
+            page = pending.result()
+        else:
+            page = fetch(start, start + page_size - 1)
+        if not page or page == previous:
+            return
+
+        start += page_size
+        last = len(page) != page_size
+        if prefetch and not last:
+            pending = _PageFetch(fetch, start, start + page_size - 1)
+        yield page
+        if last:
+            return
+        previous = page
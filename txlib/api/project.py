@@ -5,6 +5,7 @@ Project wrapper.
 """
 
 from txlib.api.base import BaseModel
+from txlib.api.resources import Resource
 
 
 class Project(BaseModel):
@@ -12,6 +13,7 @@ class Project(BaseModel):
 
     _path_to_collection = 'projects/'
     _path_to_item = 'project/%(slug)s/?details'
+    _path_to_light_item = 'project/%(slug)s/'
 
     writable_fields = {
         'slug', 'name', 'description', 'long_description', 'private',
@@ -21,5 +23,23 @@ class Project(BaseModel):
     }
     url_fields = {'slug'}
 
+    def download_all_translations(self, dest_dir, languages=None,
+                                  max_workers=None, **kwargs):
+        """Download the translation files of all the resources of the
+        project concurrently.
+
+        The files of each resource are written in a subdirectory named
+        after it, by default.
+
+        See `Resource.download_all_translations()` for the arguments and
+        the return value.
+        """
+        # Imported here, so that importing the models stays cheap
+        from txlib.api.downloads import download_translations
+        resources = Resource.iter_all(project_slug=self.slug)
+        return download_translations(
+            resources, dest_dir, languages, max_workers, **kwargs
+        )
+
     def __str__(self):
         return '[Project slug={}]'.format(self.slug)
@@ -4,18 +4,29 @@
 Resource wrapper.
 """
 
-import json
+import sys
 
 from txlib.api.base import BaseModel
+from txlib.http.json_codecs import get_codec
+from txlib.utils import DEFAULT_CHUNK_SIZE
 
+# The asynchronous API requires `async def`
+if sys.version_info >= (3, 5):
+    from txlib.api.async_models import AsyncResourceMixin
+else:  # pragma: no cover
+    AsyncResourceMixin = object
 
-class Resource(BaseModel):
+
+class Resource(AsyncResourceMixin, BaseModel):
     """Model class for resources."""
 
     _path_to_collection = 'project/%(project_slug)s/resources/'
     _path_to_item = 'project/%(project_slug)s/resource/%(slug)s/?details'
+    _path_to_light_item = 'project/%(project_slug)s/resource/%(slug)s/'
     _path_to_source_language = 'project/%(project_slug)s/resource/' \
                                '%(slug)s/content/'
+    _path_to_source_file = 'project/%(project_slug)s/resource/' \
+                           '%(slug)s/content/?file'
     _path_to_stats = 'project/%(project_slug)s/resource/%(slug)s/stats/'
 
     writable_fields = {
@@ -25,14 +36,46 @@ class Resource(BaseModel):
     }
     url_fields = {'project_slug', 'slug'}
 
-    def retrieve_content(self):
-        """Retrieve the content of a resource."""
-        path = self._construct_path_to_source_content()
-        res = self._http.get(path)
+    # The content is not part of the details of a resource
+    _lazy_loaders = {'content': 'retrieve_content'}
+
+    def retrieve_content(self, deadline=None):
+        """Retrieve the content of a resource.
+
+        Args:
+            `deadline`: The number of seconds, or the
+                `txlib.http.timeouts.Deadline`, the request may take.
+        """
+        with self._deadline_scope(deadline):
+            res = self._perform('get',
+                                self._construct_path_to_source_content())
         self._populated_fields['content'] = res['content']
         return res['content']
 
-    def get_stats(self):
+    def download_to(self, path_or_fileobj, chunk_size=DEFAULT_CHUNK_SIZE,
+                    deadline=None):
+        """Download the source file of a resource.
+
+        The file is written in chunks as it is downloaded, so that it is
+        never held in memory as a whole.
+
+        Args:
+            `path_or_fileobj`: The path of the file to write to, or a file
+                object opened in binary mode. A file at the given path is
+                replaced atomically, once the download has finished.
+            `chunk_size`: The size of the chunks to write, in bytes.
+            `deadline`: The number of seconds, or the
+                `txlib.http.timeouts.Deadline`, the request may take.
+        Returns:
+            The number of bytes written.
+        """
+        with self._deadline_scope(deadline):
+            return self._download(
+                self._construct_path_to_source_file(), path_or_fileobj,
+                chunk_size=chunk_size
+            )
+
+    def get_stats(self, deadline=None):
         """Get the resource stats.
 
         It calls the stats endpoint:
@@ -68,46 +111,83 @@ class Resource(BaseModel):
             },
             ...
         }
+
+        Args:
+            `deadline`: The number of seconds, or the
+                `txlib.http.timeouts.Deadline`, the request may take.
         """
-        path = self._construct_path_to_stats()
-        res = self._http.get(path)
+        with self._deadline_scope(deadline):
+            res = self._perform('get', self._construct_path_to_stats())
         self._populated_fields['stats'] = res
         return res
 
-    def _create(self, **kwargs):
-        """Create a resource in the remote Transifex server."""
+    def download_all_translations(self, dest_dir, languages=None,
+                                  max_workers=None, **kwargs):
+        """Download the translation files of the resource concurrently.
+
+        The languages are found from the stats of the resource. Each file
+        is written atomically, as soon as it has been downloaded.
+
+        Args:
+            `dest_dir`: The directory to write the files to.
+            `languages`: The codes of the languages to download. `None`
+                for all the languages of the resource.
+            `max_workers`: The maximum number of requests to make at the
+                same time.
+            `kwargs`: The `mode`, `path_template` and `progress` arguments
+                of `txlib.api.downloads.download_translations()`. By
+                default, the files are named after their language.
+        Returns:
+            The manifest of the downloaded files (see
+            `txlib.api.downloads.download_translations()`).
+        """
+        # Imported here, so that importing the models stays cheap
+        from txlib.api.downloads import download_translations
+        kwargs.setdefault('path_template', '%(lang)s')
+        return download_translations(
+            [self], dest_dir, languages, max_workers, **kwargs
+        )
+
+    def _update(self, **kwargs):
+        """Use separate URL for updating the source file."""
+        if 'content' in kwargs:
+            content = kwargs.pop('content')
+            self._perform(*self._update_content_request(content, **kwargs))
+        super(Resource, self)._update(**kwargs)
+
+    def _create_request(self, **kwargs):
+        """Return the request that creates a resource."""
         path = self._construct_path_to_collection()
         content = kwargs['content']
         is_binary = not isinstance(content, str)
 
         # Use the fields for which we have values
         for field in self.writable_fields:
-            try:
-                value = getattr(self, field)
-                kwargs[field] = value
-                # on binary files pass the content as a separate
-                # parameter (not in kwargs)
-                if field == 'content' and is_binary:
-                    kwargs.pop('content', None)
-            except AttributeError:
-                pass
+            if self.has_field(field):
+                kwargs[field] = self.get_field(field)
+        # on binary files pass the content as a separate
+        # parameter (not in kwargs)
+        if is_binary:
+            kwargs.pop('content', None)
 
         if is_binary:
-            return self._http.post(path, kwargs, content)
+            return 'post', path, kwargs, content
 
-        return self._http.post(path, json.dumps(kwargs))
+        return 'post', path, get_codec().dumps(kwargs)
 
-    def _update(self, **kwargs):
-        """Use separate URL for updating the source file."""
-        if 'content' in kwargs:
-            content = kwargs.pop('content')
-            path = self._construct_path_to_source_content()
-            is_binary = not isinstance(content, str)
-            if not is_binary:
-                self._http.put(path, json.dumps({'content': content}))
-            else:
-                self._http.put(path, kwargs, content)
-        super(Resource, self)._update(**kwargs)
+    def _update_content_request(self, content, **kwargs):
+        """Return the request that updates the source content.
+
+        Text content is sent as JSON.
+        Any other content (bytes, a memoryview, a binary file object or
+        a path object) is streamed as a file, along with any other
+        fields in `kwargs`.
+        """
+        path = self._construct_path_to_source_content()
+        is_binary = not isinstance(content, str)
+        if not is_binary:
+            return 'put', path, get_codec().dumps({'content': content})
+        return 'put', path, kwargs, content
 
     def _construct_path_to_source_content(self):
         """Construct the path to the source content for an actual resource."""
@@ -116,7 +196,16 @@ class Resource(BaseModel):
 
     def get_path_to_source_content_template(self):
         """Return the path to the source language content."""
-        return self._join_subpaths(self._prefix, self._path_to_source_language)
+        return self._path_template('_path_to_source_language')
+
+    def _construct_path_to_source_file(self):
+        """Construct the path to the source file for an actual resource."""
+        template = self.get_path_to_source_file_template()  # flake8 fix
+        return template % self.get_url_parameters()
+
+    def get_path_to_source_file_template(self):
+        """Return the path to the source language file."""
+        return self._path_template('_path_to_source_file')
 
     def _construct_path_to_stats(self):
         """Construct the path to the resource stats."""
@@ -125,7 +214,7 @@ class Resource(BaseModel):
 
     def get_path_to_stats_template(self):
         """Return the path to the resource stats."""
-        return self._join_subpaths(self._prefix, self._path_to_stats)
+        return self._path_template('_path_to_stats')
 
     def __str__(self):
         return '[Resource slug={}]'.format(self.slug)
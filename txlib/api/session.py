@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Sessions: an identity map and a unit of work for models.
+
+Within a session, an object is only retrieved once and there is a single
+instance of it, however many times it is looked up. Changes to the
+objects are not saved one by one; they are collected and saved together,
+concurrently, when the session is flushed, which happens at the end of
+the `with` block:
+
+>>> with Session() as session:
+>>>     resource = session.get(Resource, project_slug='p', slug='r')
+>>>     resource.name = 'New name'
+>>>     ...
+>>>     # The same instance, no request is made
+>>>     resource = session.get(Resource, project_slug='p', slug='r')
+>>>     resource.category = 'docs'
+>>>     session.add(Translation(project_slug='p', slug='r', lang='el'))
+>>>     ...
+>>> # One PUT for the resource, with both fields, and one for the
+>>> # translation
+
+Several changes to the same object are coalesced into a single request.
+Sessions are not thread-safe; use one per thread.
+"""
+
+from txlib.api import bulk
+from txlib.api.exceptions import SessionFlushError
+
+
+class Session(object):
+    """An identity map and a unit of work for models."""
+
+    def __init__(self, max_workers=bulk.DEFAULT_MAX_WORKERS):
+        """Initializer.
+
+        Args:
+            `max_workers`: The maximum number of requests to make at the
+                same time, when flushing.
+        """
+        self.max_workers = max_workers
+        self._identity_map = {}
+        self._new = {}
+        self._deleted = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Nothing is saved if the block failed
+        if exc_type is None:
+            self.flush()
+
+    def __contains__(self, model):
+        return self._identity_map.get(self._key(model)) is model
+
+    def get(self, model_class, **kwargs):
+        """Return the object with the given URL fields, retrieving it only
+        if it is not in the session yet.
+
+        See `BaseModel.get()` for the arguments; they are only used when
+        the object is retrieved.
+        """
+        url_values = dict(
+            (field, kwargs[field]) for field in model_class.url_fields
+            if field in kwargs
+        )
+        key = (model_class, tuple(sorted(url_values.items())))
+        model = self._identity_map.get(key)
+        if model is None:
+            model = self._identity_map[key] = model_class.get(**kwargs)
+        return model
+
+    def add(self, model):
+        """Add an object to the session, so that it is saved on flush.
+
+        An object that is not populated is created on flush, even if it has
+        no modified fields.
+
+        Returns:
+            The instance of the object in the session. If the session
+            already has another instance of the same object, the modified
+            fields of `model` are moved to that instance, which is returned.
+        """
+        key = self._key(model)
+        existing = self._identity_map.get(key)
+        if existing is not None and existing is not model:
+            existing._modified_fields.update(model._modified_fields)
+            model._modified_fields = {}
+            return existing
+
+        self._identity_map[key] = model
+        self._deleted.pop(key, None)
+        if not model._populated_fields and not model._lazy:
+            self._new[key] = model
+        return model
+
+    def save(self, model, **fields):
+        """Stage changes to an object, to be saved on flush.
+
+        Args:
+            `model`: The object to save.
+            `fields`: Fields to set on the object.
+        Returns:
+            The instance of the object in the session (see `add()`).
+        """
+        model._stage_fields(fields)
+        return self.add(model)
+
+    def delete(self, model):
+        """Mark an object for deletion on flush.
+
+        Any unsaved changes to it are discarded.
+        """
+        key = self._key(model)
+        self._identity_map.pop(key, None)
+        self._new.pop(key, None)
+        self._deleted[key] = model
+
+    def dirty(self):
+        """Return the objects with changes that have not been saved yet."""
+        return [
+            model for key, model in self._identity_map.items()
+            if model._modified_fields or key in self._new
+        ]
+
+    def flush(self):
+        """Save all changes made in the session.
+
+        Objects are saved concurrently, but parent objects are saved
+        before their children (e.g. a project before its resources), so
+        that new objects can be created along with their children. For
+        the same reason, children are deleted before their parents.
+
+        Raises:
+            SessionFlushError: if some changes could not be saved. The
+                changes that were saved are not saved again.
+        """
+        failures = []
+        for level in self._levels(self.dirty()):
+            failures.extend(self._run(level, bulk.save, self._saved))
+        deleted = list(self._deleted.values())
+        for level in reversed(self._levels(deleted)):
+            failures.extend(self._run(level, bulk.delete, self._removed))
+        if failures:
+            raise SessionFlushError(failures)
+
+    def clear(self):
+        """Forget all objects and discard all unsaved changes."""
+        self._identity_map.clear()
+        self._new.clear()
+        self._deleted.clear()
+
+    def _run(self, models, operation, on_success):
+        """Run an operation on the given models concurrently.
+
+        Returns:
+            A list of `(model, exception)` tuples for the failed ones.
+        """
+        results = bulk.execute(
+            [operation(model) for model in models],
+            max_workers=self.max_workers,
+        )
+        failures = []
+        for model, result in zip(models, results):
+            if isinstance(result, Exception):
+                failures.append((model, result))
+            else:
+                on_success(model)
+        return failures
+
+    def _saved(self, model):
+        """Mark an object as saved."""
+        model._mark_saved()
+        self._new.pop(self._key(model), None)
+
+    def _removed(self, model):
+        """Mark an object as deleted."""
+        self._deleted.pop(self._key(model), None)
+
+    def _levels(self, models):
+        """Group the given models by their depth in the hierarchy of the
+        API, parents first.
+
+        The depth of a model is the number of its URL fields.
+        """
+        levels = {}
+        for model in models:
+            levels.setdefault(len(model.url_fields), []).append(model)
+        return [levels[depth] for depth in sorted(levels)]
+
+    def _key(self, model):
+        """Return the key of an object in the identity map."""
+        return (
+            type(model), tuple(sorted(model.get_url_parameters().items()))
+        )
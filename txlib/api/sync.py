@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental synchronization of local files with Transifex.
+
+`push()` uploads only the files whose content has changed since they were
+last pushed. The hashes of the pushed contents are kept in a local
+`PushManifest`, one for each (project, resource, language); the files are
+hashed concurrently, in chunks, so that checking thousands of unchanged
+files costs no request and little time:
+
+>>> manifest = PushManifest('.tx/push-manifest.json')
+>>> results = push([
+>>>     ('project', 'resource', None, 'locale/en.po'),  # the source file
+>>>     ('project', 'resource', 'el', 'locale/el.po'),
+>>> ], manifest)
+>>> uploaded = [r for r in results if r['uploaded']]
+
+The manifest can be checked against Transifex with `verify()`, which drops
+the entries of files that have changed or disappeared there since they
+were pushed, so that the next push uploads them again.
+
+`pull()` works the other way around: it downloads only the translations
+that were updated on Transifex since they were last pulled, according to
+the stats of the resources and the `last_update` of each translation kept
+in a local `PullState`:
+
+>>> state = PullState('.tx/pull-state.json')
+>>> pull(Resource.iter_all(project_slug='project'), 'locale', state,
+>>>      dry_run=True)  # the files that would be downloaded
+>>> pull(Resource.iter_all(project_slug='project'), 'locale', state)
+"""
+
+import hashlib
+import json
+import os
+
+from txlib.api import bulk
+from txlib.api.downloads import DEFAULT_PATH_TEMPLATE, download_translations
+from txlib.api.resources import Resource
+from txlib.api.translations import Translation
+from txlib.http.exceptions import NotFoundError
+from txlib.utils import DEFAULT_CHUNK_SIZE, _logger, atomic_write
+
+
+def hash_file(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Return the SHA-256 hash of a file, as a hex string.
+
+    The file is read in chunks, so that it is never held in memory as a
+    whole.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        chunk = f.read(chunk_size)
+        while chunk:
+            digest.update(chunk)
+            chunk = f.read(chunk_size)
+    return digest.hexdigest()
+
+
+def hash_files(paths, max_workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Hash the given files concurrently.
+
+    `hashlib` releases the GIL while hashing large chunks, so the files
+    are hashed in parallel, as well as read in parallel.
+
+    Args:
+        `paths`: The paths of the files.
+        `max_workers`: The maximum number of files to hash at the same
+            time. `None` for `bulk.DEFAULT_MAX_WORKERS`.
+        `chunk_size`: The size of the chunks to read, in bytes.
+    Returns:
+        A list with the hash of each file (see `hash_file()`), in the
+        order of `paths`, or the exception hashing it failed with.
+    """
+    if max_workers is None:
+        max_workers = bulk.DEFAULT_MAX_WORKERS
+    return bulk.execute(
+        [_bind(hash_file, path, chunk_size) for path in paths],
+        max_workers=max_workers, fatal_errors=(),
+    )
+
+
+class PushManifest(object):
+    """The contents of the files last pushed to Transifex.
+
+    For each (project, resource, language) the manifest keeps the hash of
+    the content last pushed, and the time Transifex last updated the
+    translation after that. The source content of a resource has a
+    language of `None`. The manifest is stored as a JSON file, which is
+    replaced atomically by `save()`.
+    """
+
+    def __init__(self, path):
+        """Initializer.
+
+        Args:
+            `path`: The path of the file of the manifest. It is loaded, if
+                it exists.
+        """
+        self.path = path
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                self._entries = json.loads(f.read().decode('utf-8'))
+
+    def get(self, project_slug, slug, lang=None):
+        """Return the entry of a file, or None if it has not been pushed.
+
+        An entry is a dictionary with the `hash` of the content and the
+        `last_update` of the translation on Transifex, if known.
+        """
+        return self._entries.get(self._key(project_slug, slug, lang))
+
+    def set(self, project_slug, slug, lang, content_hash, last_update=None):
+        """Record that the content with the given hash was pushed."""
+        self._entries[self._key(project_slug, slug, lang)] = {
+            'hash': content_hash, 'last_update': last_update,
+        }
+
+    def remove(self, project_slug, slug, lang=None):
+        """Forget a file, so that it is pushed again."""
+        self._entries.pop(self._key(project_slug, slug, lang), None)
+
+    def save(self):
+        """Write the manifest to its file."""
+        data = json.dumps(self._entries, indent=1, sort_keys=True)
+        with atomic_write(self.path) as f:
+            f.write(data.encode('utf-8'))
+
+    def __iter__(self):
+        """Iterate over the `(project_slug, slug, lang)` of all files."""
+        for key in sorted(self._entries):
+            parts = key.split('/')
+            yield tuple(parts) if len(parts) == 3 else tuple(parts) + (None,)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _key(self, project_slug, slug, lang):
+        """Return the key of a file.
+
+        Slugs and language codes cannot contain slashes, so they are
+        joined with them.
+        """
+        if lang is None:
+            return '%s/%s' % (project_slug, slug)
+        return '%s/%s/%s' % (project_slug, slug, lang)
+
+
+def push(files, manifest, max_workers=None, force=False, progress=None):
+    """Upload the files whose content has changed since the last push.
+
+    The manifest is updated with the files that were uploaded, and saved,
+    even if some uploads failed. A file that changes while it is pushed is
+    pushed again the next time.
+
+    Args:
+        `files`: The files to push, as `(project_slug, slug, lang, path)`
+            tuples. `lang` is `None` for the source file of a resource.
+        `manifest`: The `PushManifest` to compare with and update.
+        `max_workers`: The maximum number of files to hash, or requests to
+            make, at the same time. `None` for `bulk.DEFAULT_MAX_WORKERS`.
+        `force`: Whether to upload all files, even unchanged ones.
+        `progress`: A function to call with the number of uploaded files
+            and the total number of them (see `bulk.execute()`).
+    Returns:
+        A list of dictionaries, one for each file, with the
+        `project_slug`, `slug`, `lang` and `path` of the file, the `hash`
+        of its content, whether it was `uploaded` and the `error` hashing
+        or uploading it failed with, if any.
+    """
+    if max_workers is None:
+        max_workers = bulk.DEFAULT_MAX_WORKERS
+    results = [
+        {'project_slug': project_slug, 'slug': slug, 'lang': lang,
+         'path': path, 'hash': None, 'uploaded': False, 'error': None}
+        for project_slug, slug, lang, path in files
+    ]
+    hashes = hash_files([r['path'] for r in results], max_workers)
+
+    changed = []
+    for result, content_hash in zip(results, hashes):
+        if isinstance(content_hash, Exception):
+            result['error'] = content_hash
+            continue
+        result['hash'] = content_hash
+        entry = manifest.get(result['project_slug'], result['slug'],
+                             result['lang'])
+        if force or entry is None or entry['hash'] != content_hash:
+            changed.append(result)
+    _logger.info("Pushing %s of %s files.", len(changed), len(results))
+
+    uploads = bulk.execute([_upload_op(r) for r in changed],
+                           max_workers=max_workers, progress=progress)
+    uploaded = []
+    for result, upload in zip(changed, uploads):
+        if isinstance(upload, Exception):
+            result['error'] = upload
+        else:
+            result['uploaded'] = True
+            uploaded.append(result)
+
+    last_updates = _last_updates(
+        set((r['project_slug'], r['slug']) for r in uploaded
+            if r['lang'] is not None),
+        max_workers,
+    )
+    for result in uploaded:
+        stats = last_updates.get((result['project_slug'], result['slug']))
+        last_update = None
+        if result['lang'] is not None and not isinstance(stats, Exception):
+            last_update = stats.get(result['lang'], {}).get('last_update')
+        manifest.set(result['project_slug'], result['slug'], result['lang'],
+                     result['hash'], last_update)
+    manifest.save()
+    return results
+
+
+def verify(manifest, max_workers=None):
+    """Check the manifest against Transifex.
+
+    The stats of each resource in the manifest are retrieved concurrently.
+    A file is stale if its resource does not exist any more or, for
+    translations, if the translation was updated on Transifex after it was
+    pushed. Stale files are removed from the manifest, which is saved, so
+    that the next push uploads them again.
+
+    Args:
+        `manifest`: The `PushManifest` to check.
+        `max_workers`: The maximum number of requests to make at the same
+            time. `None` for `bulk.DEFAULT_MAX_WORKERS`.
+    Returns:
+        The `(project_slug, slug, lang)` of the stale files.
+    Raises:
+        txlib.http.exceptions.ServerError subclass: if the stats of a
+            resource could not be retrieved, for any other reason than
+            the resource not existing. The manifest is not changed then.
+    """
+    files = list(manifest)
+    all_stats = _last_updates(
+        set((project_slug, slug) for project_slug, slug, _ in files),
+        max_workers,
+    )
+    for stats in all_stats.values():
+        if isinstance(stats, Exception) and \
+                not isinstance(stats, NotFoundError):
+            raise stats
+
+    stale = []
+    for project_slug, slug, lang in files:
+        stats = all_stats[(project_slug, slug)]
+        if isinstance(stats, NotFoundError):
+            stale.append((project_slug, slug, lang))
+        elif lang is not None:
+            last_update = stats.get(lang, {}).get('last_update')
+            entry = manifest.get(project_slug, slug, lang)
+            if last_update is None or last_update != entry['last_update']:
+                stale.append((project_slug, slug, lang))
+    for project_slug, slug, lang in stale:
+        manifest.remove(project_slug, slug, lang)
+    _logger.info("%s of %s pushed files are stale.", len(stale), len(files))
+    manifest.save()
+    return stale
+
+
+class PullState(object):
+    """The `last_update` of the translations last pulled from Transifex.
+
+    It is stored as a compact JSON file, with an object for each resource,
+    keyed by `project_slug/slug`, which maps the language codes to the
+    `last_update` of the translations. The file is replaced atomically by
+    `save()`.
+    """
+
+    def __init__(self, path):
+        """Initializer.
+
+        Args:
+            `path`: The path of the file of the state. It is loaded, if it
+                exists.
+        """
+        self.path = path
+        self._resources = {}
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                self._resources = json.loads(f.read().decode('utf-8'))
+
+    def get(self, project_slug, slug, lang):
+        """Return the `last_update` of the translation when it was last
+        pulled, or None if it has not been pulled."""
+        key = '%s/%s' % (project_slug, slug)
+        return self._resources.get(key, {}).get(lang)
+
+    def set(self, project_slug, slug, lang, last_update):
+        """Record that the translation was pulled."""
+        key = '%s/%s' % (project_slug, slug)
+        self._resources.setdefault(key, {})[lang] = last_update
+
+    def clear(self):
+        """Forget all translations, so that they are all pulled again."""
+        self._resources = {}
+
+    def save(self):
+        """Write the state to its file."""
+        data = json.dumps(self._resources, separators=(',', ':'),
+                          sort_keys=True)
+        with atomic_write(self.path) as f:
+            f.write(data.encode('utf-8'))
+
+
+def pull(resources, dest_dir, state, languages=None, max_workers=None,
+         mode=None, path_template=DEFAULT_PATH_TEMPLATE, skip_empty=True,
+         dry_run=False, progress=None):
+    """Download the translations that were updated since the last pull.
+
+    The stats of the resources are retrieved concurrently, and a
+    translation is downloaded only if its `last_update` is not the one in
+    the state, or if its file is missing. The state is updated with the
+    translations that were downloaded, and saved, even if some downloads
+    failed.
+
+    Args:
+        `resources`: The resources, as `Resource` instances, e.g. from
+            `Resource.iter_all()`.
+        `dest_dir`: The directory to write the files to.
+        `state`: The `PullState` to compare with and update.
+        `skip_empty`: Whether to skip the languages with no translations
+            (0% completed).
+        `dry_run`: Whether to only return the files that would be
+            downloaded, without downloading them or changing the state.
+        See `txlib.api.downloads.download_translations()` for the rest of
+        the arguments.
+    Returns:
+        The manifest of the downloaded files; see
+        `txlib.api.downloads.download_translations()`.
+    """
+    def changed(entry, stats):
+        if skip_empty and stats.get('completed') in ('0%', 0):
+            return False
+        last_update = state.get(entry['project_slug'], entry['slug'],
+                                entry['lang'])
+        return last_update is None or \
+            last_update != entry['last_update'] or \
+            not os.path.exists(entry['path'])
+
+    manifest = download_translations(
+        resources, dest_dir, languages, max_workers, mode=mode,
+        path_template=path_template, progress=progress, select=changed,
+        dry_run=dry_run,
+    )
+    if dry_run:
+        return manifest
+    for entry in manifest:
+        if entry['path'] is not None and entry['error'] is None:
+            state.set(entry['project_slug'], entry['slug'], entry['lang'],
+                      entry['last_update'])
+    _logger.info("Pulled %s translations.", len(manifest))
+    state.save()
+    return manifest
+
+
+def _last_updates(resources, max_workers):
+    """Retrieve the stats of the given resources concurrently.
+
+    Args:
+        `resources`: The `(project_slug, slug)` of the resources.
+    Returns:
+        A dictionary from the `(project_slug, slug)` of each resource to
+        its stats, or the exception retrieving them failed with.
+    """
+    if max_workers is None:
+        max_workers = bulk.DEFAULT_MAX_WORKERS
+    resources = sorted(resources)
+    results = bulk.execute(
+        [Resource(project_slug=project_slug, slug=slug).get_stats
+         for project_slug, slug in resources],
+        max_workers=max_workers,
+    )
+    return dict(zip(resources, results))
+
+
+def _upload_op(result):
+    """Return an operation that uploads a file, streaming it."""
+    url_values = {'project_slug': result['project_slug'],
+                  'slug': result['slug']}
+
+    def upload():
+        if result['lang'] is None:
+            # Lazy, so that the content is updated, with no request
+            model = Resource.get(lazy=True, **url_values)
+        else:
+            model = Translation(lang=result['lang'], **url_values)
+        with open(result['path'], 'rb') as f:
+            model.save(content=f)
+    return upload
+
+
+def _bind(func, *args):
+    """Return a function that calls `func` with the given arguments."""
+    def call():
+        return func(*args)
+    return call
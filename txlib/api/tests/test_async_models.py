@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+
+import pytest
+
+from txlib.api.project import Project
+from txlib.api.resources import Resource
+from txlib.api.translations import Translation
+from txlib.registry import registry
+from txlib.tests.compat import MagicMock
+
+
+def run(coro):
+    """Run the given coroutine in a new event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class FakeAsyncHandler(object):
+    """An asynchronous HTTP handler that records all calls and returns
+    the given responses in order."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def __getattr__(self, method):
+        async def request(*args):
+            self.calls.append((method, ) + args)
+            return self.responses.pop(0)
+        return request
+
+
+@pytest.fixture
+def handler():
+    """Set up an asynchronous http handler in the registry."""
+    handler = FakeAsyncHandler()
+    registry.setup({'async_http_handler': handler,
+                    'http_handler': MagicMock()})
+    yield handler
+    registry.remove('async_http_handler')
+    registry.remove('http_handler')
+
+
+class TestAsyncModels():
+    """Test the awaitable API of the models."""
+
+    def test_aget(self, handler):
+        handler.responses = [{'id': 100, 'slug': 'resource1'}]
+        obj = run(Resource.aget(project_slug='project1', slug='resource1'))
+        assert obj.id == 100
+        assert handler.calls == [
+            ('get', '/api/2/project/project1/resource/resource1/?details',
+             None),
+        ]
+
+    def test_aget_without_details(self, handler):
+        handler.responses = [{'slug': 'resource1'}]
+        obj = run(Resource.aget(project_slug='project1', slug='resource1',
+                                details=False))
+        assert obj.slug == 'resource1'
+        assert not obj._details
+        assert handler.calls == [
+            ('get', '/api/2/project/project1/resource/resource1/', None),
+        ]
+
+    def test_aget_lazy(self, handler):
+        handler.responses = [{'id': 100}]
+
+        async def test():
+            obj = await Resource.aget(project_slug='p', slug='r', lazy=True)
+            assert obj._lazy
+            assert handler.calls == []
+            await obj.arefresh()
+            return obj
+        obj = run(test())
+        assert obj.id == 100
+        assert not obj._lazy
+        assert len(handler.calls) == 1
+
+    def test_aget_translation(self, handler):
+        handler.responses = [{'content': 'text'}]
+        obj = run(Translation.aget(project_slug='project1', slug='resource1',
+                                   lang='el'))
+        assert obj.content == 'text'
+        assert handler.calls[0][1] == \
+            '/api/2/project/project1/resource/resource1/translation/el'
+
+    def test_asave_creates_new_object(self, handler):
+        handler.responses = [{}]
+        project = Project(slug='project1')
+        run(project.asave(name='Project'))
+        method, path, data = handler.calls[0]
+        assert (method, path) == ('post', '/api/2/projects/')
+        assert json.loads(data.decode('utf-8'))['name'] == 'Project'
+        assert project.name == 'Project'
+
+    def test_asave_updates_content_separately(self, handler):
+        handler.responses = [{'id': 1}, {}, {}]
+
+        async def test():
+            resource = await Resource.aget(project_slug='p', slug='r')
+            await resource.asave(name='R', content='text')
+        run(test())
+        assert [call[:2] for call in handler.calls] == [
+            ('get', '/api/2/project/p/resource/r/?details'),
+            ('put', '/api/2/project/p/resource/r/content/'),
+            ('put', '/api/2/project/p/resource/r/?details'),
+        ]
+
+    def test_adelete(self, handler):
+        handler.responses = ['']
+        run(Project(slug='project1').adelete())
+        assert handler.calls == [
+            ('delete', '/api/2/project/project1/?details'),
+        ]
+
+    def test_aretrieve_content_and_stats(self, handler):
+        handler.responses = [{'content': 'text'}, {'el': {'completed': '1%'}}]
+        resource = Resource(project_slug='p', slug='r')
+        assert run(resource.aretrieve_content()) == 'text'
+        assert run(resource.aget_stats()) == {'el': {'completed': '1%'}}
+        assert resource.content == 'text'
@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+import json
+import logging
+
 import pytest
 
 from txlib.api.base import BaseModel
@@ -44,7 +47,7 @@ class TestBaseModel():
         assert path.count('/') == 4
         assert path == correct_path
 
-    @patch('txlib.http.http_requests.requests.request')
+    @patch('txlib.http.http_requests.requests.Session.request')
     def test_get_populates_object(self, mock_request):
         mock_request.return_value = get_mock_response(
             200, '{"id": 100, "slug": "slug"}'
@@ -62,7 +65,7 @@ class TestBaseModel():
         with pytest.raises(AttributeError):
             obj.invalid_field = ''
 
-    @patch('txlib.http.http_requests.requests.request')
+    @patch('txlib.http.http_requests.requests.Session.request')
     def test_saving_existing_object_updates_it(self, mock_request):
         mock_request.return_value = get_mock_response(
             200, '{"id": 100, "slug": "slug"}'
@@ -82,7 +85,7 @@ class TestBaseModel():
         assert obj.description == 'description'
         assert mock_request.call_count == 2
 
-    @patch('txlib.http.http_requests.requests.request')
+    @patch('txlib.http.http_requests.requests.Session.request')
     def test_saving_empty_object_does_not_make_request(self, mock_request):
         mock_request.return_value = get_mock_response(
             200, '{"id": 100, "slug": "slug"}'
@@ -95,7 +98,7 @@ class TestBaseModel():
         # to a request, because no attribute was actually set
         assert mock_request.call_count == 1
 
-    @patch('txlib.http.http_requests.requests.request')
+    @patch('txlib.http.http_requests.requests.Session.request')
     def test_delete_existing_object(self, mock_request):
         mock_request.return_value = get_mock_response(
             200, '{"id": 100, "slug": "slug"}'
@@ -108,7 +111,7 @@ class TestBaseModel():
         obj.delete()
         assert mock_request.call_count == 2
 
-    @patch('txlib.http.http_requests.requests.request')
+    @patch('txlib.http.http_requests.requests.Session.request')
     def test_saving_new_object_creates_it(self, mock_request):
         mock_request.return_value = get_mock_response(
             200, '{"id": 100, "description": "description"}'
@@ -182,7 +185,7 @@ class TestBaseModel():
 
         assert 'Invalid attribute type: yo' == excinfo.value.args[0]
 
-    @patch('txlib.http.http_requests.requests.request')
+    @patch('txlib.http.http_requests.requests.Session.request')
     def test_updating_url_field_of_object(self, mock_request):
         mock_request.return_value = get_mock_response(
             200, '{"id": 100, "slug": "slug"}'
@@ -198,3 +201,65 @@ class TestBaseModel():
 
         assert obj.slug == 'new-slug'
         assert mock_request.call_count == 2
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_refresh(self, mock_request):
+        mock_request.return_value = get_mock_response(
+            200, '{"id": 100, "slug": "slug", "name": "name"}'
+        )
+        obj = DummyModel.get(slug='slug', params={'a': 1})
+
+        mock_request.return_value = get_mock_response(
+            200, '{"id": 100, "slug": "slug", "name": "new"}'
+        )
+        obj.refresh()
+        assert obj.name == 'new'
+        assert mock_request.call_args[1]['params'] == {'a': 1}
+
+    def test_writable_fields_have_accessors(self):
+        obj = DummyModel(slug='slug')
+        obj._populated_fields = {'name': 'name'}
+        with patch.object(DummyModel, '__getattr__') as mock_getattr:
+            assert obj.name == 'name'
+            obj.description = 'description'
+            assert obj.description == 'description'
+        assert not mock_getattr.called
+        with pytest.raises(AttributeError):
+            DummyModel(slug='slug').name
+
+    def test_path_templates(self):
+        class ItemModel(BaseModel):
+            _path_to_item = 'item/%(slug)s/'
+            url_fields = {'slug'}
+
+        assert ItemModel._templates[
+            '_path_to_item', '/api/2/'
+        ] == '/api/2/item/%(slug)s/'
+        assert ItemModel(slug='a')._construct_path_to_item() == \
+            '/api/2/item/a/'
+        obj = ItemModel(prefix='/api/3/', slug='b')
+        assert obj._construct_path_to_item() == '/api/3/item/b/'
+
+    def test_has_field_and_get_field(self):
+        obj = DummyModel(slug='slug')
+        obj.name = 'name'
+        obj._populated_fields = {'id': 100}
+        assert obj.has_field('slug')
+        assert obj.has_field('name')
+        assert obj.has_field('id')
+        assert not obj.has_field('description')
+        assert obj.get_field('slug') == 'slug'
+        assert obj.get_field('name') == 'name'
+        assert obj.get_field('id') == 100
+        assert obj.get_field('description') is None
+        assert obj.get_field('description', '') == ''
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_creating_logs_no_errors(self, mock_request, caplog):
+        mock_request.return_value = get_mock_response(201, '{}')
+        obj = DummyModel(slug='slug')
+        obj.save(name='name')
+        assert json.loads(mock_request.call_args[1]['data']) == {
+            'slug': 'slug', 'name': 'name'
+        }
+        assert not [r for r in caplog.records if r.levelno >= logging.ERROR]
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import re
+import threading
+import time
+
+import pytest
+
+from txlib.api import bulk
+from txlib.api.exceptions import BulkAbortedError
+from txlib.api.project import Project
+from txlib.api.resources import Resource
+from txlib.api.translations import Translation
+from txlib.http.exceptions import AuthorizationError, NotFoundError
+from txlib.tests.compat import patch
+from txlib.api.tests.utils import clean_registry, get_mock_response, \
+    setup_registry
+
+
+@pytest.fixture(scope='module', autouse=True)
+def auto_clean_registry():
+    """Run the test and the remove the `http_handler` entry from
+    the registry."""
+    yield
+    clean_registry()
+
+
+class TestBulkExecute():
+    """Test the concurrent execution of model operations."""
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_results_are_in_order(self, mock_request):
+        def request(method, url, **kwargs):
+            # Make the first requests finish last
+            index = int(re.search(r'project(\d)', url).group(1))
+            time.sleep(0.01 * (5 - index))
+            return get_mock_response(200, '{"index": %s}' % index)
+        mock_request.side_effect = request
+        setup_registry()
+
+        ops = [bulk.get(Project, slug='project%s' % i) for i in range(5)]
+        results = bulk.execute(ops, max_workers=5)
+        assert [r.index for r in results] == list(range(5))
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_failures_are_returned(self, mock_request):
+        mock_request.side_effect = [
+            get_mock_response(200, '{}'),
+            get_mock_response(404, 'missing'),
+        ]
+        translation = Translation(project_slug='project', slug='resource',
+                                  lang='el')
+        resource = Resource(project_slug='project', slug='missing')
+        results = bulk.execute([
+            bulk.save(translation, content='{}'),
+            bulk.delete(resource),
+        ], max_workers=1)
+        assert results[0] is translation
+        assert isinstance(results[1], NotFoundError)
+
+    def test_progress(self):
+        calls = []
+        lock = threading.Lock()
+
+        def progress(done, total):
+            with lock:
+                calls.append((done, total))
+        results = bulk.execute([lambda: 1, lambda: 2, lambda: 3],
+                               progress=progress)
+        assert results == [1, 2, 3]
+        assert sorted(calls) == [(1, 3), (2, 3), (3, 3)]
+
+    def test_concurrency_is_bounded(self):
+        running = [0]
+        peak = [0]
+        lock = threading.Lock()
+
+        def op():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+        bulk.execute([op] * 20, max_workers=3)
+        assert peak[0] <= 3
+
+    def test_fatal_errors_abort_the_rest(self):
+        def fail():
+            raise AuthorizationError('no', http_code=401)
+        calls = []
+        results = bulk.execute(
+            [fail] + [lambda: calls.append(1)] * 5, max_workers=1
+        )
+        assert isinstance(results[0], AuthorizationError)
+        assert all(isinstance(r, BulkAbortedError) for r in results[1:])
+        assert calls == []
+
+    def test_no_operations(self):
+        assert bulk.execute([]) == []
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import json
+import re
+
+import pytest
+import responses
+
+from txlib.api.project import Project
+from txlib.api.resources import Resource
+from txlib.http.exceptions import NotFoundError
+from txlib.api.tests.utils import clean_registry, setup_registry
+
+API = 'http://doesntmatter.org/api/2/'
+
+
+@pytest.fixture(scope='module', autouse=True)
+def auto_clean_registry():
+    """Run the test and the remove the `http_handler` entry from
+    the registry."""
+    yield
+    clean_registry()
+
+
+def add_stats(slug, languages, status=200):
+    """Mock the stats of a resource of `project1`."""
+    responses.add(
+        responses.GET,
+        API + 'project/project1/resource/%s/stats/' % slug,
+        json=dict((lang, {'completed': '100%'}) for lang in languages),
+        status=status,
+    )
+
+
+def add_files(status=200):
+    """Mock the translation files, with their URL as their content."""
+    def callback(request):
+        return status, {}, request.url.encode('utf-8')
+    responses.add_callback(
+        responses.GET, re.compile(API + r'.*/translation/.*\?file'),
+        callback=callback,
+    )
+
+
+class TestDownloadAllTranslations():
+    """Test the concurrent download of all translations."""
+
+    @responses.activate
+    def test_resource(self, tmpdir):
+        setup_registry()
+        add_stats('resource1', ['en', 'el', 'de'])
+        add_files()
+
+        resource = Resource(project_slug='project1', slug='resource1')
+        manifest = resource.download_all_translations(
+            str(tmpdir), max_workers=3, mode='reviewed'
+        )
+        assert [e['lang'] for e in manifest] == ['de', 'el', 'en']
+        for entry in manifest:
+            assert entry['error'] is None
+            assert entry['path'] == str(tmpdir.join(entry['lang']))
+            with open(entry['path'], 'rb') as f:
+                content = f.read()
+            assert entry['size'] == len(content)
+            assert content.endswith(
+                ('/translation/%s/?file&mode=reviewed' % entry['lang'])
+                .encode('utf-8')
+            )
+        assert sorted(p.basename for p in tmpdir.listdir()) == [
+            'de', 'el', 'en'
+        ]
+
+    @responses.activate
+    def test_languages(self, tmpdir):
+        setup_registry()
+        add_stats('resource1', ['en', 'el', 'de'])
+        add_files()
+
+        resource = Resource(project_slug='project1', slug='resource1')
+        manifest = resource.download_all_translations(
+            str(tmpdir), languages=['el', 'fr'],
+            path_template='%(lang)s.po',
+        )
+        assert [e['lang'] for e in manifest] == ['el']
+        assert tmpdir.listdir() == [tmpdir.join('el.po')]
+
+    @responses.activate
+    def test_failed_download(self, tmpdir):
+        setup_registry()
+        add_stats('resource1', ['el'])
+        add_files(status=404)
+
+        resource = Resource(project_slug='project1', slug='resource1')
+        manifest = resource.download_all_translations(str(tmpdir))
+        assert isinstance(manifest[0]['error'], NotFoundError)
+        assert manifest[0]['size'] is None
+        assert tmpdir.listdir() == []
+
+    @responses.activate
+    def test_project(self, tmpdir):
+        setup_registry()
+        responses.add(
+            responses.GET, API + 'project/project1/resources/',
+            body=json.dumps([{'slug': 'resource1'}, {'slug': 'resource2'},
+                             {'slug': 'missing'}]),
+        )
+        add_stats('resource1', ['el', 'de'])
+        add_stats('resource2', ['el'])
+        add_stats('missing', [], status=404)
+        add_files()
+
+        progress = []
+        manifest = Project(slug='project1').download_all_translations(
+            str(tmpdir.join('locale')),
+            progress=lambda done, total: progress.append(total),
+        )
+        assert [(e['slug'], e['lang']) for e in manifest] == [
+            ('resource1', 'de'), ('resource1', 'el'), ('resource2', 'el'),
+            ('missing', None),
+        ]
+        assert isinstance(manifest[-1]['error'], NotFoundError)
+        assert progress == [3, 3, 3]
+        assert tmpdir.join('locale', 'resource1', 'de').check()
+        assert tmpdir.join('locale', 'resource1', 'el').check()
+        assert tmpdir.join('locale', 'resource2', 'el').check()
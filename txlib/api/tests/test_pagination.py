@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+
+import pytest
+
+from txlib.api.pagination import iter_pages
+from txlib.api.project import Project
+from txlib.api.resources import Resource
+from txlib.tests.compat import patch
+from txlib.api.tests.utils import clean_registry, get_mock_response, \
+    setup_registry
+
+
+@pytest.fixture(scope='module', autouse=True)
+def auto_clean_registry():
+    """Run the test and the remove the `http_handler` entry from
+    the registry."""
+    setup_registry()
+    yield
+    clean_registry()
+
+
+def collection(items):
+    """Return a function that responds with the requested page of the
+    given items, like the API."""
+    def request(method, url, params=None, **kwargs):
+        start, end = params['start'], params['end']
+        return get_mock_response(200, json.dumps(items[start - 1:end]))
+    return request
+
+
+class TestIterPages():
+    """Test the iteration over the pages of a collection."""
+
+    def test_pages(self):
+        calls = []
+
+        def fetch(start, end):
+            calls.append((start, end))
+            return list(range(start, min(end, 7) + 1))
+        pages = list(iter_pages(fetch, page_size=3))
+        assert pages == [[1, 2, 3], [4, 5, 6], [7]]
+        assert calls == [(1, 3), (4, 6), (7, 9)]
+
+    def test_full_last_page(self):
+        def fetch(start, end):
+            return list(range(start, min(end, 6) + 1))
+        pages = list(iter_pages(fetch, page_size=3, prefetch=False))
+        assert pages == [[1, 2, 3], [4, 5, 6]]
+
+    def test_unpaginated_collection(self):
+        def fetch(start, end):
+            return [1, 2, 3]
+        assert list(iter_pages(fetch, page_size=3)) == [[1, 2, 3]]
+        assert list(iter_pages(fetch, page_size=2)) == [[1, 2, 3]]
+
+    def test_next_page_is_prefetched(self):
+        fetched = threading.Event()
+
+        def fetch(start, end):
+            if start > 1:
+                fetched.set()
+            return [start]
+        pages = iter_pages(fetch, page_size=1)
+        assert next(pages) == [1]
+        assert fetched.wait(5)
+
+    def test_errors(self):
+        def fetch(start, end):
+            if start > 1:
+                raise ValueError('failed')
+            return [start]
+        pages = iter_pages(fetch, page_size=1)
+        assert next(pages) == [1]
+        with pytest.raises(ValueError):
+            next(pages)
+
+
+class TestIterAll():
+    """Test the iteration over the objects of a collection."""
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_resources(self, mock_request):
+        items = [{'slug': 'r%s' % i, 'name': 'R%s' % i} for i in range(5)]
+        mock_request.side_effect = collection(items)
+        resources = list(Resource.iter_all(project_slug='project',
+                                           page_size=2))
+        assert [r.slug for r in resources] == ['r0', 'r1', 'r2', 'r3', 'r4']
+        assert resources[3].project_slug == 'project'
+        assert resources[3].name == 'R3'
+        assert mock_request.call_count == 3
+        assert mock_request.call_args[0][1].endswith(
+            '/api/2/project/project/resources/'
+        )
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_projects(self, mock_request):
+        mock_request.side_effect = collection([{'slug': 'p1'}])
+        assert [p.slug for p in Project.iter_all()] == ['p1']
+
+    def test_missing_url_field(self):
+        with pytest.raises(AttributeError):
+            next(Resource.iter_all())
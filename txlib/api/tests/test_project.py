@@ -3,6 +3,7 @@ import pytest
 
 from txlib.api.project import Project
 from txlib.api.tests.utils import clean_registry, get_mock_response
+from txlib.http.exceptions import RemoteServerError
 from txlib.tests.compat import patch
 
 
@@ -16,7 +17,7 @@ def auto_clean_registry():
 class TestProjectModel():
     """Test the functionality of the Project model."""
 
-    @patch('txlib.http.http_requests.requests.request')
+    @patch('txlib.http.http_requests.requests.Session.request')
     def test_get_populates_object(self, mock_request):
         mock_request.return_value = get_mock_response(
             200, '{"id": 100, "slug": "project1"}'
@@ -26,3 +27,48 @@ class TestProjectModel():
         assert obj.id == 100
         assert obj.slug == 'project1'
         assert '{}'.format(obj) == '[Project slug=project1]'
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_get_without_details(self, mock_request):
+        mock_request.side_effect = [
+            get_mock_response(200, '{"slug": "project1", "name": "P1"}'),
+            get_mock_response(
+                200, '{"slug": "project1", "name": "P1", "teams": ["el"]}'
+            ),
+        ]
+        obj = Project.get(slug='project1', details=False)
+        assert obj.name == 'P1'
+        assert mock_request.call_args[0][1].endswith('/project/project1/')
+
+        assert obj.teams == ['el']
+        assert mock_request.call_args[0][1].endswith(
+            '/project/project1/?details'
+        )
+        assert obj.name == 'P1'
+        assert mock_request.call_count == 2
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_failed_details_are_retried(self, mock_request):
+        mock_request.side_effect = [
+            get_mock_response(200, '{"slug": "project1"}'),
+            get_mock_response(500, 'error'),
+            get_mock_response(200, '{"resources": []}'),
+        ]
+        obj = Project.get(slug='project1', details=False)
+        with pytest.raises(RemoteServerError):
+            obj.resources
+        assert obj.resources == []
+        assert mock_request.call_count == 3
+        assert mock_request.call_args[0][1].endswith(
+            '/project/project1/?details'
+        )
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_missing_detail_field(self, mock_request):
+        mock_request.return_value = get_mock_response(200, '{"name": "P1"}')
+        obj = Project.get(slug='project1', details=False)
+        with pytest.raises(AttributeError):
+            obj.missing
+        with pytest.raises(AttributeError):
+            obj.missing
+        assert mock_request.call_count == 2
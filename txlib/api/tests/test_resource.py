@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import io
+
 import pytest
 
 from txlib.api.resources import Resource
@@ -17,7 +19,7 @@ def auto_clean_registry():
 class TestResourceModel():
     """Test the functionality of the Resource model."""
 
-    @patch('txlib.http.http_requests.requests.request')
+    @patch('txlib.http.http_requests.requests.Session.request')
     def test_get_populates_object(self, mock_request):
         mock_request.return_value = get_mock_response(
             200, '{"id": 100, "slug": "resource1"}'
@@ -28,7 +30,67 @@ class TestResourceModel():
         assert obj.slug == 'resource1'
         assert '{}'.format(obj) == '[Resource slug=resource1]'
 
-    @patch('txlib.http.http_requests.requests.request')
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_lazy_get(self, mock_request):
+        mock_request.return_value = get_mock_response(
+            200, '{"id": 100, "name": "Resource1"}'
+        )
+        resource = Resource.get(project_slug='project1', slug='resource1',
+                                lazy=True)
+        assert resource.slug == 'resource1'
+        assert not mock_request.called
+
+        assert resource.name == 'Resource1'
+        assert resource.id == 100
+        assert mock_request.call_count == 1
+        assert mock_request.call_args[0][1].endswith(
+            '/project/project1/resource/resource1/?details'
+        )
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_lazy_get_missing_field(self, mock_request):
+        mock_request.return_value = get_mock_response(200, '{"id": 100}')
+        resource = Resource.get(project_slug='project1', slug='resource1',
+                                lazy=True)
+        with pytest.raises(AttributeError):
+            resource.missing
+        with pytest.raises(AttributeError):
+            resource.missing
+        assert mock_request.call_count == 1
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_lazy_save_updates(self, mock_request):
+        mock_request.return_value = get_mock_response(200, '{}')
+        resource = Resource.get(project_slug='project1', slug='resource1',
+                                lazy=True)
+        resource.save(name='Resource2')
+        assert mock_request.call_count == 1
+        assert mock_request.call_args[0][0] == 'PUT'
+        assert resource.name == 'Resource2'
+        assert mock_request.call_count == 1
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_content_is_loaded_on_demand(self, mock_request):
+        mock_request.side_effect = [
+            get_mock_response(200, '{"content": "text"}'),
+            get_mock_response(200, '{"id": 100}'),
+        ]
+        resource = Resource.get(project_slug='project1', slug='resource1',
+                                lazy=True)
+        assert resource.content == 'text'
+        assert mock_request.call_args[0][1].endswith(
+            '/project/project1/resource/resource1/content/'
+        )
+        assert resource.id == 100
+        assert resource.content == 'text'
+        assert mock_request.call_count == 2
+
+    def test_content_of_new_resource(self):
+        resource = Resource(project_slug='project1', slug='resource1')
+        with pytest.raises(AttributeError):
+            resource.content
+
+    @patch('txlib.http.http_requests.requests.Session.request')
     def test_retrieve_content(self, mock_request):
         mock_request.return_value = get_mock_response(
             200, '{"id": 100, "slug": "resource1"}'
@@ -41,7 +103,7 @@ class TestResourceModel():
         content = resource.retrieve_content()
         assert content == 'string1\nstring2\nstring3'
 
-    @patch('txlib.http.http_requests.requests.request')
+    @patch('txlib.http.http_requests.requests.Session.request')
     def test_get_stats(self, mock_request):
         mock_request.return_value = get_mock_response(
             200, '{"id": 100, "slug": "resource1"}'
@@ -54,7 +116,7 @@ class TestResourceModel():
         stats = resource.get_stats()
         assert stats == {"el": {"completed": "91%"}}
 
-    @patch('txlib.http.http_requests.requests.request')
+    @patch('txlib.http.http_requests.requests.Session.request')
     def test_save_content(self, mock_request):
         some_content = 'string1\\nstring2\\nstring3'
         mock_request.return_value = get_mock_response(
@@ -70,7 +132,7 @@ class TestResourceModel():
 
     @patch('txlib.api.resources.Resource._update')
     @patch('txlib.api.resources.Resource._create')
-    @patch('txlib.http.http_requests.requests.request')
+    @patch('txlib.http.http_requests.requests.Session.request')
     def test_create_and_update(self, mock_request, mock_create, mock_update):
         # save a new resource
         resource = Resource(project_slug='project1', slug='resource2')
@@ -98,7 +160,7 @@ class TestResourceModel():
             name='Resource2'
         )
 
-    @patch('txlib.http.http_requests.requests.request')
+    @patch('txlib.http.http_requests.requests.Session.request')
     def test_update_content(self, mock_request):
         """Test the update of a Resource when a 'content' parameter is set.
 
@@ -119,7 +181,7 @@ class TestResourceModel():
         )
         assert resource.content == 'only_one_string'
 
-    @patch('txlib.http.http_requests.requests.request')
+    @patch('txlib.http.http_requests.requests.Session.request')
     def test_update(self, mock_request):
         """Test the update of a Resource when no 'content' parameter is set."""
         mock_request.return_value = get_mock_response(
@@ -146,7 +208,7 @@ class TestResourceModel():
         )
         assert mock_post.called
 
-    @patch('txlib.http.http_requests.requests.request')
+    @patch('txlib.http.http_requests.requests.Session.request')
     @patch('txlib.http.http_requests.HttpRequest.put')
     def test_binary_file_update(self, mock_put, mock_request):
         """Test that a binary file update calls put method."""
@@ -161,3 +223,26 @@ class TestResourceModel():
             i18n_type='XLSX'
         )
         assert mock_put.called
+
+    @patch('txlib.http.http_requests.HttpRequest.post')
+    def test_file_object_create(self, mock_post):
+        """Test that a file object is passed as is to be streamed."""
+        fileobj = io.BytesIO(b'string1')
+        resource = Resource(project_slug='project1', slug='resource2')
+        resource.save(name='Resource2', content=fileobj, i18n_type='XLSX')
+        path, data, content = mock_post.call_args[0]
+        assert path == '/api/2/project/project1/resources/'
+        assert data['name'] == 'Resource2'
+        assert 'content' not in data
+        assert content is fileobj
+
+    @patch('txlib.http.http_requests.HttpRequest.download')
+    def test_download_to_fileobj(self, mock_download):
+        mock_download.return_value = 7
+        fileobj = io.BytesIO()
+        resource = Resource(project_slug='project1', slug='resource1')
+        assert resource.download_to(fileobj, chunk_size=10) == 7
+        mock_download.assert_called_once_with(
+            '/api/2/project/project1/resource/resource1/content/?file',
+            fileobj, None, 10
+        )
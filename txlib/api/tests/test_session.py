@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+import time
+
+import pytest
+
+from txlib.api.exceptions import SessionFlushError
+from txlib.api.project import Project
+from txlib.api.resources import Resource
+from txlib.api.session import Session
+from txlib.api.translations import Translation
+from txlib.http.exceptions import NotFoundError
+from txlib.tests.compat import patch
+from txlib.api.tests.utils import clean_registry, get_mock_response, \
+    setup_registry
+
+
+@pytest.fixture(scope='module', autouse=True)
+def auto_clean_registry():
+    """Run the test and the remove the `http_handler` entry from
+    the registry."""
+    setup_registry()
+    yield
+    clean_registry()
+
+
+class TestSession():
+    """Test the identity map and the unit of work of sessions."""
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_objects_are_retrieved_once(self, mock_request):
+        mock_request.return_value = get_mock_response(
+            200, '{"name": "Resource"}'
+        )
+        session = Session()
+        resource = session.get(Resource, project_slug='p', slug='r')
+        again = session.get(Resource, slug='r', project_slug='p')
+        assert again is resource
+        assert resource in session
+        assert mock_request.call_count == 1
+
+        other = session.get(Resource, project_slug='p', slug='other')
+        assert other is not resource
+        assert mock_request.call_count == 2
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_changes_are_coalesced(self, mock_request):
+        mock_request.return_value = get_mock_response(
+            200, '{"name": "Resource"}'
+        )
+        with Session() as session:
+            resource = session.get(Resource, project_slug='p', slug='r')
+            resource.name = 'New name'
+            copy = Resource(project_slug='p', slug='r')
+            copy.category = 'docs'
+            assert session.add(copy) is resource
+            session.save(resource, name='Newer name')
+            assert mock_request.call_count == 1
+
+        assert mock_request.call_count == 2
+        method, url = mock_request.call_args[0]
+        assert method == 'PUT'
+        assert json.loads(mock_request.call_args[1]['data']) == {
+            'name': 'Newer name', 'category': 'docs',
+        }
+        assert session.dirty() == []
+
+        # Nothing is saved again
+        session.flush()
+        assert mock_request.call_count == 2
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_new_objects_are_created_parents_first(self, mock_request):
+        calls = []
+
+        def request(method, url, **kwargs):
+            calls.append((method, url))
+            return get_mock_response(200, '{}')
+        mock_request.side_effect = request
+
+        with Session() as session:
+            session.save(
+                Resource(project_slug='p', slug='r'),
+                name='R', i18n_type='PO', content='',
+            )
+            session.save(
+                Project(slug='p'), name='P', source_language_code='en',
+                description='', private=False,
+            )
+        assert [method for method, _ in calls] == ['POST', 'POST']
+        assert calls[0][1].endswith('/projects/')
+        assert calls[1][1].endswith('/project/p/resources/')
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_flush_is_concurrent(self, mock_request):
+        running = [0]
+        peak = [0]
+        lock = threading.Lock()
+
+        def request(method, url, **kwargs):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            return get_mock_response(200, '{}')
+        mock_request.side_effect = request
+
+        with Session(max_workers=4) as session:
+            for lang in ('el', 'de', 'fr', 'it'):
+                session.save(
+                    Translation(project_slug='p', slug='r', lang=lang),
+                    content='{}',
+                )
+        assert mock_request.call_count == 4
+        assert peak[0] > 1
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_nothing_is_saved_on_error(self, mock_request):
+        with pytest.raises(ValueError):
+            with Session() as session:
+                session.save(
+                    Translation(project_slug='p', slug='r', lang='el'),
+                    content='{}',
+                )
+                raise ValueError()
+        assert mock_request.call_count == 0
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_delete(self, mock_request):
+        mock_request.return_value = get_mock_response(200, '{}')
+        session = Session()
+        resource = session.get(Resource, project_slug='p', slug='r')
+        resource.name = 'Unsaved'
+        session.delete(resource)
+        assert resource not in session
+        session.flush()
+        assert mock_request.call_count == 2
+        assert mock_request.call_args[0][0] == 'DELETE'
+
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_failures_are_raised_together(self, mock_request):
+        def request(method, url, **kwargs):
+            if url.endswith('/missing'):
+                return get_mock_response(404, 'missing')
+            return get_mock_response(200, '{}')
+        mock_request.side_effect = request
+
+        session = Session()
+        saved = session.save(
+            Translation(project_slug='p', slug='r', lang='el'), content='{}'
+        )
+        missing = session.save(
+            Translation(project_slug='p', slug='r', lang='missing'),
+            content='{}',
+        )
+        with pytest.raises(SessionFlushError) as exc_info:
+            session.flush()
+        failures = exc_info.value.failures
+        assert len(failures) == 1
+        assert failures[0][0] is missing
+        assert isinstance(failures[0][1], NotFoundError)
+
+        # The failed change is kept, the saved one is not
+        assert session.dirty() == [missing]
+        assert not saved._modified_fields
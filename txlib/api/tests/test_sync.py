@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+
+import pytest
+import responses
+
+from txlib.api import sync
+from txlib.api.resources import Resource
+from txlib.http.exceptions import NotFoundError, RemoteServerError
+from txlib.api.tests.utils import clean_registry, setup_registry
+
+API = 'http://doesntmatter.org/api/2/project/project1/resource/'
+
+
+@pytest.fixture(scope='module', autouse=True)
+def auto_clean_registry():
+    """Run the test and the remove the `http_handler` entry from
+    the registry."""
+    yield
+    clean_registry()
+
+
+@pytest.fixture
+def files(tmpdir):
+    """Create a source file and two translation files."""
+    tmpdir.join('en.po').write_binary(b'source')
+    tmpdir.join('el.po').write_binary(b'greek')
+    tmpdir.join('de.po').write_binary(b'german')
+    return [
+        ('project1', 'resource1', None, str(tmpdir.join('en.po'))),
+        ('project1', 'resource1', 'el', str(tmpdir.join('el.po'))),
+        ('project1', 'resource1', 'de', str(tmpdir.join('de.po'))),
+    ]
+
+
+def add_uploads():
+    """Mock the upload of the source content and the translations."""
+    responses.add(responses.PUT, API + 'resource1/content/', json={})
+    for lang in ('el', 'de'):
+        responses.add(
+            responses.PUT, API + 'resource1/translation/%s' % lang, json={}
+        )
+
+
+def add_stats(last_update='2019-09-02 12:26:55', status=200):
+    """Mock the stats of `resource1`."""
+    responses.add(
+        responses.GET, API + 'resource1/stats/', status=status,
+        json=dict((lang, {'last_update': last_update})
+                  for lang in ('en', 'el', 'de')),
+    )
+
+
+def uploaded_paths():
+    return sorted(call.request.url.split('/api/2/')[1]
+                  for call in responses.calls
+                  if call.request.method == 'PUT')
+
+
+class TestHashFiles():
+    """Test the hashing of files."""
+
+    def test_hash_files(self, tmpdir):
+        paths = []
+        for i in range(10):
+            path = tmpdir.join('%s.po' % i)
+            path.write_binary(b'x' * i * 1000)
+            paths.append(str(path))
+        paths.append(str(tmpdir.join('missing.po')))
+
+        hashes = sync.hash_files(paths, max_workers=4, chunk_size=100)
+        assert hashes[:-1] == [
+            hashlib.sha256(b'x' * i * 1000).hexdigest() for i in range(10)
+        ]
+        assert isinstance(hashes[-1], (IOError, OSError))
+
+
+class TestPush():
+    """Test the incremental push of files."""
+
+    @responses.activate
+    def test_only_changed_files_are_uploaded(self, tmpdir, files):
+        setup_registry()
+        add_uploads()
+        add_stats()
+        manifest_path = str(tmpdir.join('manifest.json'))
+
+        results = sync.push(files, sync.PushManifest(manifest_path))
+        assert all(r['uploaded'] and r['error'] is None for r in results)
+        assert uploaded_paths() == [
+            'project/project1/resource/resource1/content/',
+            'project/project1/resource/resource1/translation/de',
+            'project/project1/resource/resource1/translation/el',
+        ]
+
+        manifest = sync.PushManifest(manifest_path)
+        assert len(manifest) == 3
+        assert manifest.get('project1', 'resource1', 'el') == {
+            'hash': hashlib.sha256(b'greek').hexdigest(),
+            'last_update': '2019-09-02 12:26:55',
+        }
+        assert manifest.get('project1', 'resource1')['last_update'] is None
+
+        # Nothing has changed
+        responses.calls.reset()
+        results = sync.push(files, manifest)
+        assert not any(r['uploaded'] for r in results)
+        assert len(responses.calls) == 0
+
+        # Only the changed file is uploaded
+        tmpdir.join('el.po').write_binary(b'greek, changed')
+        results = sync.push(files, manifest)
+        assert [r['uploaded'] for r in results] == [False, True, False]
+        assert uploaded_paths() == [
+            'project/project1/resource/resource1/translation/el',
+        ]
+
+    @responses.activate
+    def test_force(self, tmpdir, files):
+        setup_registry()
+        add_uploads()
+        add_stats()
+        manifest = sync.PushManifest(str(tmpdir.join('manifest.json')))
+        sync.push(files, manifest)
+        responses.calls.reset()
+
+        sync.push(files, manifest, force=True)
+        assert len(uploaded_paths()) == 3
+
+    @responses.activate
+    def test_failed_uploads_are_not_recorded(self, tmpdir, files):
+        setup_registry()
+        responses.add(responses.PUT, API + 'resource1/content/', json={})
+        responses.add(responses.PUT, API + 'resource1/translation/el',
+                      status=404)
+        responses.add(responses.PUT, API + 'resource1/translation/de',
+                      json={})
+        add_stats()
+        files.append(('project1', 'resource1', 'fr',
+                      str(tmpdir.join('missing.po'))))
+        manifest = sync.PushManifest(str(tmpdir.join('manifest.json')))
+
+        results = sync.push(files, manifest)
+        assert [r['uploaded'] for r in results] == [True, False, True, False]
+        assert isinstance(results[1]['error'], NotFoundError)
+        assert isinstance(results[3]['error'], (IOError, OSError))
+        assert manifest.get('project1', 'resource1', 'el') is None
+        assert manifest.get('project1', 'resource1', 'de') is not None
+        assert manifest.get('project1', 'resource1', 'fr') is None
+
+
+class TestVerify():
+    """Test the verification of the manifest against Transifex."""
+
+    def create_manifest(self, tmpdir):
+        manifest = sync.PushManifest(str(tmpdir.join('manifest.json')))
+        manifest.set('project1', 'resource1', None, 'h1')
+        manifest.set('project1', 'resource1', 'el', 'h2',
+                     '2019-09-02 12:26:55')
+        manifest.set('project1', 'resource1', 'de', 'h3',
+                     '2019-09-01 10:00:00')
+        manifest.set('project1', 'resource1', 'fr', 'h4',
+                     '2019-09-02 12:26:55')
+        return manifest
+
+    @responses.activate
+    def test_stale_files_are_removed(self, tmpdir):
+        setup_registry()
+        add_stats()
+        manifest = self.create_manifest(tmpdir)
+
+        stale = sync.verify(manifest)
+        assert stale == [('project1', 'resource1', 'de'),
+                         ('project1', 'resource1', 'fr')]
+        saved = json.loads(tmpdir.join('manifest.json').read())
+        assert sorted(saved) == ['project1/resource1',
+                                 'project1/resource1/el']
+
+    @responses.activate
+    def test_missing_resource(self, tmpdir):
+        setup_registry()
+        add_stats(status=404)
+        manifest = self.create_manifest(tmpdir)
+
+        assert len(sync.verify(manifest)) == 4
+        assert len(manifest) == 0
+
+    @responses.activate
+    def test_errors_are_raised(self, tmpdir):
+        setup_registry()
+        add_stats(status=500)
+        manifest = self.create_manifest(tmpdir)
+
+        with pytest.raises(RemoteServerError):
+            sync.verify(manifest)
+        assert len(manifest) == 4
+
+
+class TestPull():
+    """Test the incremental pull of translations."""
+
+    def add_stats(self, stats, replace=False):
+        add = responses.replace if replace else responses.add
+        add(
+            responses.GET, API + 'resource1/stats/', json=dict(
+                (lang, {'last_update': last_update, 'completed': completed})
+                for lang, (last_update, completed) in stats.items()
+            ),
+        )
+
+    def downloaded(self):
+        return sorted(call.request.url.split('/translation/')[1]
+                      for call in responses.calls
+                      if '?file' in call.request.url)
+
+    @responses.activate
+    def test_only_updated_languages_are_downloaded(self, tmpdir):
+        setup_registry()
+        self.add_stats({
+            'en': ('2019-09-01 10:00:00', '100%'),
+            'el': ('2019-09-02 12:26:55', '91%'),
+            'de': ('2019-09-02 12:26:55', '0%'),
+        })
+        for lang in ('en', 'el', 'de'):
+            responses.add(
+                responses.GET, API + 'resource1/translation/%s/?file' % lang,
+                body=lang.encode('utf-8'),
+            )
+        resources = [Resource(project_slug='project1', slug='resource1')]
+        state_path = str(tmpdir.join('state.json'))
+        dest_dir = str(tmpdir.join('locale'))
+
+        # Dry run
+        manifest = sync.pull(resources, dest_dir, sync.PullState(state_path),
+                             dry_run=True)
+        assert [e['lang'] for e in manifest] == ['el', 'en']
+        assert self.downloaded() == []
+        assert not tmpdir.join('state.json').check()
+
+        manifest = sync.pull(resources, dest_dir, sync.PullState(state_path))
+        assert self.downloaded() == ['el/?file', 'en/?file']
+        assert tmpdir.join('locale', 'resource1', 'el').read() == 'el'
+        assert json.loads(tmpdir.join('state.json').read()) == {
+            'project1/resource1': {'el': '2019-09-02 12:26:55',
+                                   'en': '2019-09-01 10:00:00'},
+        }
+
+        # Nothing has changed
+        responses.calls.reset()
+        state = sync.PullState(state_path)
+        assert sync.pull(resources, dest_dir, state) == []
+        assert self.downloaded() == []
+
+        # Only the updated language and the missing file are downloaded
+        self.add_stats({
+            'en': ('2019-09-01 10:00:00', '100%'),
+            'el': ('2019-09-03 08:00:00', '95%'),
+            'de': ('2019-09-02 12:26:55', '0%'),
+        }, replace=True)
+        tmpdir.join('locale', 'resource1', 'en').remove()
+        sync.pull(resources, dest_dir, state)
+        assert self.downloaded() == ['el/?file', 'en/?file']
+        assert state.get('project1', 'resource1', 'el') == \
+            '2019-09-03 08:00:00'
+
+    @responses.activate
+    def test_failed_downloads_are_pulled_again(self, tmpdir):
+        setup_registry()
+        responses.add(
+            responses.GET, API + 'resource1/stats/',
+            json={'el': {'last_update': '2019-09-02 12:26:55',
+                         'completed': '91%'}},
+        )
+        responses.add(responses.GET,
+                      API + 'resource1/translation/el/?file', status=404)
+        resources = [Resource(project_slug='project1', slug='resource1')]
+        state = sync.PullState(str(tmpdir.join('state.json')))
+
+        manifest = sync.pull(resources, str(tmpdir), state)
+        assert isinstance(manifest[0]['error'], NotFoundError)
+        assert state.get('project1', 'resource1', 'el') is None
@@ -1,9 +1,16 @@
 # -*- coding: utf-8 -*-
 import pytest
+import responses
+import six
 
 from txlib.api.translations import Translation
+from txlib.http.exceptions import NotFoundError
 from txlib.tests.compat import patch
-from txlib.api.tests.utils import clean_registry, get_mock_response
+from txlib.api.tests.utils import clean_registry, get_mock_response, \
+    setup_registry
+
+
+py3_only = pytest.mark.skipif(six.PY2, reason='pathlib requires Python 3')
 
 
 @pytest.fixture(scope='module', autouse=True)
@@ -17,7 +24,7 @@ def auto_clean_registry():
 class TestTranslationModel():
     """Test the functionality of the Translation model."""
 
-    @patch('txlib.http.http_requests.requests.request')
+    @patch('txlib.http.http_requests.requests.Session.request')
     def test_get_translation(self, mock_request):
         mock_request.return_value = get_mock_response(
             200, u'{"content": {"Master_key": "τεστ"}}'
@@ -26,7 +33,17 @@ class TestTranslationModel():
         assert obj.lang == 'el'
         assert obj.content == {'Master_key': u'τεστ'}
 
-    @patch('txlib.http.http_requests.requests.request')
+    @patch('txlib.http.http_requests.requests.Session.request')
+    def test_get_without_details(self, mock_request):
+        mock_request.return_value = get_mock_response(200, '{"content": ""}')
+        # Translations have no light endpoint; all fields are retrieved
+        obj = Translation.get(project_slug='project1', slug='resource1',
+                              lang='el', details=False)
+        with pytest.raises(AttributeError):
+            obj.missing
+        assert mock_request.call_count == 1
+
+    @patch('txlib.http.http_requests.requests.Session.request')
     def test_put_translation(self, mock_request):
         mock_request.return_value = get_mock_response(
             200, '{\
@@ -44,7 +61,7 @@ class TestTranslationModel():
         assert translation.lang == 'el'
         assert translation.content == content
 
-    @patch('txlib.http.http_requests.requests.request')
+    @patch('txlib.http.http_requests.requests.Session.request')
     @patch('txlib.http.http_requests.HttpRequest.put')
     def test_put_translation_binary(self, mock_put, mock_req):
         """Test that a binary translation file calls put method."""
@@ -63,4 +80,62 @@ class TestTranslationModel():
         translation.save(content=b'string1\\nstring2\\nstring3\\nstring4')
         assert mock_put.called
 
+    @responses.activate
+    def test_download_to_path(self, tmpdir):
+        setup_registry()
+        responses.add(
+            responses.GET,
+            'http://doesntmatter.org/api/2/project/project1/resource/'
+            'resource1/translation/el/?file&mode=reviewed',
+            body=b'translated'
+        )
+        path = str(tmpdir.join('el.po'))
+        translation = Translation(
+            project_slug='project1', slug='resource1', lang='el'
+        )
+        assert translation.download_to(path, mode='reviewed') == 10
+        with open(path, 'rb') as f:
+            assert f.read() == b'translated'
+        assert tmpdir.listdir() == [tmpdir.join('el.po')]
+
+    @responses.activate
+    def test_failed_download_keeps_existing_file(self, tmpdir):
+        setup_registry()
+        responses.add(
+            responses.GET,
+            'http://doesntmatter.org/api/2/project/project1/resource/'
+            'resource1/translation/el/?file',
+            status=404
+        )
+        path = tmpdir.join('el.po')
+        path.write('old')
+        translation = Translation(
+            project_slug='project1', slug='resource1', lang='el'
+        )
+        with pytest.raises(NotFoundError):
+            translation.download_to(str(path))
+        assert path.read() == 'old'
+        assert tmpdir.listdir() == [path]
+
+    @responses.activate
+    @py3_only
+    def test_save_path(self, tmpdir):
+        from pathlib import Path
+
+        setup_registry()
+        responses.add(
+            responses.PUT,
+            'http://doesntmatter.org/api/2/project/project1/resource/'
+            'resource1/translation/el',
+            json={}
+        )
+        path = tmpdir.join('el.po')
+        path.write_binary(b'msgstr "translated"')
+        translation = Translation(
+            project_slug='project1', slug='resource1', lang='el'
+        )
+        translation.save(content=Path(str(path)))
 
+        request = responses.calls[0].request
+        assert request.headers['Content-Length'] == str(len(request.body))
+        assert b'\r\n\r\nmsgstr "translated"\r\n' in request.body
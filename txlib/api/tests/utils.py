@@ -6,9 +6,10 @@ class TestResponse():
     """A convenient class that represents an HTTP response, with only
     a few fields, which are necessary for testing."""
 
-    def __init__(self, status_code, content):
+    def __init__(self, status_code, content, headers=None):
         self.status_code = status_code
         self.content = content
+        self.headers = headers or {}
 
     @property
     def ok(self):
@@ -1,25 +1,71 @@
 # -*- coding: utf-8 -*-
-import json
+import sys
 
 from txlib.api.base import BaseModel
+from txlib.http.json_codecs import get_codec
+from txlib.utils import DEFAULT_CHUNK_SIZE
 
+# The asynchronous API requires `async def`
+if sys.version_info >= (3, 5):
+    from txlib.api.async_models import AsyncTranslationMixin
+else:  # pragma: no cover
+    AsyncTranslationMixin = object
 
-class Translation(BaseModel):
+
+class Translation(AsyncTranslationMixin, BaseModel):
     """Model class for translations."""
 
     _path_to_item = 'project/%(project_slug)s/resource/%(slug)s/translation/%(lang)s'  # noqa
     _path_to_collection = 'project/%(project_slug)s/resource/'\
                           '%(slug)s/translation/%(lang)s'
+    _path_to_file = 'project/%(project_slug)s/resource/'\
+                    '%(slug)s/translation/%(lang)s/?file'
 
     writable_fields = {'content'}
     url_fields = {'project_slug', 'slug', 'lang'}
 
-    def _create(self, **kwargs):
-        """Create the translation of a resource.
+    def download_to(self, path_or_fileobj, mode=None,
+                    chunk_size=DEFAULT_CHUNK_SIZE, deadline=None):
+        """Download the translation file.
+
+        The file is written in chunks as it is downloaded, so that it is
+        never held in memory as a whole.
+
+        Args:
+            `path_or_fileobj`: The path of the file to write to, or a file
+                object opened in binary mode. A file at the given path is
+                replaced atomically, once the download has finished.
+            `mode`: The mode of the file (e.g. `reviewed`, `translator`
+                or `onlytranslated`). `None` for the default one.
+            `chunk_size`: The size of the chunks to write, in bytes.
+            `deadline`: The number of seconds, or the
+                `txlib.http.timeouts.Deadline`, the request may take.
+        Returns:
+            The number of bytes written.
+        """
+        with self._deadline_scope(deadline):
+            return self._download(
+                self._construct_path_to_file(), path_or_fileobj,
+                self._file_params(mode), chunk_size
+            )
+
+    def _file_params(self, mode):
+        """Return the query parameters for a file of the given mode."""
+        if mode is None:
+            return None
+        return {'mode': mode}
+
+    def _construct_path_to_file(self):
+        """Construct the path to the translation file."""
+        template = self._path_template('_path_to_file')
+        return template % self.get_url_parameters()
 
-        The _create function differentiates from the one in the BaseModel
-        in the HTTP request that takes place in the end. In the Translation
-        object's case, it needs to be `PUT`, while in the BaseModel is `POST`
+    def _create_request(self, **kwargs):
+        """Return the request that creates the translation of a resource.
+
+        The request differentiates from the one in the BaseModel
+        in the HTTP method used. In the Translation object's case,
+        it needs to be `PUT`, while in the BaseModel is `POST`
         """
         path = self._construct_path_to_collection()
         content = kwargs['content']
@@ -27,16 +73,14 @@ class Translation(BaseModel):
 
         # Use the fields for which we have values
         for field in self.writable_fields:
-            try:
-                value = getattr(self, field)
-                kwargs[field] = value
-                # on binary files pass the content as a separate parameter (not in kwargs)
-                if field == 'content' and is_binary:
-                    kwargs.pop('content', None)
-            except AttributeError:
-                pass
+            if self.has_field(field):
+                kwargs[field] = self.get_field(field)
+        # on binary files pass the content as a separate parameter
+        # (not in kwargs)
+        if is_binary:
+            kwargs.pop('content', None)
 
         if is_binary:
-            return self._http.put(path, kwargs, content)
+            return 'put', path, kwargs, content
 
-        return self._http.put(path, json.dumps(kwargs))
+        return 'put', path, get_codec().dumps(kwargs)
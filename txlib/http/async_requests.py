@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+"""
+Asynchronous http requests handler.
+
+This module requires Python 3 and the `aiohttp` package, which can be
+installed with `pip install txlib[async]`.
+"""
+
+import asyncio
+import base64
+import time
+
+import aiohttp
+from requests.auth import HTTPBasicAuth
+
+from txlib.utils import DEFAULT_CHUNK_SIZE, _logger
+from txlib.http.auth import AnonymousAuth
+from txlib.http.base import BaseRequest
+from txlib.http.coalesce import SingleFlight
+from txlib.http.exceptions import (
+    DeadlineExceededError, NoResponseError, ServerError
+)
+from txlib.http.json_codecs import get_codec
+from txlib.http.multipart import MultipartEncoder, open_content
+from txlib.http.timeouts import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+
+
+class AsyncSingleFlight(SingleFlight):
+    """Make sure only one call with the same key is in flight at a time,
+    among the tasks of an event loop.
+
+    See `txlib.http.coalesce.SingleFlight`.
+    """
+
+    async def do(self, key, func, *args, timeout=None):
+        """Await `func(*args)`, unless a call with the same key is in
+        flight.
+
+        See `SingleFlight.do()`.
+        """
+        loop = asyncio.get_event_loop()
+        key = (self._generation, id(loop), key)
+        future = self._calls.get(key)
+        if future is not None:
+            # Followers must not cancel the call if they are cancelled
+            try:
+                return await asyncio.wait_for(asyncio.shield(future),
+                                              timeout)
+            except asyncio.TimeoutError:
+                raise DeadlineExceededError(
+                    "Deadline exceeded waiting for a request in flight."
+                )
+
+        future = self._calls[key] = loop.create_future()
+        try:
+            result = await func(*args)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody may be waiting for it; do not log it as unretrieved
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+
+class AsyncHttpRequest(BaseRequest):
+    """Asynchronous http requests handler, built on `aiohttp`.
+
+    It offers the same interface as `HttpRequest`, but all request methods
+    are coroutines. Errors are mapped to the same exceptions.
+
+    The underlying `aiohttp.ClientSession` is created on the first request
+    and is bound to the running event loop. Call `close()` (or use the
+    handler as an async context manager) to release its connections.
+    """
+
+    def __init__(self, hostname, auth=AnonymousAuth(), limit=100,
+                 limit_per_host=0, retry=None, rate_limiter=None,
+                 cache=None, instrumentation=None, coalesce=True,
+                 circuit_breaker=None, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT):
+        """Initializer.
+
+        Args:
+            `hostname`: The host for the requests.
+            `auth`: The authentication info needed for any requests.
+            `limit`: The maximum number of simultaneous connections.
+            `limit_per_host`: The maximum number of simultaneous connections
+                to a single host. 0 means no limit.
+            `retry`: The `txlib.http.retry.RetryPolicy` for failed requests.
+                `None` disables retries.
+            `rate_limiter`: The `txlib.http.ratelimit.RateLimiter` to use
+                for all requests. `None` disables rate limiting.
+            `cache`: The cache to keep the responses of GET requests in.
+                `None` disables caching.
+            `instrumentation`: The
+                `txlib.http.instrumentation.Instrumentation` to report
+                the requests to. `None` disables instrumentation.
+            `coalesce`: Whether concurrent identical GET requests should
+                share a single request, and its response.
+            `circuit_breaker`: The `txlib.http.circuit.CircuitBreaker` that
+                stops requests to failing hosts. `None` disables it.
+            `connect_timeout`: The number of seconds to wait for a
+                connection to the server. `None` for no limit.
+            `read_timeout`: The number of seconds to wait for the server
+                to send data. `None` for no limit.
+        """
+        super(AsyncHttpRequest, self).__init__(
+            hostname, auth=auth, retry=retry, rate_limiter=rate_limiter,
+            cache=cache, instrumentation=instrumentation, coalesce=coalesce,
+            circuit_breaker=circuit_breaker, connect_timeout=connect_timeout,
+            read_timeout=read_timeout
+        )
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._session = None
+        self._session_loop = None
+
+    _single_flight_class = AsyncSingleFlight
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def get(self, path, params=None, deadline=None):
+        """Make a GET request.
+
+        Args:
+            `path`: The path to the resource.
+            `params`: The query parameters of the request.
+            `deadline`: The `txlib.http.timeouts.Deadline` of the request,
+                if any.
+        Returns:
+            The content of the response.
+        Raises:
+            An exception depending on the HTTP status code of the response.
+        """
+        return get_codec().loads(
+            await self._make_request('GET', path, params=params,
+                                     deadline=deadline)
+        )
+
+    async def post(self, path, data, content=None, deadline=None):
+        """Make a POST request.
+
+        See `HttpRequest.post()` for the arguments.
+        """
+        return await self._send('POST', path, data, content, deadline)
+
+    async def put(self, path, data, content=None, deadline=None):
+        """Make a PUT request.
+
+        See `HttpRequest.put()` for the arguments.
+        """
+        return await self._send('PUT', path, data, content, deadline)
+
+    async def delete(self, path, deadline=None):
+        """Make a DELETE request.
+
+        Args:
+            `path`: The path to the resource.
+            `deadline`: The `txlib.http.timeouts.Deadline` of the request,
+                if any.
+        Returns:
+            The content of the response.
+        Raises:
+            An exception depending on the HTTP status code of the response.
+        """
+        return self._decode_text(
+            await self._make_request('DELETE', path, deadline=deadline)
+        )
+
+    async def close(self):
+        """Close the session and all of its connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def download(self, path, fileobj, params=None,
+                       chunk_size=DEFAULT_CHUNK_SIZE, deadline=None):
+        """Make a GET request and write the body of the response to a file.
+
+        See `HttpRequest.download()` for the arguments.
+        """
+        kwargs = {}
+        url = self._prepare_request('GET', path, kwargs)
+        try:
+            start = fileobj.tell()
+        except (AttributeError, IOError, OSError):
+            start = None
+
+        async def write(res):
+            written = 0
+            async for chunk in res.content.iter_chunked(chunk_size):
+                if deadline is not None and deadline.expired():
+                    raise self._deadline_error(url)
+                fileobj.write(chunk)
+                written += len(chunk)
+            _logger.debug("Downloaded %s bytes.", written)
+            return written
+
+        async def download_once(event=None, deadline=None):
+            if start is not None:
+                fileobj.seek(start)
+                fileobj.truncate()
+            written = await self._request_once('GET', url, None, params,
+                                               kwargs, read=write,
+                                               event=event,
+                                               deadline=deadline)
+            if event is not None:
+                event.response_bytes = written
+            return written
+
+        return await self._retrying('GET', url, download_once,
+                                    retry=start is not None,
+                                    deadline=deadline)
+
+    async def _make_request(self, method, path, data=None, params=None,
+                            deadline=None, **kwargs):
+        """Make a request.
+
+        Use `aiohttp` to actually perform the request.
+
+        Args:
+            `method`: The method to use.
+            `path`: The path to the resource.
+            `data`: Any data to send (for POST and PUT requests).
+            `params`: The query parameters of the request.
+            `deadline`: The `txlib.http.timeouts.Deadline` of the request,
+                if any.
+            `kwargs`: Other parameters for `aiohttp`.
+        Returns:
+            The content of the response.
+        Raises:
+            An exception depending on the HTTP status code of the response.
+        """
+        url = self._prepare_request(method, path, kwargs)
+
+        key, entry = self._cached_entry(method, url, params, kwargs)
+        if entry is not None and entry.is_fresh():
+            _logger.debug("Using cached response.")
+            return entry.content
+
+        if method == 'GET' and self._single_flight is not None:
+            return await self._single_flight.do(
+                self._cache_key(url, params), self._fetch, method, url, data,
+                params, kwargs, key, entry, deadline,
+                timeout=self._wait_timeout(deadline)
+            )
+        return await self._fetch(method, url, data, params, kwargs, key,
+                                 entry, deadline)
+
+    async def _fetch(self, method, url, data, params, kwargs, key, entry,
+                     deadline=None):
+        """Make a request, retrying if needed, and return the content of
+        its response.
+
+        See `HttpRequest._fetch()`.
+        """
+        generation = self._cache.generation if key is not None else None
+        status, headers, content = await self._retrying(
+            method, url, self._request_once, method, url, data, params,
+            kwargs, deadline=deadline
+        )
+        _logger.debug("Request was successful.")
+        return self._response_content(
+            key, entry, status, headers, content, generation
+        )
+
+    def _prepare_request(self, method, path, kwargs):
+        """Add the authentication info and custom headers to the
+        arguments of a request.
+
+        See `HttpRequest._prepare_request()`.
+        """
+        _logger.debug("Method for request is %s", method)
+        url = self._construct_full_url(path)
+        _logger.debug("URL for request is %s", url)
+        self._auth_info.populate_request_data(kwargs)
+        auth = kwargs.pop('auth', None)
+        if isinstance(auth, HTTPBasicAuth):
+            credentials = '%s:%s' % (auth.username, auth.password)
+            kwargs.setdefault('headers', {})['Authorization'] = 'Basic %s' % (
+                base64.b64encode(credentials.encode('utf-8')).decode('ascii')
+            )
+
+        # Add custom headers for the request
+        if self._auth_info._headers:
+            kwargs.setdefault('headers', {}).update(self._auth_info._headers)
+        return url
+
+    async def _retrying(self, method, url, func, *args, retry=True,
+                        deadline=None):
+        """Await `func(*args)`, retrying according to the retry policy.
+
+        See `HttpRequest._retrying()`.
+        """
+        event = self._request_started(method, url)
+        started = time.time()
+        attempt = 0
+        exception = None
+        try:
+            while True:
+                attempt += 1
+                try:
+                    return await func(*args, event=event, deadline=deadline)
+                except ServerError as e:
+                    delay = None
+                    if retry:
+                        delay = self._retry_delay(method, e, attempt, started,
+                                                  deadline)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+        except Exception as e:
+            exception = e
+            raise
+        finally:
+            self._invalidate_cache(method, url)
+            self._request_finished(event, attempt, exception)
+
+    async def _request_once(self, method, url, data, params, kwargs,
+                            read=None, event=None, deadline=None):
+        """Make a single attempt of a request.
+
+        See `HttpRequest._request_once()` for the arguments. `read` is
+        a coroutine function that consumes a successful response.
+
+        Returns:
+            The return value of `read`; by default a
+            `(status, headers, content)` tuple.
+        Raises:
+            CircuitOpenError: if the circuit breaker does not let the
+                request through.
+            DeadlineExceededError: if the deadline passes before the
+                response is received.
+            An exception depending on the HTTP status code of the response.
+        """
+        if event is not None:
+            event.request_bytes = self._body_size(data)
+        # Streamed bodies are consumed by each attempt
+        if isinstance(data, MultipartEncoder):
+            data.rewind()
+            data = self._stream(data)
+
+        delay = self._throttle_delay(method, url)
+        if delay:
+            if deadline is not None and delay >= deadline.remaining():
+                raise self._deadline_error(url)
+            await asyncio.sleep(delay)
+
+        kwargs = dict(kwargs, timeout=self._client_timeout(url, deadline))
+        self._circuit_allow(url)
+        error = None
+        try:
+            return await self._send_request(method, url, data, params,
+                                            kwargs, read, event, deadline)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._circuit_record(url, error)
+
+    async def _send_request(self, method, url, data, params, kwargs, read,
+                            event, deadline=None):
+        """Send a request and check its response.
+
+        See `_request_once()`.
+        """
+        session = self._get_session()
+        try:
+            async with session.request(method, url, data=data, params=params,
+                                       **kwargs) as res:
+                if event is not None:
+                    event.status = res.status
+                if res.status < 400:
+                    if read is not None:
+                        return await read(res)
+                    result = await self._read(res)
+                    if event is not None:
+                        event.response_bytes = len(result[2])
+                    return result
+                content = await res.read()
+                if event is not None:
+                    event.response_bytes = len(content)
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+                asyncio.TimeoutError) as e:
+            if deadline is not None and deadline.expired():
+                raise self._deadline_error(url)
+            msg = "No response from URL: %s (%s)" % (url, e)
+            _logger.error(msg)
+            raise NoResponseError(msg)
+
+        _logger.debug("Response was %s:%s", res.status, content)
+        raise self._exception_for(res.status)(
+            content, http_code=res.status, headers=res.headers
+        )
+
+    def _client_timeout(self, url, deadline=None):
+        """Return the `aiohttp.ClientTimeout` of the next attempt of
+        a request.
+
+        See `BaseRequest._timeouts()`.
+        """
+        connect, read = self._timeouts(url, deadline)
+        total = deadline.remaining() if deadline is not None else None
+        return aiohttp.ClientTimeout(total=total, sock_connect=connect,
+                                     sock_read=read)
+
+    async def _read(self, res):
+        """Read a whole response."""
+        return res.status, res.headers, await res.read()
+
+    async def _send(self, method, path, data, content, deadline=None):
+        """Send data to a remote server, either with a POST or a PUT request.
+
+        Args:
+            `method`: The method (POST or PUT) to use.
+            `path`: The path to the resource.
+            `data`: The data to send.
+            `content`: The content of the file to send, if any.
+                See `HttpRequest.post()`.
+            `deadline`: The `txlib.http.timeouts.Deadline` of the request,
+                if any.
+        Returns:
+            The content of the response.
+        Raises:
+            An exception depending on the HTTP status code of the response.
+        """
+        if content is None:
+            headers = {'Content-type': 'application/json'}
+            return self._decode_text(await self._make_request(
+                method, path, data=data, headers=headers, deadline=deadline
+            ))
+
+        with open_content(content) as fileobj:
+            body = MultipartEncoder(data, {'file': fileobj})
+            headers = {
+                'Content-type': body.content_type,
+                'Content-Length': str(len(body)),
+            }
+            return self._decode_text(await self._make_request(
+                method, path, data=body, headers=headers, deadline=deadline
+            ))
+
+    async def _stream(self, body):
+        """Yield the chunks of a streamed body.
+
+        The chunks are read in the default executor, so that reading
+        a file does not block the event loop.
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            chunk = await loop.run_in_executor(None, body.read,
+                                               DEFAULT_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def _get_session(self):
+        """Return the session to use, bound to the running event loop."""
+        loop = asyncio.get_event_loop()
+        if self._session is None or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self._limit, limit_per_host=self._limit_per_host,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._session_loop = loop
+        return self._session
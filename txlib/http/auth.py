@@ -4,6 +4,9 @@ Authentication related module.
 """
 from __future__ import unicode_literals
 
+import hashlib
+import json
+
 from requests.auth import HTTPBasicAuth
 
 
@@ -51,6 +54,15 @@ class AuthInfo(object):
         """
         return request_args
 
+    def fingerprint(self):
+        """Return a digest of the credentials, which keeps the responses
+        cached for different users apart, or None if there are none.
+
+        The custom headers count as credentials, since they may carry
+        a token.
+        """
+        return _digest(getattr(self, '_headers', None))
+
 
 class BasicAuth(AuthInfo):
     """Class for basic authentication support."""
@@ -85,6 +97,11 @@ class BasicAuth(AuthInfo):
             self._username, self._password)
         return request_args
 
+    def fingerprint(self):
+        """Return a digest of the credentials; see
+        `AuthInfo.fingerprint()`."""
+        return _digest([self._username, self._password, self._headers])
+
 
 class AnonymousAuth(AuthInfo):
     """Class for anonymous access."""
@@ -96,3 +113,12 @@ class AnonymousAuth(AuthInfo):
             in every request to the Transifex API.
         """
         self._headers = headers
+
+
+def _digest(credentials):
+    """Return a short digest of the given credentials, or None if they
+    are empty."""
+    if not credentials:
+        return None
+    data = json.dumps(credentials, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()[:16]
@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import with_statement
+import time
 from six.moves.urllib import parse as urlparse
 from txlib.http import exceptions
 from txlib.http.auth import AnonymousAuth
+from txlib.http.cache import cache_key
+from txlib.http.coalesce import SingleFlight
+from txlib.http.timeouts import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
 from txlib.utils import _logger
 
 
@@ -16,6 +20,7 @@ class BaseRequest(object):
         403: exceptions.AuthenticationError,
         404: exceptions.NotFoundError,
         409: exceptions.ConflictError,
+        429: exceptions.TooManyRequestsError,
     }
 
     success = {
@@ -30,11 +35,19 @@ class BaseRequest(object):
         403: "Authentication error: %s",
         404: "Entity was not found: %s",
         409: "Error with the request: %s",
+        429: "Too many requests: %s",
     }
 
     default_scheme = 'https'
 
-    def __init__(self, hostname, auth=AnonymousAuth()):
+    # The class that coalesces concurrent requests
+    _single_flight_class = SingleFlight
+
+    def __init__(self, hostname, auth=AnonymousAuth(), retry=None,
+                 rate_limiter=None, cache=None, instrumentation=None,
+                 coalesce=True, circuit_breaker=None,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT):
         """Initializer for the base class.
 
         Save the hostname to use for all requests as well as any
@@ -43,10 +56,35 @@ class BaseRequest(object):
         Args:
             hostname: The host for the requests.
             auth: The authentication info needed for any requests.
+            retry: The `txlib.http.retry.RetryPolicy` for failed requests.
+                `None` disables retries.
+            rate_limiter: The `txlib.http.ratelimit.RateLimiter` to use
+                for all requests. `None` disables rate limiting.
+            cache: The cache (e.g. `txlib.http.cache.MemoryCache`) to keep
+                the responses of GET requests in. `None` disables caching.
+            instrumentation: The `txlib.http.instrumentation.Instrumentation`
+                to report the requests to.
+            coalesce: Whether concurrent identical GET requests should
+                share a single request.
+            circuit_breaker: The `txlib.http.circuit.CircuitBreaker` that
+                stops requests to failing hosts. `None` disables it.
+            connect_timeout: The number of seconds to wait for a connection
+                to the server. `None` for no limit.
+            read_timeout: The number of seconds to wait for the server to
+                send data. `None` for no limit.
         """
         self._hostname = self._construct_full_hostname(hostname)
-        _logger.debug("Hostname is %s" % self._hostname)
+        _logger.debug("Hostname is %s", self._hostname)
         self._auth_info = auth
+        self._retry = retry
+        self._rate_limiter = rate_limiter
+        self._cache = cache
+        self._instrumentation = instrumentation
+        self._circuit_breaker = circuit_breaker
+        self._connect_timeout = connect_timeout
+        self._read_timeout = read_timeout
+        self._single_flight = self._single_flight_class() if coalesce \
+            else None
 
     def _construct_full_hostname(self, hostname):
         """Create a full (scheme included) hostname from the argument given.
@@ -71,6 +109,215 @@ class BaseRequest(object):
         """Construct the full url from the host and the path parts."""
         return urlparse.urljoin(self._hostname, path)
 
+    def _retry_delay(self, method, exc, attempt, started, deadline=None):
+        """Return the seconds to wait before retrying a failed request.
+
+        Args:
+            `method`: The HTTP method of the request.
+            `exc`: The exception the last attempt failed with.
+            `attempt`: The number of attempts made so far.
+            `started`: The time of the first attempt.
+            `deadline`: The `Deadline` of the request, if any.
+        Returns:
+            The delay, or None if the request should not be retried.
+        """
+        if self._retry is None:
+            return None
+        delay = self._retry.get_delay(
+            method, exc, attempt, time.time() - started
+        )
+        if delay is not None and deadline is not None and \
+                delay >= deadline.remaining():
+            _logger.debug("No time left to retry the request.")
+            return None
+        if delay is not None:
+            _logger.warning(
+                "%s request failed (%s), retrying in %.2f seconds.",
+                method, exc.__class__.__name__, delay
+            )
+        return delay
+
+    def _request_started(self, method, url):
+        """Report the start of a request to the instrumentation.
+
+        Returns:
+            The `RequestEvent` of the request, or None if the handler is
+            not instrumented.
+        """
+        if self._instrumentation is None:
+            return None
+        return self._instrumentation.request_started(method, url)
+
+    def _request_finished(self, event, attempts, exception=None):
+        """Report the end of a request to the instrumentation.
+
+        Args:
+            `event`: The `RequestEvent` of the request, if any.
+            `attempts`: The number of attempts made.
+            `exception`: The exception the request failed with, if any.
+        """
+        if event is None:
+            return
+        event.retries = max(0, attempts - 1)
+        if self._circuit_breaker is not None:
+            event.circuit_state = self._circuit_breaker.state(event.url)
+        self._instrumentation.request_finished(event, exception)
+
+    def _circuit_allow(self, url):
+        """Check that the circuit breaker lets a request through.
+
+        Raises:
+            CircuitOpenError: if the circuit of the host is open.
+        """
+        if self._circuit_breaker is not None:
+            self._circuit_breaker.allow(url)
+
+    def _circuit_record(self, url, exception=None):
+        """Report the outcome of a request to the circuit breaker."""
+        if self._circuit_breaker is not None:
+            self._circuit_breaker.record(url, exception)
+
+    def _body_size(self, data):
+        """Return the size of the body of a request."""
+        if data is None:
+            return 0
+        try:
+            return len(data)
+        except TypeError:
+            return 0
+
+    def _timeouts(self, url, deadline=None):
+        """Return the `(connect, read)` timeouts of the next attempt of
+        a request, so that it does not go past its deadline.
+
+        Raises:
+            DeadlineExceededError: if the deadline has passed.
+        """
+        connect, read = self._connect_timeout, self._read_timeout
+        if deadline is None:
+            return connect, read
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            raise self._deadline_error(url)
+        if connect is None or connect > remaining:
+            connect = remaining
+        if read is None or read > remaining:
+            read = remaining
+        return connect, read
+
+    def _wait_timeout(self, deadline):
+        """Return the number of seconds a request with the given deadline
+        may wait for an identical request in flight.
+        """
+        if deadline is None:
+            return None
+        return deadline.remaining()
+
+    def _deadline_error(self, url):
+        """Return the exception for a request that ran out of time."""
+        msg = "Deadline exceeded for URL: %s" % url
+        _logger.error(msg)
+        return exceptions.DeadlineExceededError(msg)
+
+    def _throttle_delay(self, method, url):
+        """Return the seconds to wait before making a request, so that
+        the rate limit is not exceeded.
+
+        Raises:
+            RateLimitExceededError: if the request should not be made.
+        """
+        if self._rate_limiter is None:
+            return 0
+        return self._rate_limiter.reserve(method, url)
+
+    def _cached_entry(self, method, url, params, kwargs):
+        """Look up the cached response of a request.
+
+        If the cached response is stale, the request is made conditional.
+
+        Args:
+            `method`: The HTTP method of the request.
+            `url`: The full url of the request.
+            `params`: The query parameters of the request.
+            `kwargs`: The arguments of the request; any conditional
+                headers are added to them.
+        Returns:
+            A `(key, entry)` tuple with the cache key of the request and
+            the cached entry for it. The key is None if the response should
+            not be cached and the entry is None if nothing is cached.
+        """
+        if self._cache is None or method != 'GET':
+            return None, None
+        key = self._cache_key(url, params)
+        entry = self._cache.get(key)
+        if entry is not None and not entry.is_fresh():
+            kwargs.setdefault('headers', {}).update(
+                entry.conditional_headers()
+            )
+        return key, entry
+
+    def _cache_key(self, url, params):
+        """Return the cache key of a GET request, which also tells the
+        requests of different users apart."""
+        return cache_key(url, params, self._auth_info.fingerprint())
+
+    def _invalidate_cache(self, method, url):
+        """Invalidate the cached responses affected by a request.
+
+        Only POST, PUT and DELETE requests affect cached responses. They
+        also keep later GET requests from sharing the responses of the
+        ones in flight.
+        """
+        if method == 'GET':
+            return
+        if self._cache is not None:
+            self._cache.invalidate(url)
+        if self._single_flight is not None:
+            self._single_flight.forget()
+
+    def _response_content(self, key, entry, status, headers, content,
+                          generation=None):
+        """Return the content of a successful response.
+
+        If the response is a `304 Not Modified`, the content of the cached
+        entry is returned. Otherwise, the response is cached, if needed.
+
+        Args:
+            `key`: The cache key of the request.
+            `entry`: The cached entry of the request.
+            `status`: The HTTP status code of the response.
+            `headers`: The headers of the response.
+            `content`: The body of the response (bytes).
+            `generation`: The generation of the cache before the request
+                was made; see `BaseCache.store()`.
+        Returns:
+            The body of the response, or the cached one.
+        """
+        if status == 304 and entry is not None:
+            _logger.debug("Content was not modified.")
+            self._cache.store(
+                key, entry.content, entry.etag, entry.last_modified,
+                generation
+            )
+            return entry.content
+        if key is not None:
+            self._cache.store(
+                key, content, headers.get('ETag'),
+                headers.get('Last-Modified'), generation
+            )
+        return content
+
+    def _decode_text(self, content):
+        """Decode the body of a response to text.
+
+        Args:
+            `content`: The body of the response; cached bodies may already
+                be text.
+        """
+        if isinstance(content, bytes):
+            return content.decode('utf-8')
+        return content
+
     def _error_message(self, code, msg):
         """Return the message that corresponds to the
         request (status code and error message) specified.
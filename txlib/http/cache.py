@@ -0,0 +1,559 @@
+# -*- coding: utf-8 -*-
+"""
+Caches for the responses of the http handlers.
+
+A handler given a `cache` keeps the responses to GET requests in it:
+
+>>> conn = HttpRequest(host, auth=credentials, cache=MemoryCache(
+>>>     max_bytes=50 * 1024 * 1024,
+>>>     ttls={'project/%(slug)s/?details': 3600, '/stats/': 10},
+>>> ))
+
+A cached response is used without making any request for as long as it
+is fresh, according to the TTL of the first pattern that matches its URL
+(`default_ttl` if none matches). See `txlib.utils.compile_path_pattern()`
+for the syntax of the patterns.
+
+The cache also remembers the `ETag` and `Last-Modified` headers of the
+responses. Requests for URLs with stale cached responses are made
+conditional (with `If-None-Match` and `If-Modified-Since` headers) and, if
+the server responds with `304 Not Modified`, the cached response is used
+and becomes fresh again.
+
+Successful or not, any POST, PUT or DELETE request invalidates the cached
+responses for its URL, for any URL under it and for any URL it is under.
+A write under a resource invalidates everything under the resource, since
+it may change any of it. For example, updating the content of a resource
+or one of its translations invalidates the cached content, translations,
+stats and details of the resource, as well as the details of its project.
+A response to a GET request that was in flight while a write invalidated
+its URL is not cached, since it may predate the write.
+
+Responses are cached per user: requests made with different credentials
+do not share them.
+
+`MemoryCache` keeps the responses in the memory of the process, while
+`DiskCache` keeps them in an sqlite database that can be shared by many
+processes, e.g. by successive runs of a command-line tool:
+
+>>> conn = HttpRequest(host, auth=credentials, cache=DiskCache(
+>>>     '/var/cache/myapp', max_bytes=200 * 1024 * 1024,
+>>> ))
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+import six
+from six.moves.urllib.parse import urlencode
+
+from txlib.utils import _logger, compile_path_pattern
+
+
+class CacheEntry(object):
+    """A cached response."""
+
+    __slots__ = ('content', 'etag', 'last_modified', 'expires')
+
+    def __init__(self, content, etag=None, last_modified=None, expires=None):
+        """Initializer.
+
+        Args:
+            `content`: The body of the response.
+            `etag`: The value of the `ETag` header of the response.
+            `last_modified`: The value of the `Last-Modified` header
+                of the response.
+            `expires`: The time after which the entry is stale. `None`
+                if it is always stale.
+        """
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+
+    @property
+    def size(self):
+        """The approximate size of the entry in memory, in bytes."""
+        return len(self.content) + len(self.etag or '') + \
+            len(self.last_modified or '')
+
+    def is_fresh(self, now=None):
+        """Return whether the entry can be used without revalidation."""
+        if self.expires is None:
+            return False
+        return (now if now is not None else time.time()) < self.expires
+
+    def conditional_headers(self):
+        """Return the headers that make a request for this entry
+        conditional."""
+        headers = {}
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class BaseCache(object):
+    """Base class for response caches.
+
+    It implements the freshness and invalidation policy. Subclasses
+    implement the storage, with the `get()`, `set()`, `delete()`,
+    `clear()` and `_invalidate()` methods.
+    """
+
+    # The path patterns of the objects everything under which is
+    # invalidated by a write to anything under them
+    invalidation_scopes = ('project/*/resource/*/', )
+
+    # The number of the latest invalidations remembered, to tell whether
+    # a response fetched meanwhile may be stale
+    invalidation_log_size = 256
+
+    def __init__(self, ttls=None, default_ttl=0):
+        """Initializer.
+
+        Args:
+            `ttls`: A dictionary (or a list of pairs) from path patterns
+                to the number of seconds responses for matching URLs stay
+                fresh. Patterns are tried in order.
+            `default_ttl`: The number of seconds responses for any other
+                URL stay fresh. By default, they have to be revalidated.
+        """
+        ttls = ttls or {}
+        if hasattr(ttls, 'items'):
+            ttls = ttls.items()
+        self._ttls = [
+            (compile_path_pattern(pattern), ttl) for pattern, ttl in ttls
+        ]
+        self.default_ttl = default_ttl
+        self._scopes = [
+            compile_path_pattern(pattern)
+            for pattern in self.invalidation_scopes
+        ]
+        self._generation = 0
+        self._invalidations = deque(maxlen=self.invalidation_log_size)
+        self._generation_lock = threading.Lock()
+
+    @property
+    def generation(self):
+        """The number of invalidations so far.
+
+        Pass it to `store()`, as it was before the request was made.
+        """
+        return self._generation
+
+    def ttl_for(self, key):
+        """Return the TTL of the responses cached under the given key."""
+        for regex, ttl in self._ttls:
+            if regex.search(key):
+                return ttl
+        return self.default_ttl
+
+    def store(self, key, content, etag=None, last_modified=None,
+              generation=None):
+        """Cache a response, if it can be used later.
+
+        Args:
+            `key`: The cache key of the request.
+            `content`: The body of the response.
+            `etag`: The value of the `ETag` header of the response.
+            `last_modified`: The value of the `Last-Modified` header.
+            `generation`: The `generation` of the cache before the request
+                was made. The response is not cached if its URL has been
+                invalidated since then.
+        """
+        ttl = self.ttl_for(key)
+        if ttl <= 0 and not (etag or last_modified):
+            # Only a stale entry needs removing, and most keys have none
+            if key in self:
+                self.delete(key)
+            return
+        if self._invalidated_since(key, generation):
+            return
+        expires = time.time() + ttl if ttl > 0 else None
+        self.set(key, CacheEntry(content, etag, last_modified, expires))
+        # An invalidation logged after the check above may have removed
+        # the entries before the new one was set
+        if self._invalidated_since(key, generation):
+            self.delete(key)
+
+    def invalidate(self, url):
+        """Remove all entries affected by a write to the given URL."""
+        path = key_path(url)
+        for regex in self._scopes:
+            match = regex.search(path)
+            if match is not None:
+                path = path[:match.end()]
+                break
+        with self._generation_lock:
+            self._generation += 1
+            self._invalidations.append((self._generation, path))
+        self._invalidate(path)
+
+    def _invalidated_since(self, key, generation):
+        """Return whether the entry with the given key may have been
+        invalidated after the given generation."""
+        if generation is None:
+            return False
+        with self._generation_lock:
+            if self._generation - generation > len(self._invalidations):
+                # Too many invalidations to tell
+                return True
+            return any(
+                number > generation and self._related(key, path)
+                for number, path in self._invalidations
+            )
+
+    def _related(self, key, path):
+        """Return whether the entry with the given key is affected by
+        a write to `path`."""
+        prefix = key_path(key)
+        return prefix.startswith(path) or path.startswith(prefix)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key):
+        """Return the entry for the given key, or None."""
+        raise NotImplementedError
+
+    def set(self, key, entry):
+        """Store an entry under the given key."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Remove the entry for the given key, if any."""
+        raise NotImplementedError
+
+    def clear(self):
+        """Remove all entries."""
+        raise NotImplementedError
+
+    def _invalidate(self, path):
+        """Remove all entries affected by a write to `path`."""
+        raise NotImplementedError
+
+
+class MemoryCache(BaseCache):
+    """A thread-safe, in-memory cache.
+
+    It holds up to `max_entries` entries of `max_bytes` bytes in total
+    and evicts the least recently used ones first.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=None, ttls=None,
+                 default_ttl=0):
+        """Initializer.
+
+        Args:
+            `max_entries`: The maximum number of entries to keep.
+            `max_bytes`: The maximum (approximate) size of all entries.
+                `None` for no limit.
+            `ttls`: The TTLs per path pattern; see `BaseCache`.
+            `default_ttl`: The default TTL; see `BaseCache`.
+        """
+        super(MemoryCache, self).__init__(ttls=ttls, default_ttl=default_ttl)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    @property
+    def size(self):
+        """The approximate size of all entries, in bytes."""
+        return self._size
+
+    def get(self, key):
+        """Return the entry for the given key, or None."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+            return entry
+
+    def set(self, key, entry):
+        """Store an entry under the given key."""
+        with self._lock:
+            self._pop(key)
+            if self.max_bytes is not None and entry.size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._size += entry.size
+            while (len(self._entries) > self.max_entries or
+                    (self.max_bytes is not None and
+                     self._size > self.max_bytes)):
+                self._size -= self._entries.popitem(last=False)[1].size
+
+    def delete(self, key):
+        """Remove the entry for the given key, if any."""
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _invalidate(self, path):
+        """Remove all entries affected by a write to `path`."""
+        with self._lock:
+            for key in [k for k in self._entries if self._related(k, path)]:
+                self._pop(key)
+
+    def _pop(self, key):
+        """Remove an entry; the caller must hold the lock."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.size
+
+
+class DiskCache(BaseCache):
+    """A cache kept in an sqlite database on disk.
+
+    The database can be safely used by many threads and processes at the
+    same time. It holds entries of up to `max_bytes` bytes in total and
+    evicts the least recently used ones first.
+
+    The cache never makes a request fail: errors of the database are
+    logged and treated as misses. Reads never wait for the database while
+    another process is writing to it, and responses are not stored if the
+    database stays busy for more than `store_timeout` seconds; entries
+    are not removed either, in that case, and invalidations are skipped.
+    """
+
+    filename = 'txlib-cache.sqlite3'
+
+    # The number of seconds within which the access time of an entry is
+    # not updated again, so that most reads do not write to the database
+    access_resolution = 60
+
+    # The maximum number of seconds to wait for the database before
+    # giving up storing a response, so that a busy database cannot stall
+    # requests for long
+    store_timeout = 1
+
+    schema = (
+        'CREATE TABLE IF NOT EXISTS entries ('
+        ' key TEXT PRIMARY KEY, path TEXT NOT NULL, content TEXT NOT NULL,'
+        ' etag TEXT, last_modified TEXT, expires REAL,'
+        ' size INTEGER NOT NULL, accessed REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)',
+    )
+
+    def __init__(self, directory=None, max_bytes=100 * 1024 * 1024,
+                 ttls=None, default_ttl=0, timeout=30):
+        """Initializer.
+
+        Args:
+            `directory`: The directory to keep the database in. It is
+                created if it does not exist. Defaults to `txlib` in the
+                user's cache directory.
+            `max_bytes`: The maximum (approximate) size of all entries.
+                `None` for no limit.
+            `ttls`: The TTLs per path pattern; see `BaseCache`.
+            `default_ttl`: The default TTL; see `BaseCache`.
+            `timeout`: The number of seconds to wait for the database,
+                while another process is writing to it.
+        """
+        super(DiskCache, self).__init__(ttls=ttls, default_ttl=default_ttl)
+        if directory is None:
+            directory = os.path.join(
+                os.environ.get('XDG_CACHE_HOME') or
+                os.path.join(os.path.expanduser('~'), '.cache'),
+                'txlib',
+            )
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.path = os.path.join(directory, self.filename)
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connection() as db:
+            for statement in self.schema:
+                db.execute(statement)
+
+    def __len__(self):
+        with self._connection() as db:
+            return db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def __contains__(self, key):
+        try:
+            with self._connection() as db:
+                row = db.execute(
+                    'SELECT 1 FROM entries WHERE key = ?', (key, )
+                ).fetchone()
+        except sqlite3.Error as e:
+            _logger.warning("Could not read from the cache: %s", e)
+            return False
+        return row is not None
+
+    @property
+    def size(self):
+        """The approximate size of all entries, in bytes."""
+        with self._connection() as db:
+            return db.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM entries'
+            ).fetchone()[0]
+
+    def get(self, key):
+        """Return the entry for the given key, or None."""
+        try:
+            with self._connection() as db:
+                row = db.execute(
+                    'SELECT content, etag, last_modified, expires, accessed '
+                    'FROM entries WHERE key = ?', (key, )
+                ).fetchone()
+        except sqlite3.Error as e:
+            _logger.warning("Could not read from the cache: %s", e)
+            return None
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[4] > self.access_resolution:
+            self._touch(key, now)
+        content = row[0]
+        if not isinstance(content, six.text_type):
+            content = bytes(content)
+        return CacheEntry(content, *row[1:4])
+
+    def set(self, key, entry):
+        """Store an entry under the given key."""
+        size = entry.size
+        content = entry.content
+        if isinstance(content, bytes):
+            content = sqlite3.Binary(content)
+        try:
+            with self._busy_timeout(self.store_timeout) as db:
+                if self.max_bytes is not None and size > self.max_bytes:
+                    db.execute('DELETE FROM entries WHERE key = ?', (key, ))
+                    return
+                db.execute(
+                    'INSERT OR REPLACE INTO entries '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (key, key_path(key), content, entry.etag,
+                     entry.last_modified, entry.expires, size, time.time())
+                )
+                if self.max_bytes is not None:
+                    self._evict(db)
+        except sqlite3.Error as e:
+            _logger.warning("Could not write to the cache: %s", e)
+
+    def delete(self, key):
+        """Remove the entry for the given key, if any."""
+        try:
+            with self._busy_timeout(self.store_timeout) as db:
+                db.execute('DELETE FROM entries WHERE key = ?', (key, ))
+        except sqlite3.Error as e:
+            _logger.warning("Could not delete from the cache: %s", e)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._connection() as db:
+            db.execute('DELETE FROM entries')
+
+    def _invalidate(self, path):
+        """Remove all entries affected by a write to `path`."""
+        try:
+            with self._busy_timeout(self.store_timeout) as db:
+                db.execute(
+                    'DELETE FROM entries WHERE substr(path, 1, ?) = ? '
+                    'OR substr(?, 1, length(path)) = path',
+                    (len(path), path, path)
+                )
+        except sqlite3.Error as e:
+            _logger.warning("Could not invalidate the cache: %s", e)
+
+    def _touch(self, key, now):
+        """Update the access time of an entry, unless the database is
+        busy."""
+        try:
+            with self._busy_timeout(0) as db:
+                db.execute('UPDATE entries SET accessed = ? WHERE key = ?',
+                           (now, key))
+        except sqlite3.Error as e:
+            _logger.debug("Could not update the cache access time: %s", e)
+
+    @contextmanager
+    def _busy_timeout(self, timeout):
+        """Wrap a transaction that fails after waiting for at most
+        `timeout` seconds, instead of `self.timeout`, if another connection
+        is writing to the database."""
+        db = self._connection()
+        timeout = min(timeout, self.timeout)
+        db.execute('PRAGMA busy_timeout = %d' % (timeout * 1000))
+        try:
+            with db:
+                yield db
+        finally:
+            db.execute('PRAGMA busy_timeout = %d' % (self.timeout * 1000))
+
+    def _evict(self, db):
+        """Remove the least recently used entries, until all entries
+        fit in `self.max_bytes`."""
+        total = db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM entries'
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        rows = db.execute('SELECT key, size FROM entries ORDER BY accessed')
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key, ))
+            total -= size
+        db.executemany('DELETE FROM entries WHERE key = ?', evicted)
+
+    def _connection(self):
+        """Return the database connection of the current thread.
+
+        Connections are not shared between threads or processes. The
+        connection is also a context manager that wraps a transaction.
+        """
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            db = sqlite3.connect(self.path, timeout=self.timeout)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+            self._local.pid = pid
+        return self._local.db
+
+
+def cache_key(url, params=None, auth=None):
+    """Return the cache key for a GET request.
+
+    Args:
+        `url`: The full url of the request.
+        `params`: The query parameters of the request.
+        `auth`: The fingerprint of the credentials of the request (see
+            `AuthInfo.fingerprint()`), so that users with different
+            permissions do not share responses.
+    """
+    key = url
+    if params:
+        key = '%s%s%s' % (
+            key, '&' if '?' in key else '?',
+            urlencode(sorted(params.items()))
+        )
+    if auth:
+        key = '%s#%s' % (key, auth)
+    return key
+
+
+def key_path(key):
+    """Return the path part of the URL of a cache key."""
+    return key.split('?', 1)[0].split('#', 1)[0]
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Circuit breaker for the http handlers.
+
+A `CircuitBreaker` given to a handler stops sending requests to a host
+that keeps failing, so that callers fail fast with a `CircuitOpenError`
+instead of waiting for timeouts:
+
+>>> breaker = CircuitBreaker(consecutive_failures=5, reset_timeout=30)
+>>> conn = HttpRequest(host, auth=credentials, circuit_breaker=breaker)
+
+The circuit of a host is normally `closed`. It opens after too many
+consecutive failures, or when the rate of failures of the latest requests
+gets too high. While `open`, all requests fail immediately. After
+`reset_timeout` seconds it becomes `half-open` and lets a few probe
+requests through: if they succeed, the circuit closes again; if any of
+them fails, it opens for another `reset_timeout` seconds.
+
+Only server errors (5xx) and failures to connect count as failures by
+default. Any other response means that the host is up.
+"""
+
+import threading
+import time
+from collections import deque
+
+from six.moves.urllib.parse import urlsplit
+
+from txlib.http.exceptions import CircuitOpenError, NoResponseError, \
+    RemoteServerError
+from txlib.utils import _logger
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class _Circuit(object):
+    """The state of the circuit of a single host."""
+
+    def __init__(self, window):
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probes = 0
+        self.probe_successes = 0
+
+
+class CircuitBreaker(object):
+    """A circuit breaker with a separate circuit for each host.
+
+    This class is thread-safe.
+    """
+
+    def __init__(self, consecutive_failures=5, error_rate=None, window=20,
+                 reset_timeout=30, half_open_probes=1,
+                 failures=(RemoteServerError, NoResponseError),
+                 on_state_change=None):
+        """Initializer.
+
+        Args:
+            `consecutive_failures`: The number of consecutive failures
+                that open the circuit. `None` to only use `error_rate`.
+            `error_rate`: The rate of failures (between 0 and 1) among the
+                latest `window` requests that opens the circuit. It is only
+                checked once `window` requests have been made. `None` to
+                only use `consecutive_failures`.
+            `window`: The number of latest requests `error_rate` refers to.
+            `reset_timeout`: The number of seconds the circuit stays open,
+                before letting probe requests through.
+            `half_open_probes`: The number of successful probe requests
+                needed to close the circuit. Only as many requests are let
+                through at a time.
+            `failures`: The exception classes that count as failures.
+            `on_state_change`: A function to call with the host, the old
+                and the new state when the circuit of a host changes state.
+        """
+        self.consecutive_failures = consecutive_failures
+        self.error_rate = error_rate
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.failures = tuple(failures)
+        self.on_state_change = on_state_change
+        self._circuits = {}
+        # Reentrant, so that `on_state_change` can read the states
+        self._lock = threading.RLock()
+
+    def allow(self, url):
+        """Check that a request to the given url can be made.
+
+        Every allowed request must be followed by a call to `record()`.
+
+        Raises:
+            CircuitOpenError: if the circuit of the host is open.
+        """
+        host = self._host(url)
+        with self._lock:
+            circuit = self._circuit(host)
+            if circuit.state == OPEN:
+                if time.time() - circuit.opened_at < self.reset_timeout:
+                    raise self._open_error(host)
+                self._change_state(host, circuit, HALF_OPEN)
+            if circuit.state == HALF_OPEN:
+                if circuit.probes >= self.half_open_probes:
+                    raise self._open_error(host)
+                circuit.probes += 1
+
+    def record(self, url, exception=None):
+        """Record the outcome of a request allowed by `allow()`.
+
+        Args:
+            `url`: The url of the request.
+            `exception`: The exception the request failed with, if any.
+        """
+        failed = isinstance(exception, self.failures)
+        host = self._host(url)
+        with self._lock:
+            circuit = self._circuit(host)
+            if circuit.state == HALF_OPEN:
+                circuit.probes = max(0, circuit.probes - 1)
+                if failed:
+                    self._open(host, circuit)
+                else:
+                    circuit.probe_successes += 1
+                    if circuit.probe_successes >= self.half_open_probes:
+                        self._change_state(host, circuit, CLOSED)
+                return
+            if circuit.state == OPEN:
+                # A request that was allowed before the circuit opened
+                return
+
+            circuit.outcomes.append(failed)
+            if not failed:
+                circuit.consecutive_failures = 0
+                return
+            circuit.consecutive_failures += 1
+            if self._should_open(circuit):
+                self._open(host, circuit)
+
+    def state(self, url_or_host):
+        """Return the state of the circuit of a host: `closed`, `open`
+        or `half-open`.
+
+        A circuit whose `reset_timeout` has passed is reported as
+        `half-open`, even before the next request is made.
+        """
+        host = self._host(url_or_host)
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None:
+                return CLOSED
+            if circuit.state == OPEN and \
+                    time.time() - circuit.opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return circuit.state
+
+    def states(self):
+        """Return a dictionary with the state of the circuit of each host
+        requests have been made to."""
+        with self._lock:
+            hosts = list(self._circuits)
+        return dict((host, self.state(host)) for host in hosts)
+
+    def reset(self):
+        """Close all circuits and forget all failures."""
+        with self._lock:
+            self._circuits.clear()
+
+    def _should_open(self, circuit):
+        """Return whether the failures of a closed circuit are too many."""
+        if self.consecutive_failures is not None and \
+                circuit.consecutive_failures >= self.consecutive_failures:
+            return True
+        if self.error_rate is not None and \
+                len(circuit.outcomes) >= self.window:
+            rate = float(sum(circuit.outcomes)) / len(circuit.outcomes)
+            return rate >= self.error_rate
+        return False
+
+    def _open(self, host, circuit):
+        """Open the circuit of a host."""
+        circuit.opened_at = time.time()
+        self._change_state(host, circuit, OPEN)
+
+    def _change_state(self, host, circuit, state):
+        """Move the circuit of a host to a new state."""
+        old_state = circuit.state
+        circuit.state = state
+        circuit.probes = 0
+        circuit.probe_successes = 0
+        if state == CLOSED:
+            circuit.outcomes.clear()
+            circuit.consecutive_failures = 0
+        _logger.warning("Circuit of %s is %s.", host, state)
+        if self.on_state_change is not None:
+            try:
+                self.on_state_change(host, old_state, state)
+            except Exception:
+                _logger.exception("Circuit state change callback failed.")
+
+    def _circuit(self, host):
+        """Return the circuit of a host, creating it if needed."""
+        circuit = self._circuits.get(host)
+        if circuit is None:
+            circuit = self._circuits[host] = _Circuit(self.window)
+        return circuit
+
+    def _open_error(self, host):
+        """Return the exception for a request to a host with open circuit."""
+        return CircuitOpenError(
+            "Circuit of %s is open; not making the request." % host
+        )
+
+    def _host(self, url_or_host):
+        """Return the host (and port) of a url."""
+        if '://' not in url_or_host:
+            return url_or_host
+        return urlsplit(url_or_host).netloc
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Coalescing of concurrent identical requests.
+
+When several threads make the same GET request at the same time, only
+the first one (the leader) actually makes it; the rest wait for it and
+get the same result, or the same exception. The handlers do this for all
+GET requests, unless they are created with `coalesce=False`.
+
+Writes made through a handler start a new generation of requests, so
+that a GET made after a write never shares the response of a GET that
+started before it.
+"""
+
+import threading
+
+from txlib.http.exceptions import DeadlineExceededError
+
+
+class _Call(object):
+    """A request in flight."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exception = None
+
+    def wait(self, timeout=None):
+        """Wait for the request to finish and return its result.
+
+        Raises:
+            DeadlineExceededError: if it does not finish in `timeout`
+                seconds.
+        """
+        if not self.done.wait(timeout):
+            raise DeadlineExceededError(
+                "Deadline exceeded waiting for a request in flight."
+            )
+        if self.exception is not None:
+            raise self.exception
+        return self.result
+
+
+class SingleFlight(object):
+    """Make sure only one call with the same key is in flight at a time.
+
+    This class is thread-safe.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        """Call `func(*args)`, unless a call with the same key is in flight.
+
+        Args:
+            `key`: The key that identifies identical calls.
+            `func`: The function to call.
+            `timeout`: (keyword-only) The number of seconds to wait for
+                the call in flight, if any. `None` for no limit.
+        Returns:
+            The return value of `func`, either of this call or of the
+            call in flight.
+        Raises:
+            The exception raised by `func`.
+            DeadlineExceededError: if the call in flight does not finish
+                in `timeout` seconds.
+        """
+        timeout = kwargs.pop('timeout', None)
+        with self._lock:
+            key = (self._generation, key)
+            call = self._calls.get(key)
+            if call is not None:
+                leader = False
+            else:
+                leader = True
+                call = self._calls[key] = _Call()
+        if not leader:
+            return call.wait(timeout)
+
+        try:
+            call.result = func(*args)
+            return call.result
+        except BaseException as e:
+            call.exception = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def forget(self):
+        """Make calls from now on not share the results of the calls in
+        flight.
+        """
+        with self._lock:
+            self._generation += 1
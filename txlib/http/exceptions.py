@@ -10,6 +10,8 @@ class ServerError(Exception):
     def __init__(self, *args, **kwargs):
         if 'http_code' in kwargs:
             self.http_code = kwargs.pop('http_code')
+        if 'headers' in kwargs:
+            self.headers = kwargs.pop('headers')
         super(ServerError, self).__init__(*args, **kwargs)
 
 
@@ -48,6 +50,13 @@ class ConflictError(ServerError):
     """
 
 
+class TooManyRequestsError(ServerError):
+    """Class to indicate that the client has been rate limited.
+
+    This is a 429 error.
+    """
+
+
 class UnknownError(ServerError):
     """Class for errors which are not handled specifically."""
 
@@ -58,3 +67,18 @@ class RemoteServerError(ServerError):
 
 class NoResponseError(ServerError):
     """Exception raised when there was no connection to the remopte server."""
+
+
+class RateLimitExceededError(ServerError):
+    """Exception raised when a request is not made, because it would exceed
+    the client-side rate limit."""
+
+
+class CircuitOpenError(ServerError):
+    """Exception raised when a request is not made, because the circuit
+    breaker of its host is open after too many failures."""
+
+
+class DeadlineExceededError(ServerError):
+    """Exception raised when a request could not be completed before the
+    deadline of the call that made it."""
@@ -1,32 +1,108 @@
 # -*- coding: utf-8 -*-
 
-import json
+import os
+import threading
+import time
 import requests
-from io import BytesIO
-from txlib.utils import _logger
+from requests.adapters import DEFAULT_POOLBLOCK, DEFAULT_POOLSIZE
+from requests.exceptions import ChunkedEncodingError, ContentDecodingError
+from txlib.utils import DEFAULT_CHUNK_SIZE, _logger
+from txlib.http.auth import AnonymousAuth
 from txlib.http.base import BaseRequest
-from txlib.http.exceptions import NoResponseError
+from txlib.http.exceptions import NoResponseError, ServerError
+from txlib.http.json_codecs import get_codec
+from txlib.http.multipart import MultipartEncoder, open_content
+from txlib.http.timeouts import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
 
 
 class HttpRequest(BaseRequest):
     """Basic http requests handler.
 
     This class can handle both HTTP and HTTPS requests.
+
+    All requests go through a long-lived `requests.Session`, so that
+    TCP/TLS connections to the remote server are kept alive and reused
+    between calls. The session is created lazily and is recreated
+    automatically in a forked child process, so a handler set up in a
+    parent process can be safely used after `os.fork()`.
     """
 
-    def get(self, path, params=None):
+    def __init__(self, hostname, auth=AnonymousAuth(),
+                 pool_connections=DEFAULT_POOLSIZE,
+                 pool_maxsize=DEFAULT_POOLSIZE,
+                 pool_block=DEFAULT_POOLBLOCK, idle_timeout=None,
+                 retry=None, rate_limiter=None, cache=None,
+                 instrumentation=None, coalesce=True, circuit_breaker=None,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT):
+        """Initializer.
+
+        Args:
+            `hostname`: The host for the requests.
+            `auth`: The authentication info needed for any requests.
+            `pool_connections`: The number of per-host connection pools
+                to keep.
+            `pool_maxsize`: The maximum number of connections to keep
+                open to a single host.
+            `pool_block`: Whether to block, when all connections to a host
+                are in use, instead of opening a new (non-pooled) one.
+            `idle_timeout`: The number of seconds after which idle pooled
+                connections are discarded. `None` keeps them forever.
+            `retry`: The `txlib.http.retry.RetryPolicy` for failed requests.
+                `None` disables retries.
+            `rate_limiter`: The `txlib.http.ratelimit.RateLimiter` to use
+                for all requests. `None` disables rate limiting.
+            `cache`: The cache to keep the responses of GET requests in.
+                `None` disables caching.
+            `instrumentation`: The
+                `txlib.http.instrumentation.Instrumentation` to report
+                the requests to. `None` disables instrumentation.
+            `coalesce`: Whether concurrent identical GET requests should
+                share a single request, and its response.
+            `circuit_breaker`: The `txlib.http.circuit.CircuitBreaker` that
+                stops requests to failing hosts. `None` disables it.
+            `connect_timeout`: The number of seconds to wait for a
+                connection to the server. `None` for no limit.
+            `read_timeout`: The number of seconds to wait for the server
+                to send data. `None` for no limit.
+        """
+        super(HttpRequest, self).__init__(hostname, auth=auth, retry=retry,
+                                          rate_limiter=rate_limiter,
+                                          cache=cache,
+                                          instrumentation=instrumentation,
+                                          coalesce=coalesce,
+                                          circuit_breaker=circuit_breaker,
+                                          connect_timeout=connect_timeout,
+                                          read_timeout=read_timeout)
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._pool_block = pool_block
+        self._idle_timeout = idle_timeout
+        self._session_lock = threading.Lock()
+        self._lock_pid = os.getpid()
+        self._session = None
+        self._session_pid = None
+        self._last_used = None
+
+    def get(self, path, params=None, deadline=None):
         """Make a GET request.
 
         Args:
             `path`: The path to the resource.
+            `params`: The query parameters of the request.
+            `deadline`: The `txlib.http.timeouts.Deadline` of the request,
+                if any.
         Returns:
             The content of the response.
         Raises:
             An exception depending on the HTTP status code of the response.
         """
-        return json.loads(self._make_request('GET', path, params=params))
+        return get_codec().loads(
+            self._make_request('GET', path, params=params,
+                               deadline=deadline)
+        )
 
-    def post(self, path, data, content=None):
+    def post(self, path, data, content=None, deadline=None):
         """Make a POST request.
 
         If a `filename` is not specified, then the data must already be
@@ -34,20 +110,25 @@ class HttpRequest(BaseRequest):
 
         Else, we make a multipart/form-encoded request. In this case, the data
         variable must be a dict-like object. The file must already be
-        suitably (usually UTF-8) encoded.
+        suitably (usually UTF-8) encoded. It is streamed, so that large
+        files can be sent without loading them in memory.
 
         Args:
             `path`: The path to the resource.
             `data`: The data to send. The data must already be JSON-encoded.
-            `content`: The bytes (binary form) of the content to send.
+            `content`: The content of the file to send: bytes, a memoryview,
+                a file object opened in binary mode or a path object
+                (e.g. a `pathlib.Path`).
+            `deadline`: The `txlib.http.timeouts.Deadline` of the request,
+                if any.
         Returns:
             The content of the response.
         Raises:
             An exception depending on the HTTP status code of the response.
         """
-        return self._send('POST', path, data, content)
+        return self._send('POST', path, data, content, deadline)
 
-    def put(self, path, data, content=None):
+    def put(self, path, data, content=None, deadline=None):
         """Make a PUT request.
 
         If a `filename` is not specified, then the data must already be
@@ -55,32 +136,74 @@ class HttpRequest(BaseRequest):
 
         Else, we make a multipart/form-encoded request. In this case, the data
         variable must be a dict-like object. The file must already be
-        suitably (usually UTF-8) encoded.
+        suitably (usually UTF-8) encoded. It is streamed, so that large
+        files can be sent without loading them in memory.
 
         Args:
             `path`: The path to the resource.
             `data`: The data to send. The data must already be JSON-encoded.
-            `content`: The bytes (binary form) of the content to send.
+            `content`: The content of the file to send: bytes, a memoryview,
+                a file object opened in binary mode or a path object
+                (e.g. a `pathlib.Path`).
+            `deadline`: The `txlib.http.timeouts.Deadline` of the request,
+                if any.
         Returns:
             The content of the response.
         Raises:
             An exception depending on the HTTP status code of the response.
         """
-        return self._send('PUT', path, data, content)
+        return self._send('PUT', path, data, content, deadline)
 
-    def delete(self, path):
+    def delete(self, path, deadline=None):
         """Make a DELETE request.
 
         Args:
             `path`: The path to the resource.
+            `deadline`: The `txlib.http.timeouts.Deadline` of the request,
+                if any.
         Returns:
             The content of the response.
         Raises:
             An exception depending on the HTTP status code of the response.
         """
-        return self._make_request('DELETE', path)
+        return self._decode_text(
+            self._make_request('DELETE', path, deadline=deadline)
+        )
+
+    def download(self, path, fileobj, params=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, deadline=None):
+        """Make a GET request and write the body of the response to a file.
+
+        The body is written in chunks as it arrives, so it is never held
+        in memory as a whole.
+
+        Args:
+            `path`: The path to the resource.
+            `fileobj`: The file object (opened in binary mode) to write to.
+                The request is only retried if it is seekable.
+            `params`: The query parameters of the request.
+            `chunk_size`: The size of the chunks to write, in bytes.
+            `deadline`: The `txlib.http.timeouts.Deadline` of the request,
+                if any.
+        Returns:
+            The number of bytes written.
+        Raises:
+            An exception depending on the HTTP status code of the response.
+        """
+        kwargs = {}
+        url = self._prepare_request('GET', path, kwargs)
+        try:
+            start = fileobj.tell()
+        except (AttributeError, IOError, OSError):
+            start = None
+        return self._retrying(
+            'GET', url, self._download_once, url, params, kwargs,
+            fileobj, start, chunk_size, retry=start is not None,
+            deadline=deadline
+        )
 
-    def _make_request(self, method, path, data=None, params=None, **kwargs):
+    def _make_request(self, method, path, data=None, params=None,
+                      deadline=None, **kwargs):
         """Make a request.
 
         Use the `requests` module to actually perform the request.
@@ -89,39 +212,229 @@ class HttpRequest(BaseRequest):
             `method`: The method to use.
             `path`: The path to the resource.
             `data`: Any data to send (for POST and PUT requests).
+            `params`: The query parameters of the request.
+            `deadline`: The `txlib.http.timeouts.Deadline` of the request,
+                if any.
             `kwargs`: Other parameters for `requests`.
         Returns:
             The content of the response.
         Raises:
             An exception depending on the HTTP status code of the response.
         """
-        _logger.debug("Method for request is %s" % method)
+        url = self._prepare_request(method, path, kwargs)
+
+        key, entry = self._cached_entry(method, url, params, kwargs)
+        if entry is not None and entry.is_fresh():
+            _logger.debug("Using cached response.")
+            return entry.content
+
+        if method == 'GET' and self._single_flight is not None:
+            return self._single_flight.do(
+                self._cache_key(url, params), self._fetch, method, url, data,
+                params, kwargs, key, entry, deadline,
+                timeout=self._wait_timeout(deadline)
+            )
+        return self._fetch(method, url, data, params, kwargs, key, entry,
+                           deadline)
+
+    def _fetch(self, method, url, data, params, kwargs, key, entry,
+               deadline=None):
+        """Make a request, retrying if needed, and return the content of
+        its response.
+
+        See `_request_once()` and `_response_content()` for the arguments.
+        """
+        # Writes completed while the request is in flight keep its
+        # response from being cached
+        generation = self._cache.generation if key is not None else None
+        res = self._retrying(
+            method, url, self._request_once, method, url, data, params,
+            kwargs, deadline=deadline
+        )
+        _logger.debug("Request was successful.")
+        return self._response_content(
+            key, entry, res.status_code, res.headers, res.content, generation
+        )
+
+    def _prepare_request(self, method, path, kwargs):
+        """Add the authentication info and custom headers to the
+        arguments of a request.
+
+        Args:
+            `method`: The method to use.
+            `path`: The path to the resource.
+            `kwargs`: The parameters for `requests`.
+        Returns:
+            The full url of the request.
+        """
+        _logger.debug("Method for request is %s", method)
         url = self._construct_full_url(path)
-        _logger.debug("URL for request is %s" % url)
+        _logger.debug("URL for request is %s", url)
         self._auth_info.populate_request_data(kwargs)
-        _logger.debug("The arguments are %s" % kwargs)
+        _logger.debug("The arguments are %s", kwargs)
 
         # Add custom headers for the request
         if self._auth_info._headers:
             kwargs.setdefault('headers', {}).update(self._auth_info._headers)
+        return url
 
-        res = requests.request(method, url, data=data, params=params, **kwargs)
+    def _retrying(self, method, url, func, *args, **kwargs):
+        """Call `func(*args)`, retrying according to the retry policy.
 
-        if res.ok:
-            _logger.debug("Request was successful.")
-            return res.content.decode('utf-8')
+        Args:
+            `method`: The HTTP method of the request `func` makes.
+            `url`: The full url of the request `func` makes.
+            `func`: The function that makes a single attempt.
+            `retry`: (keyword-only) Whether the request can be retried.
+            `deadline`: (keyword-only) The `Deadline` of the request, if
+                any. The request is not retried past it.
+        Returns:
+            The return value of `func`, which is also given the
+            `RequestEvent` of the request (if instrumented) as `event`
+            and the deadline as `deadline`.
+        """
+        retry = kwargs.pop('retry', True)
+        deadline = kwargs.pop('deadline', None)
+        event = self._request_started(method, url)
+        started = time.time()
+        attempt = 0
+        exception = None
+        try:
+            while True:
+                attempt += 1
+                try:
+                    return func(*args, event=event, deadline=deadline)
+                except ServerError as e:
+                    delay = None
+                    if retry:
+                        delay = self._retry_delay(method, e, attempt, started,
+                                                  deadline)
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+        except Exception as e:
+            exception = e
+            raise
+        finally:
+            self._invalidate_cache(method, url)
+            self._request_finished(event, attempt, exception)
 
-        if hasattr(res, 'content'):
-            _logger.debug("Response was %s:%s", res.status_code, res.content)
-            raise self._exception_for(res.status_code)(
-                res.content, http_code=res.status_code
+    def _request_once(self, method, url, data, params, kwargs, event=None,
+                      deadline=None):
+        """Make a single attempt of a request.
+
+        Args:
+            `method`: The method to use.
+            `url`: The full url of the resource.
+            `data`: Any data to send (for POST and PUT requests).
+            `params`: The query parameters of the request.
+            `kwargs`: Other parameters for `requests`.
+            `event`: The `RequestEvent` to record the sizes and the status
+                of the request in, if instrumented.
+            `deadline`: The `txlib.http.timeouts.Deadline` of the request,
+                if any.
+        Returns:
+            The (successful) response.
+        Raises:
+            CircuitOpenError: if the circuit breaker does not let the
+                request through.
+            DeadlineExceededError: if the deadline passes before the
+                response is received.
+            An exception depending on the HTTP status code of the response.
+        """
+        # The body may have been (partially) read by a previous attempt
+        if isinstance(data, MultipartEncoder):
+            data.rewind()
+        if event is not None:
+            event.request_bytes = self._body_size(data)
+
+        delay = self._throttle_delay(method, url)
+        if delay:
+            if deadline is not None and delay >= deadline.remaining():
+                raise self._deadline_error(url)
+            time.sleep(delay)
+
+        kwargs = dict(kwargs, timeout=self._timeouts(url, deadline))
+        self._circuit_allow(url)
+        error = None
+        try:
+            return self._send_request(method, url, data, params, kwargs,
+                                      event, deadline)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._circuit_record(url, error)
+
+    def _send_request(self, method, url, data, params, kwargs, event,
+                      deadline=None):
+        """Send a request and check its response.
+
+        See `_request_once()`.
+        """
+        session = self._get_session()
+        try:
+            res = session.request(
+                method, url, data=data, params=params, **kwargs
             )
-        else:
-            msg = "No response from URL: %s" % res.request.url
+        except (requests.ConnectionError, requests.Timeout,
+                ChunkedEncodingError, ContentDecodingError) as e:
+            # The body of the response may be cut short, too
+            if deadline is not None and deadline.expired():
+                raise self._deadline_error(url)
+            msg = "No response from URL: %s (%s)" % (url, e)
+            _logger.error(msg)
+            raise NoResponseError(msg)
+
+        if event is not None:
+            event.status = res.status_code
+            if not (res.ok and kwargs.get('stream')):
+                event.response_bytes = len(res.content)
+        if res.ok:
+            return res
+
+        _logger.debug("Response was %s:%s", res.status_code, res.content)
+        raise self._exception_for(res.status_code)(
+            res.content, http_code=res.status_code, headers=res.headers
+        )
+
+    def _download_once(self, url, params, kwargs, fileobj, start,
+                       chunk_size, event=None, deadline=None):
+        """Make a single attempt of a download.
+
+        See `download()` for the arguments. `start` is the position of the
+        file to write at, if it is seekable.
+        """
+        if start is not None:
+            fileobj.seek(start)
+            fileobj.truncate()
+
+        res = self._request_once(
+            'GET', url, None, params, dict(kwargs, stream=True), event,
+            deadline
+        )
+        written = 0
+        try:
+            for chunk in res.iter_content(chunk_size):
+                if deadline is not None and deadline.expired():
+                    raise self._deadline_error(url)
+                fileobj.write(chunk)
+                written += len(chunk)
+        except (requests.ConnectionError, requests.Timeout,
+                ChunkedEncodingError, ContentDecodingError) as e:
+            if deadline is not None and deadline.expired():
+                raise self._deadline_error(url)
+            msg = "Download from URL %s was interrupted (%s)" % (url, e)
             _logger.error(msg)
             raise NoResponseError(msg)
+        finally:
+            res.close()
+            if event is not None:
+                event.response_bytes = written
+        _logger.debug("Downloaded %s bytes.", written)
+        return written
 
-    def _send(self, method, path, data, content):
+    def _send(self, method, path, data, content, deadline=None):
         """Send data to a remote server, either with a POST or a PUT request.
 
         Args:
@@ -129,45 +442,124 @@ class HttpRequest(BaseRequest):
             `path`: The path to the resource.
             `data`: The data to send.
             `content`: The bytes (binary form) of the content to send.
+            `deadline`: The `txlib.http.timeouts.Deadline` of the request,
+                if any.
         Returns:
             The content of the response.
         Raises:
             An exception depending on the HTTP status code of the response.
         """
         if content is None:
-            return self._send_json(method, path, data)
+            return self._send_json(method, path, data, deadline)
         else:
-            return self._send_file(method, path, data, content)
+            return self._send_file(method, path, data, content, deadline)
 
-    def _send_json(self, method, path, data):
+    def _send_json(self, method, path, data, deadline=None):
         """Make a application/json request.
 
         Args:
             `method`: The method of the request (POST or PUT).
             `path`: The path to the resource.
             `data`: The JSON-encoded data.
+            `deadline`: The `txlib.http.timeouts.Deadline` of the request,
+                if any.
         Returns:
             The content of the response.
         Raises:
             An exception depending on the HTTP status code of the response.
         """
         headers = {'Content-type': 'application/json'}
-        return self._make_request(method, path, data=data, headers=headers)
+        return self._decode_text(
+            self._make_request(method, path, data=data, headers=headers,
+                               deadline=deadline)
+        )
 
-    def _send_file(self, method, path, data, content):
+    def _send_file(self, method, path, data, content, deadline=None):
         """Make a multipart/form-encoded request.
 
-        The content to send is opened in binary mode to report correct byte length.
+        The body of the request is streamed: the content is read in chunks
+        as it is sent, instead of being copied in memory first.
 
         Args:
             `method`: The method of the request (POST or PUT).
             `path`: The path to the resource.
-            `data`: The JSON-encoded data.
-            `content`: The bytes (binary form) of the content to send.
+            `data`: A dictionary with the other fields of the form.
+            `content`: The content of the file to send: bytes, a memoryview,
+                a file object opened in binary mode or a path object.
+            `deadline`: The `txlib.http.timeouts.Deadline` of the request,
+                if any.
         Returns:
             The content of the response.
         Raises:
             An exception depending on the HTTP status code of the response.
         """
-        return self._make_request(method, path, data=data, files={"file": BytesIO(content)})
+        with open_content(content) as fileobj:
+            body = MultipartEncoder(data, {'file': fileobj})
+            headers = {'Content-type': body.content_type}
+            return self._decode_text(self._make_request(
+                method, path, data=body, headers=headers, deadline=deadline
+            ))
+
+    def reset(self):
+        """Close all pooled connections.
+
+        A new session (and connection pool) is created on the next request.
+        It is safe to call this at any time, e.g. after forking.
+        """
+        with self._lock():
+            self._close_session()
+
+    def _get_session(self):
+        """Return the session to use for the next request.
+
+        The session is (re)created if it does not exist yet, if we are
+        in a different process than the one that created it or if its
+        connections have been idle for more than `self._idle_timeout`
+        seconds.
+        """
+        with self._lock():
+            now = time.time()
+            if self._session is not None:
+                if self._session_pid != os.getpid():
+                    # Never reuse sockets inherited from the parent process
+                    self._session = None
+                elif (self._idle_timeout is not None and
+                        now - self._last_used > self._idle_timeout):
+                    _logger.debug("Discarding idle connections.")
+                    self._close_session()
+            if self._session is None:
+                self._session = self._create_session()
+                self._session_pid = os.getpid()
+            self._last_used = now
+            return self._session
+
+    def _lock(self):
+        """Return the lock that guards the session.
+
+        A forked child process gets a new lock, since the one it inherits
+        may have been held by another thread of the parent, which does
+        not exist in the child to release it.
+        """
+        pid = os.getpid()
+        if self._lock_pid != pid:
+            self._session_lock = threading.Lock()
+            self._lock_pid = pid
+        return self._session_lock
+
+    def _create_session(self):
+        """Create a new session with a configured connection pool."""
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self._pool_connections,
+            pool_maxsize=self._pool_maxsize,
+            pool_block=self._pool_block,
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
 
+    def _close_session(self):
+        """Close the current session, if any."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentation of the requests made by the http handlers.
+
+An `Instrumentation` given to a handler calls back registered functions
+before each request and after its response, with a `RequestEvent` that
+describes the request:
+
+>>> latencies = LatencyAggregator()
+>>> instrumentation = Instrumentation(after_response=[latencies])
+>>> conn = HttpRequest(host, auth=credentials,
+>>>                    instrumentation=instrumentation)
+>>> ...
+>>> latencies.percentiles()
+{'project/%(project_slug)s/resource/%(slug)s/stats/':
+    {'count': 120, 'p50': 0.081, 'p95': 0.232, 'p99': 0.410}, ...}
+
+A request is reported once, however many times it is retried. Responses
+served from the cache without contacting the server are not reported.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+
+from txlib.utils import _logger, compile_path_pattern
+
+
+class RequestEvent(object):
+    """The description of a request, given to the callbacks.
+
+    Attributes:
+        `method`: The HTTP method of the request.
+        `url`: The full url of the request.
+        `template`: The URL template of the endpoint of the request, e.g.
+            `project/%(project_slug)s/resource/%(slug)s/stats/`, or the
+            path of the url, if it does not match any template.
+        `request_bytes`: The size of the body of the request.
+        `status`: The HTTP status code of the (last) response, if any.
+        `response_bytes`: The size of the body of the (last) response.
+        `retries`: The number of times the request was retried.
+        `latency`: The number of seconds the request took, including
+            all retries and waits.
+        `exception`: The exception the request failed with, if any.
+        `circuit_state`: The state of the circuit of the host after the
+            request (`closed`, `open` or `half-open`), if the handler
+            has a circuit breaker.
+
+    The attributes that describe the outcome of the request are only set
+    when the after-response callbacks are called.
+    """
+
+    def __init__(self, method, url, template):
+        self.method = method
+        self.url = url
+        self.template = template
+        self.request_bytes = 0
+        self.status = None
+        self.response_bytes = 0
+        self.retries = 0
+        self.latency = None
+        self.exception = None
+        self.circuit_state = None
+        self._started = time.time()
+
+    def __repr__(self):
+        return '<RequestEvent %s %s>' % (self.method, self.template)
+
+
+class Instrumentation(object):
+    """Callbacks for the requests of a handler.
+
+    Callbacks are called synchronously, in the thread (or event loop)
+    making the request, so they should be fast. Exceptions raised by them
+    are logged and ignored.
+    """
+
+    def __init__(self, before_request=None, after_response=None,
+                 templates=None):
+        """Initializer.
+
+        Args:
+            `before_request`: A list of functions to call with the
+                `RequestEvent` before a request is made.
+            `after_response`: A list of functions to call with the
+                `RequestEvent` after a request has finished, either
+                successfully or not.
+            `templates`: The URL templates to report the endpoints of the
+                requests with. By default, the templates of all models in
+                `txlib.api`.
+        """
+        self._before_request = list(before_request or [])
+        self._after_response = list(after_response or [])
+        self._templates = templates
+        self._endpoints = None
+        self._lock = threading.Lock()
+
+    def add_before_request(self, callback):
+        """Call `callback(event)` before every request."""
+        self._before_request.append(callback)
+
+    def add_after_response(self, callback):
+        """Call `callback(event)` after every request."""
+        self._after_response.append(callback)
+
+    def request_started(self, method, url):
+        """Report the start of a request.
+
+        Args:
+            `method`: The HTTP method of the request.
+            `url`: The full url of the request.
+        Returns:
+            The `RequestEvent` of the request.
+        """
+        event = RequestEvent(method, url, self.template_for(url))
+        self._call(self._before_request, event)
+        return event
+
+    def request_finished(self, event, exception=None):
+        """Report the end of a request.
+
+        Args:
+            `event`: The `RequestEvent` of the request.
+            `exception`: The exception the request failed with, if any.
+        """
+        event.latency = time.time() - event._started
+        event.exception = exception
+        if exception is not None and event.status is None:
+            event.status = getattr(exception, 'http_code', None)
+        self._call(self._after_response, event)
+
+    def template_for(self, url):
+        """Return the URL template that matches the given url, or its path,
+        if there is none.
+        """
+        path = url.split('://', 1)[-1]
+        path = path[path.find('/'):] if '/' in path else '/'
+        for regex, template in self._get_endpoints():
+            if regex.search(path):
+                return template
+        return path
+
+    def _get_endpoints(self):
+        """Return the compiled templates, most specific first."""
+        if self._endpoints is None:
+            with self._lock:
+                templates = self._templates
+                if templates is None:
+                    from txlib.api.base import endpoint_templates
+                    templates = endpoint_templates()
+                self._endpoints = [
+                    (_compile_template(template), template)
+                    for template in sorted(set(templates), key=len,
+                                           reverse=True)
+                ]
+        return self._endpoints
+
+    def _call(self, callbacks, event):
+        """Call all given callbacks with the event."""
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception:
+                _logger.exception("Instrumentation callback %r failed.",
+                                  callback)
+
+
+def _compile_template(template):
+    """Compile a URL template to a regular expression that matches the
+    end of a path.
+    """
+    regex = compile_path_pattern(template).pattern
+    if not regex.endswith('/'):
+        regex += '/?'
+    return re.compile(regex + '$')
+
+
+class LatencyAggregator(object):
+    """Collect the latencies of the requests per endpoint.
+
+    Use it as an after-response callback of an `Instrumentation`. Only the
+    latest `max_samples` requests of each endpoint are kept.
+    """
+
+    def __init__(self, max_samples=10000):
+        self.max_samples = max_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            samples = self._samples.get(event.template)
+            if samples is None:
+                samples = self._samples[event.template] = deque(
+                    maxlen=self.max_samples
+                )
+            samples.append(event.latency)
+
+    def percentiles(self, percentiles=(50, 95, 99)):
+        """Return the latency percentiles of each endpoint.
+
+        Args:
+            `percentiles`: The percentiles to compute.
+        Returns:
+            A dictionary from URL templates to dictionaries with the
+            number of samples (`count`) and the percentiles in seconds
+            (e.g. `p95`).
+        """
+        with self._lock:
+            samples = dict(
+                (template, sorted(latencies))
+                for template, latencies in self._samples.items()
+            )
+        result = {}
+        for template, latencies in samples.items():
+            stats = {'count': len(latencies)}
+            for percentile in percentiles:
+                stats['p%s' % percentile] = _percentile(latencies,
+                                                        percentile)
+            result[template] = stats
+        return result
+
+    def reset(self):
+        """Discard all samples."""
+        with self._lock:
+            self._samples.clear()
+
+
+def _percentile(values, percentile):
+    """Return the given percentile of sorted values (nearest rank)."""
+    rank = int(-(-len(values) * percentile // 100))
+    return values[max(rank, 1) - 1]
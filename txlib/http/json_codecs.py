@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+JSON codecs for the bodies of requests and responses.
+
+The codec used is a responsibility of the registry. By default the
+standard library `json` module is used; a faster implementation can be
+plugged in with:
+
+>>> registry.setup({'json_codec': OrjsonCodec()})
+
+or, to use the fastest one that is installed:
+
+>>> registry.setup({'json_codec': fastest_codec()})
+
+Codecs decode bytes (or text) and encode to UTF-8 bytes, so that response
+bodies do not have to be decoded to text first and request bodies do not
+have to be encoded.
+
+Any object with `loads(data)` and `dumps(obj)` methods that follow the
+same conventions can be used as a codec.
+"""
+
+import json
+
+import six
+
+from txlib.registry import registry
+from txlib.utils import _logger
+
+
+class JsonCodec(object):
+    """JSON codec built on the standard library `json` module."""
+
+    def loads(self, data):
+        """Decode a JSON document.
+
+        Args:
+            `data`: The document, as UTF-8 encoded bytes or text.
+        Returns:
+            The decoded object.
+        """
+        if isinstance(data, bytes) and not six.PY2:
+            # Not all Python 3 versions accept bytes
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+    def dumps(self, obj):
+        """Encode an object as a JSON document.
+
+        Args:
+            `obj`: The object to encode.
+        Returns:
+            The document, as UTF-8 encoded bytes.
+        """
+        return json.dumps(obj).encode('utf-8')
+
+
+class _ModuleCodec(JsonCodec):
+    """Base class of the codecs that use a third-party module.
+
+    If the module is not installed, the codec falls back to the standard
+    library.
+    """
+
+    # The name of the module to use
+    module_name = None
+
+    def __init__(self):
+        try:
+            self._module = __import__(self.module_name)
+        except ImportError:
+            _logger.debug(
+                "%s is not installed, using json instead.", self.module_name
+            )
+            self._module = None
+
+    @property
+    def available(self):
+        """Whether the module of the codec is installed."""
+        return self._module is not None
+
+    def loads(self, data):
+        if self._module is None:
+            return super(_ModuleCodec, self).loads(data)
+        return self._module.loads(data)
+
+
+class OrjsonCodec(_ModuleCodec):
+    """JSON codec built on `orjson`."""
+
+    module_name = 'orjson'
+
+    def dumps(self, obj):
+        if self._module is None:
+            return super(OrjsonCodec, self).dumps(obj)
+        return self._module.dumps(obj)
+
+
+class UjsonCodec(_ModuleCodec):
+    """JSON codec built on `ujson`."""
+
+    module_name = 'ujson'
+
+    def dumps(self, obj):
+        if self._module is None:
+            return super(UjsonCodec, self).dumps(obj)
+        return self._module.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def fastest_codec():
+    """Return the fastest JSON codec that is installed."""
+    for codec_class in (OrjsonCodec, UjsonCodec):
+        codec = codec_class()
+        if codec.available:
+            return codec
+    return JsonCodec()
+
+
+_default_codec = JsonCodec()
+
+
+def get_codec():
+    """Return the JSON codec set up in the registry, or the default one."""
+    return registry.get('json_codec') or _default_codec
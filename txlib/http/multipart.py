@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Streamed multipart/form-data request bodies.
+
+A `MultipartEncoder` is a file-like object that produces the body of a
+multipart/form-data request as it is read. The files of the form are
+read in chunks when the body is sent, so they are never loaded in memory
+(or copied) as a whole, and the length of the body is known in advance:
+
+>>> with open_content(pathlib.Path('messages.po')) as content:
+>>>     body = MultipartEncoder({'name': 'Messages'}, {'file': content})
+>>>     requests.post(url, data=body, headers={
+>>>         'Content-Type': body.content_type,
+>>>     })
+
+The content of a file can be given as bytes, a memoryview (or any other
+object supporting the buffer protocol, e.g. an `mmap`) or a file object
+opened in binary mode.
+"""
+
+import io
+import os
+import uuid
+from contextlib import contextmanager
+
+import six
+
+
+def is_path(content):
+    """Return whether the given content is a filesystem path object
+    (e.g. a `pathlib.Path`), instead of the content itself.
+
+    Plain strings are always treated as content.
+    """
+    return hasattr(content, '__fspath__')
+
+
+@contextmanager
+def open_content(content):
+    """Open the given content of a file for streaming.
+
+    Paths are opened (in binary mode) and closed on exit. File objects
+    that cannot seek are read in memory, since their size has to be known
+    and they have to be re-read if the request is retried. Everything else
+    is returned as is.
+
+    Args:
+        `content`: The content: bytes, a memoryview, a file object or a
+            path object.
+    """
+    if is_path(content):
+        with open(os.fspath(content), 'rb') as fileobj:
+            yield fileobj
+    elif hasattr(content, 'read') and not _is_seekable(content):
+        yield io.BytesIO(content.read())
+    else:
+        yield content
+
+
+def _is_seekable(fileobj):
+    """Return whether the given file object supports random access."""
+    if hasattr(fileobj, 'seekable'):
+        return fileobj.seekable()
+    try:
+        fileobj.tell()
+    except (AttributeError, IOError, OSError):
+        return False
+    return True
+
+
+class _BufferPart(object):
+    """A part of a body backed by an in-memory buffer."""
+
+    def __init__(self, content):
+        view = memoryview(content)
+        if view.ndim != 1 or view.itemsize != 1:
+            view = view.cast('B')
+        self._view = view
+        self._position = 0
+        self.size = len(view)
+
+    def read(self, size):
+        chunk = self._view[self._position:self._position + size]
+        self._position += len(chunk)
+        return chunk.tobytes()
+
+    def rewind(self):
+        self._position = 0
+
+
+class _FilePart(object):
+    """A part of a body read from a file object, from its current position
+    to its end.
+    """
+
+    def __init__(self, fileobj):
+        if isinstance(fileobj, io.TextIOBase):
+            raise ValueError("Files must be opened in binary mode")
+        self._fileobj = fileobj
+        self._start = fileobj.tell()
+        fileobj.seek(0, os.SEEK_END)
+        self.size = max(0, fileobj.tell() - self._start)
+        fileobj.seek(self._start)
+        self._remaining = self.size
+
+    def read(self, size):
+        chunk = self._fileobj.read(min(size, self._remaining))
+        self._remaining -= len(chunk)
+        return chunk
+
+    def rewind(self):
+        self._fileobj.seek(self._start)
+        self._remaining = self.size
+
+
+class MultipartEncoder(object):
+    """A multipart/form-data body, read on demand.
+
+    The body can be read again from its start after `rewind()`, e.g. to
+    retry a request.
+    """
+
+    def __init__(self, fields, files, boundary=None):
+        """Initializer.
+
+        Args:
+            `fields`: A dictionary with the (text) fields of the form.
+                Fields with `None` values are skipped; lists and tuples
+                are sent as one part per item.
+            `files`: A dictionary from field names to the contents of the
+                files of the form. The field name is used as the file name.
+            `boundary`: The boundary between the parts. Random by default.
+        """
+        self.boundary = boundary or uuid.uuid4().hex
+        self._parts = []
+        for name, values in (fields or {}).items():
+            # A list is sent as one part per item, like `requests` does
+            if not isinstance(values, (list, tuple)):
+                values = [values]
+            for value in values:
+                if value is None:
+                    continue
+                if not isinstance(value, bytes):
+                    value = six.text_type(value).encode('utf-8')
+                self._add(self._headers(name), value)
+        for name, content in files.items():
+            if hasattr(content, 'read'):
+                part = _FilePart(content)
+            else:
+                part = _BufferPart(content)
+            self._add(self._headers(name, filename=name), part)
+        self._parts.append(
+            _BufferPart(('--%s--\r\n' % self.boundary).encode('ascii'))
+        )
+        self.len = sum(part.size for part in self._parts)
+        self._index = 0
+
+    @property
+    def content_type(self):
+        """The value of the Content-Type header of the request."""
+        return 'multipart/form-data; boundary=%s' % self.boundary
+
+    def __len__(self):
+        return self.len
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(io.DEFAULT_BUFFER_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self, size=-1):
+        """Read up to `size` bytes of the body; all of it if `size`
+        is negative or omitted.
+        """
+        if size is None or size < 0:
+            size = self.len
+        chunks = []
+        while size > 0 and self._index < len(self._parts):
+            chunk = self._parts[self._index].read(size)
+            if not chunk:
+                self._index += 1
+                continue
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def rewind(self):
+        """Go back to the start of the body."""
+        for part in self._parts:
+            part.rewind()
+        self._index = 0
+
+    def _add(self, headers, content):
+        """Add a part with the given headers and content."""
+        self._parts.append(_BufferPart(headers))
+        if not isinstance(content, (_BufferPart, _FilePart)):
+            content = _BufferPart(content)
+        self._parts.append(content)
+        self._parts.append(_BufferPart(b'\r\n'))
+
+    def _headers(self, name, filename=None):
+        """Return the boundary and headers preceding a part."""
+        disposition = 'form-data; name="%s"' % name
+        if filename is not None:
+            disposition += '; filename="%s"' % filename
+        return (
+            '--%s\r\nContent-Disposition: %s\r\n\r\n' % (
+                self.boundary, disposition
+            )
+        ).encode('utf-8')
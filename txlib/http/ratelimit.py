@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Client-side rate limiting for the http handlers.
+
+A `RateLimiter` given to a handler keeps the rate of the requests made
+through it under a configured limit, so that it stays under the quota
+of the API:
+
+>>> limiter = RateLimiter(rate=5, burst=10, paths={
+>>>     'project/*/resource/*/translation/': (1, 2),
+>>> })
+>>> conn = HttpRequest(host, auth=credentials, rate_limiter=limiter)
+
+The limiter is thread-safe and all threads sharing the handler share
+its limits as well.
+"""
+
+import threading
+import time
+
+from txlib.http.exceptions import RateLimitExceededError
+from txlib.utils import compile_path_pattern
+
+
+class TokenBucket(object):
+    """A thread-safe token bucket.
+
+    The bucket holds up to `burst` tokens and is refilled with `rate`
+    tokens per second. Each request takes one token.
+
+    Tokens are reserved in advance: a request that finds the bucket empty
+    takes a token that will only be available in the future and waits
+    until then. This way waiting requests are served in order.
+    """
+
+    def __init__(self, rate, burst=None):
+        """Initializer.
+
+        Args:
+            `rate`: The number of tokens added per second.
+            `burst`: The maximum number of tokens. Defaults to `rate`
+                (at least one).
+        """
+        if rate <= 0:
+            raise ValueError('Rate must be positive (instead of %s)' % rate)
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1, rate))
+        self._tokens = self.burst
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def reserve(self, timeout=None):
+        """Reserve a token.
+
+        Args:
+            `timeout`: The maximum number of seconds the caller is willing
+                to wait for the token. `None` for no limit.
+        Returns:
+            The number of seconds the caller has to wait before using the
+            token, or None if it would have to wait for more than
+            `timeout` seconds. In that case nothing is reserved.
+        """
+        with self._lock:
+            now = time.time()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if timeout is not None and wait > timeout:
+                return None
+            self._tokens -= 1
+            return wait
+
+    def refund(self):
+        """Give back a reserved token."""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+
+class RateLimiter(object):
+    """Rate limiter for the requests of a handler.
+
+    Every request takes a token from the global bucket (if `rate` is set),
+    from the bucket of its HTTP method (if one is defined in `methods`)
+    and from the bucket of the first path pattern in `paths` that
+    matches its URL.
+
+    Path patterns are matched against the URL of the request, as described
+    in `txlib.utils.compile_path_pattern()`.
+    """
+
+    def __init__(self, rate=None, burst=None, methods=None, paths=None,
+                 block=True, timeout=None):
+        """Initializer.
+
+        Args:
+            `rate`: The maximum number of requests per second overall.
+                `None` for no overall limit.
+            `burst`: The maximum number of requests that can be made at once.
+            `methods`: A dictionary from HTTP methods to `(rate, burst)`
+                tuples for separate limits per method.
+            `paths`: A dictionary (or a list of pairs) from path patterns
+                to `(rate, burst)` tuples for separate limits per path.
+                Patterns are tried in order.
+            `block`: Whether to wait for a token when the limit has been
+                reached, or to fail immediately.
+            `timeout`: The maximum number of seconds to wait for a token,
+                when blocking. `None` for no limit.
+        """
+        self._bucket = TokenBucket(rate, burst) if rate is not None else None
+        self._method_buckets = dict(
+            (method.upper(), TokenBucket(*limits))
+            for method, limits in (methods or {}).items()
+        )
+        paths = paths or {}
+        if hasattr(paths, 'items'):
+            paths = paths.items()
+        self._path_buckets = [
+            (compile_path_pattern(pattern), TokenBucket(*limits))
+            for pattern, limits in paths
+        ]
+        self.block = block
+        self.timeout = timeout
+
+    def reserve(self, method, url):
+        """Reserve the right to make a request.
+
+        Args:
+            `method`: The HTTP method of the request.
+            `url`: The URL of the request.
+        Returns:
+            The number of seconds to wait before making the request.
+        Raises:
+            RateLimitExceededError: if the request would have to wait for
+                longer than allowed.
+        """
+        timeout = self.timeout if self.block else 0
+        reserved = []
+        delay = 0
+        for bucket in self._buckets_for(method, url):
+            wait = bucket.reserve(timeout)
+            if wait is None:
+                for other in reserved:
+                    other.refund()
+                raise RateLimitExceededError(
+                    "Rate limit exceeded for %s %s" % (method, url)
+                )
+            reserved.append(bucket)
+            # All buckets refill at the same time, so we only need to
+            # wait for the slowest one
+            delay = max(delay, wait)
+        return delay
+
+    def _buckets_for(self, method, url):
+        """Return the buckets the given request takes tokens from."""
+        buckets = []
+        if self._bucket is not None:
+            buckets.append(self._bucket)
+        if method.upper() in self._method_buckets:
+            buckets.append(self._method_buckets[method.upper()])
+        for regex, bucket in self._path_buckets:
+            if regex.search(url):
+                buckets.append(bucket)
+                break
+        return buckets
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Retry policies for the http handlers.
+
+A `RetryPolicy` decides whether a failed request should be retried
+and how long to wait before the next attempt. It is given to a handler
+when the handler is created:
+
+>>> policy = RetryPolicy(max_attempts=5, backoff_factor=1, total_timeout=60)
+>>> conn = HttpRequest(host, auth=credentials, retry=policy)
+"""
+
+import random
+import time
+from email.utils import mktime_tz, parsedate_tz
+
+from txlib.http.exceptions import NoResponseError
+
+
+# HTTP methods that can be safely repeated
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+# HTTP status codes that indicate a temporary problem
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class RetryPolicy(object):
+    """Configuration of the retries of failed requests.
+
+    A request is retried when it fails with an HTTP status code found in
+    `statuses` or with an exception found in `exceptions`, as long as its
+    method is one of `methods`. POST requests are not idempotent, so they
+    are only retried if `retry_post` is True.
+
+    The delay before attempt `n + 1` is `backoff_factor * 2 ** (n - 1)`
+    seconds, capped at `max_backoff`. With `jitter`, a random delay between
+    zero and this value is used instead, so that many clients failing at
+    the same time do not retry at the same time as well. If the server
+    sends a `Retry-After` header, its value is used instead.
+    """
+
+    def __init__(self, max_attempts=3, statuses=RETRY_STATUSES,
+                 exceptions=(NoResponseError, ), methods=IDEMPOTENT_METHODS,
+                 retry_post=False, backoff_factor=0.5, max_backoff=30,
+                 jitter=True, respect_retry_after=True, total_timeout=None):
+        """Initializer.
+
+        Args:
+            `max_attempts`: The maximum number of attempts of a request,
+                including the first one.
+            `statuses`: The HTTP status codes to retry.
+            `exceptions`: The exception classes to retry.
+            `methods`: The HTTP methods that can be retried.
+            `retry_post`: Whether POST requests should be retried as well.
+            `backoff_factor`: The base of the exponential backoff, in seconds.
+            `max_backoff`: The maximum backoff, in seconds.
+            `jitter`: Whether to randomize the backoff.
+            `respect_retry_after`: Whether to wait for as long as the
+                `Retry-After` header of the response says.
+            `total_timeout`: The maximum number of seconds to spend on
+                a request, including all retries and waits. `None` for
+                no limit.
+        """
+        self.max_attempts = max_attempts
+        self.statuses = frozenset(statuses)
+        self.exceptions = tuple(exceptions)
+        self.methods = frozenset(m.upper() for m in methods)
+        if retry_post:
+            self.methods |= frozenset(['POST'])
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.respect_retry_after = respect_retry_after
+        self.total_timeout = total_timeout
+
+    def get_delay(self, method, exc, attempt, elapsed):
+        """Return the number of seconds to wait before retrying a request.
+
+        Args:
+            `method`: The HTTP method of the request.
+            `exc`: The exception the last attempt failed with.
+            `attempt`: The number of attempts made so far.
+            `elapsed`: The number of seconds since the first attempt.
+        Returns:
+            The delay in seconds, or None if the request
+            should not be retried.
+        """
+        if attempt >= self.max_attempts:
+            return None
+        if method.upper() not in self.methods:
+            return None
+        if not self.is_retryable(exc):
+            return None
+
+        delay = None
+        if self.respect_retry_after:
+            delay = self._retry_after(exc)
+        if delay is None:
+            delay = self._backoff(attempt)
+
+        if (self.total_timeout is not None and
+                elapsed + delay > self.total_timeout):
+            return None
+        return delay
+
+    def is_retryable(self, exc):
+        """Return whether the given exception indicates a temporary error."""
+        if getattr(exc, 'http_code', None) in self.statuses:
+            return True
+        return isinstance(exc, self.exceptions)
+
+    def _backoff(self, attempt):
+        """Return the backoff before the next attempt."""
+        delay = min(self.max_backoff, self.backoff_factor * 2 ** (attempt - 1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def _retry_after(self, exc):
+        """Return the delay the server asked for, if any.
+
+        The `Retry-After` header is either a number of seconds or an
+        HTTP date.
+        """
+        value = getattr(exc, 'headers', {}).get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0, float(value))
+        except ValueError:
+            pass
+        date = parsedate_tz(value)
+        if date is None:
+            return None
+        return max(0, mktime_tz(date) - time.time())
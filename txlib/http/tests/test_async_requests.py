@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for asynchronous requests.
+"""
+import asyncio
+import io
+import json
+import pathlib
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+
+from txlib.http.async_requests import AsyncHttpRequest  # noqa: E402
+from txlib.http.auth import BasicAuth  # noqa: E402
+from txlib.http.instrumentation import Instrumentation  # noqa: E402
+from txlib.tests.compat import patch  # noqa: E402
+from txlib.http.exceptions import AuthorizationError, ConflictError, \
+    DeadlineExceededError, NoResponseError, NotFoundError, \
+    RemoteServerError  # noqa: E402
+from txlib.http.timeouts import Deadline  # noqa: E402
+
+
+def run(coro):
+    """Run the given coroutine in a new event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+async def handle(request):
+    """Echo back some info about the request, or fail on demand."""
+    status = int(request.query.get('status', 200))
+    await asyncio.sleep(float(request.query.get('sleep', 0)))
+    if request.content_type.startswith('multipart/'):
+        form = await request.post()
+        body = {'fields': {k: v for k, v in form.items() if k != 'file'},
+                'file': form['file'].file.read().decode('utf-8')}
+    else:
+        text = await request.text()
+        body = json.loads(text) if text else None
+    return web.json_response({
+        'method': request.method,
+        'auth': request.headers.get('Authorization'),
+        'header': request.headers.get('header-1'),
+        'length': request.headers.get('Content-Length'),
+        'body': body,
+    }, status=status)
+
+
+async def with_server(test, **kwargs):
+    """Run `test(handler)` against a local server."""
+    app = web.Application()
+    app.router.add_route('*', '/{tail:.*}', handle)
+    async with TestServer(app) as server:
+        host = 'http://{}:{}'.format(server.host, server.port)
+        auth = BasicAuth('api', 'token', {'header-1': 'value-1'})
+        async with AsyncHttpRequest(host, auth=auth, **kwargs) as handler:
+            return await test(handler)
+
+
+class TestAsyncHttpRequest():
+    """Test the AsyncHttpRequest class."""
+
+    def test_get(self):
+        async def test(handler):
+            return await handler.get('/api/2/projects/')
+        res = run(with_server(test))
+        assert res['method'] == 'GET'
+        assert res['auth'].startswith('Basic ')
+        assert res['header'] == 'value-1'
+
+    def test_post_json(self):
+        async def test(handler):
+            return await handler.post('/api/2/projects/',
+                                      json.dumps({'slug': 'txlib'}))
+        res = json.loads(run(with_server(test)))
+        assert res['method'] == 'POST'
+        assert res['body'] == {'slug': 'txlib'}
+
+    def test_put_file(self):
+        async def test(handler):
+            return await handler.put('/api/2/project/txlib/',
+                                     {'name': 'Name'}, b'content')
+        res = json.loads(run(with_server(test)))
+        assert res['method'] == 'PUT'
+        assert res['body'] == {'fields': {'name': 'Name'},
+                               'file': 'content'}
+
+    def test_put_path(self, tmpdir):
+        path = tmpdir.join('messages.po')
+        path.write_binary(b'msgid ""')
+
+        async def test(handler):
+            return await handler.put('/api/2/project/txlib/',
+                                     {'name': 'Name'},
+                                     pathlib.Path(str(path)))
+        res = json.loads(run(with_server(test)))
+        assert res['body'] == {'fields': {'name': 'Name'},
+                               'file': 'msgid ""'}
+        assert int(res['length']) > len(b'msgid ""')
+
+    def test_delete(self):
+        async def test(handler):
+            return await handler.delete('/api/2/project/txlib/')
+        assert json.loads(run(with_server(test)))['method'] == 'DELETE'
+
+    @pytest.mark.parametrize('status, exception', [
+        (401, AuthorizationError),
+        (404, NotFoundError),
+        (409, ConflictError),
+        (503, RemoteServerError),
+    ])
+    def test_errors(self, status, exception):
+        async def test(handler):
+            with pytest.raises(exception) as excinfo:
+                await handler.get('/api/2/projects/',
+                                  params={'status': status})
+            return excinfo.value
+        assert run(with_server(test)).http_code == status
+
+    def test_no_response(self):
+        async def test():
+            async with AsyncHttpRequest('http://127.0.0.1:1') as handler:
+                await handler.get('/api/2/projects/')
+        with pytest.raises(NoResponseError):
+            run(test())
+
+    def test_download(self):
+        async def test(handler):
+            fileobj = io.BytesIO()
+            written = await handler.download('/file', fileobj,
+                                             chunk_size=4)
+            return written, json.loads(fileobj.getvalue().decode('utf-8'))
+        written, res = run(with_server(test))
+        assert written > 0
+        assert res['method'] == 'GET'
+        assert res['auth'] == 'Basic YXBpOnRva2Vu'
+
+    def test_instrumentation(self):
+        events = []
+        instrumentation = Instrumentation(after_response=[events.append])
+
+        async def test(handler):
+            await handler.post('/api/2/projects/', b'{}')
+            with pytest.raises(NotFoundError):
+                await handler.get('/api/2/projects/',
+                                  params={'status': 404})
+        run(with_server(test, instrumentation=instrumentation))
+
+        assert [(e.method, e.template, e.status) for e in events] == [
+            ('POST', 'projects/', 200), ('GET', 'projects/', 404),
+        ]
+        assert events[0].request_bytes == 2
+        assert events[0].response_bytes > 0
+        assert isinstance(events[1].exception, NotFoundError)
+
+    def test_identical_gets_are_coalesced(self):
+        calls = []
+
+        async def fetch(*args):
+            calls.append(args)
+            await asyncio.sleep(0.05)
+            return b'{"a": 1}'
+
+        async def test():
+            handler = AsyncHttpRequest('http://test.com')
+            with patch.object(handler, '_fetch', side_effect=fetch):
+                results = await asyncio.gather(*[
+                    handler.get('/api/2/projects/') for _ in range(5)
+                ] + [handler.get('/api/2/projects/', params={'page': 2})])
+            await handler.close()
+            return results
+        results = run(test())
+        assert len(calls) == 2
+        assert results == [{'a': 1}] * 6
+
+    def test_coalesced_errors(self):
+        async def fetch(*args):
+            await asyncio.sleep(0.05)
+            raise NotFoundError('missing', http_code=404)
+
+        async def test():
+            handler = AsyncHttpRequest('http://test.com')
+            with patch.object(handler, '_fetch', side_effect=fetch):
+                return await asyncio.gather(*[
+                    handler.get('/api/2/projects/') for _ in range(3)
+                ], return_exceptions=True)
+        results = run(test())
+        assert all(isinstance(e, NotFoundError) for e in results)
+
+    def test_deadline(self):
+        async def test(handler):
+            await handler.get('/api/2/projects/', params={'sleep': 1},
+                              deadline=Deadline(0.1))
+        with pytest.raises(DeadlineExceededError):
+            run(with_server(test))
+
+    def test_read_timeout(self):
+        async def test(handler):
+            await handler.get('/api/2/projects/', params={'sleep': 1})
+        with pytest.raises(NoResponseError):
+            run(with_server(test, read_timeout=0.1))
@@ -48,3 +48,11 @@ class TestAuthInfo():
 
         with pytest.raises(ValueError):
             AuthInfo.get(password='password')
+
+    def test_fingerprint(self):
+        assert AuthInfo.get().fingerprint() is None
+        user = AuthInfo.get('api', 'token1').fingerprint()
+        assert user == AuthInfo.get('api', 'token1').fingerprint()
+        assert user != AuthInfo.get('api', 'token2').fingerprint()
+        headers = AuthInfo.get(headers={'Authorization': 'Bearer token'})
+        assert headers.fingerprint() not in (None, user)
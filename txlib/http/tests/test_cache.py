@@ -0,0 +1,439 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for response caches.
+"""
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+import responses
+
+from txlib.http.auth import AuthInfo
+from txlib.http.cache import CacheEntry, DiskCache, MemoryCache, cache_key
+from txlib.http.exceptions import RemoteServerError
+from txlib.http.http_requests import HttpRequest
+from txlib.tests.compat import patch
+
+
+class TestMemoryCache():
+    """Test the MemoryCache class."""
+
+    def test_get_set_delete(self):
+        cache = MemoryCache()
+        entry = CacheEntry('{}', etag='"1"')
+        cache.set('key', entry)
+        assert cache.get('key') is entry
+        cache.delete('key')
+        assert cache.get('key') is None
+
+    def test_least_recently_used_are_evicted(self):
+        cache = MemoryCache(max_entries=2)
+        cache.set('a', CacheEntry('a'))
+        cache.set('b', CacheEntry('b'))
+        cache.get('a')
+        cache.set('c', CacheEntry('c'))
+        assert len(cache) == 2
+        assert cache.get('b') is None
+        assert cache.get('a') is not None
+
+    def test_cache_key(self):
+        assert cache_key('http://a/p/') == 'http://a/p/'
+        assert cache_key('http://a/p/', {'b': 2, 'a': 1}) == \
+            'http://a/p/?a=1&b=2'
+        assert cache_key('http://a/p/?details', {'a': 1}) == \
+            'http://a/p/?details&a=1'
+        assert cache_key('http://a/p/', {'a': 1}, 'fp') == \
+            'http://a/p/?a=1#fp'
+
+    def test_users_are_invalidated(self):
+        cache = MemoryCache()
+        cache.set('http://a/api/2/project/p/#fp', CacheEntry('{}'))
+        cache.set('http://a/api/2/project/p/?details#fp', CacheEntry('{}'))
+        cache.invalidate('http://a/api/2/project/p/')
+        assert len(cache) == 0
+
+
+class TestConditionalRequests():
+    """Test the conditional GET requests of the HttpRequest class."""
+
+    url = 'http://a.org/api/2/project/p/?details'
+
+    @responses.activate
+    def test_not_modified(self):
+        responses.add(responses.GET, self.url, body='{"slug": "p"}',
+                      headers={
+                          'ETag': '"v1"',
+                          'Last-Modified': 'Mon, 02 Sep 2019 12:26:55 GMT',
+                      })
+        responses.add(responses.GET, self.url, status=304)
+        h = HttpRequest('http://a.org', cache=MemoryCache())
+        assert h.get('/api/2/project/p/?details') == {'slug': 'p'}
+        assert h.get('/api/2/project/p/?details') == {'slug': 'p'}
+
+        headers = responses.calls[1].request.headers
+        assert headers['If-None-Match'] == '"v1"'
+        assert headers['If-Modified-Since'] == \
+            'Mon, 02 Sep 2019 12:26:55 GMT'
+
+    @responses.activate
+    def test_modified(self):
+        responses.add(responses.GET, self.url, body='{"slug": "p"}',
+                      headers={'ETag': '"v1"'})
+        responses.add(responses.GET, self.url, body='{"slug": "q"}',
+                      headers={'ETag': '"v2"'})
+        cache = MemoryCache()
+        h = HttpRequest('http://a.org', cache=cache)
+        h.get('/api/2/project/p/?details')
+        assert h.get('/api/2/project/p/?details') == {'slug': 'q'}
+        assert cache.get(self.url).etag == '"v2"'
+
+    @responses.activate
+    def test_no_validators(self):
+        responses.add(responses.GET, self.url, body='{}')
+        cache = MemoryCache()
+        h = HttpRequest('http://a.org', cache=cache)
+        h.get('/api/2/project/p/?details')
+        h.get('/api/2/project/p/?details')
+        assert len(cache) == 0
+        assert 'If-None-Match' not in responses.calls[1].request.headers
+
+
+class TestCachePolicy():
+    """Test the freshness, size and invalidation policies of caches."""
+
+    def test_ttls(self):
+        cache = MemoryCache(ttls={'/stats/': 10,
+                                  'project/%(slug)s/?details': 3600},
+                            default_ttl=5)
+        assert cache.ttl_for('http://a/api/2/project/p/?details') == 3600
+        assert cache.ttl_for('http://a/api/2/project/p/resource/r/stats/') \
+            == 10
+        assert cache.ttl_for('http://a/api/2/project/p/resource/r/') == 5
+
+    def test_store(self):
+        cache = MemoryCache(ttls={'/stats/': 10})
+        with patch('txlib.http.cache.time.time', return_value=100):
+            cache.store('http://a/r/stats/', '{}')
+            cache.store('http://a/r/', '{}', etag='"1"')
+            cache.store('http://a/p/', '{}')
+        assert cache.get('http://a/r/stats/').expires == 110
+        assert cache.get('http://a/r/').expires is None
+        # Neither fresh nor with validators, so useless
+        assert cache.get('http://a/p/') is None
+
+    def test_freshness(self):
+        entry = CacheEntry('{}', expires=100)
+        assert entry.is_fresh(now=99)
+        assert not entry.is_fresh(now=100)
+        assert not CacheEntry('{}').is_fresh()
+
+    def test_max_bytes(self):
+        cache = MemoryCache(max_bytes=10)
+        cache.set('a', CacheEntry('12345'))
+        cache.set('b', CacheEntry('12345'))
+        assert cache.size == 10
+        cache.set('c', CacheEntry('123'))
+        assert cache.get('a') is None
+        assert cache.size == 8
+        # Too big to be cached at all
+        cache.set('d', CacheEntry('12345678901'))
+        assert cache.get('d') is None
+        assert len(cache) == 2
+
+    def test_invalidate(self):
+        cache = MemoryCache()
+        keys = [
+            'http://a/api/2/project/p/?details',
+            'http://a/api/2/project/p/resource/r/?details',
+            'http://a/api/2/project/p/resource/r/content/',
+            'http://a/api/2/project/p/resource/s/?details',
+            'http://a/api/2/project/q/?details',
+        ]
+        for key in keys:
+            cache.set(key, CacheEntry('{}'))
+        cache.invalidate('http://a/api/2/project/p/resource/r/content/')
+        assert [k for k in keys if cache.get(k) is not None] == [
+            'http://a/api/2/project/p/resource/s/?details',
+            'http://a/api/2/project/q/?details',
+        ]
+
+    @pytest.mark.parametrize('cache_class', [MemoryCache, DiskCache])
+    def test_writes_invalidate_the_whole_resource(self, cache_class,
+                                                  tmpdir):
+        if cache_class is DiskCache:
+            cache = DiskCache(str(tmpdir))
+        else:
+            cache = MemoryCache()
+        keys = [
+            'http://a/api/2/project/p/?details',
+            'http://a/api/2/project/p/resource/r/?details',
+            'http://a/api/2/project/p/resource/r/stats/',
+            'http://a/api/2/project/p/resource/r/translation/de',
+            'http://a/api/2/project/p/resource/s/stats/',
+        ]
+        for key in keys:
+            cache.set(key, CacheEntry('{}'))
+        cache.invalidate('http://a/api/2/project/p/resource/r/translation/el')
+        assert [k for k in keys if cache.get(k) is not None] == [
+            'http://a/api/2/project/p/resource/s/stats/',
+        ]
+
+    def test_invalidated_responses_are_not_stored(self):
+        cache = MemoryCache(default_ttl=60)
+        generation = cache.generation
+        cache.invalidate('http://a/api/2/project/p/')
+        cache.store('http://a/api/2/project/p/?details', '{}',
+                    generation=generation)
+        cache.store('http://a/api/2/project/q/?details', '{}',
+                    generation=generation)
+        assert cache.get('http://a/api/2/project/p/?details') is None
+        assert cache.get('http://a/api/2/project/q/?details') is not None
+
+    def test_forgotten_invalidations(self):
+        cache = MemoryCache(default_ttl=60)
+        generation = cache.generation
+        for i in range(cache.invalidation_log_size + 1):
+            cache.invalidate('http://a/api/2/project/q%s/' % i)
+        # Invalidations of the URL may have been forgotten
+        cache.store('http://a/api/2/project/p/?details', '{}',
+                    generation=generation)
+        assert cache.get('http://a/api/2/project/p/?details') is None
+
+
+class TestHttpRequestCache():
+    """Test the response caching of the HttpRequest class."""
+
+    url = 'http://a.org/api/2/project/p/?details'
+
+    @responses.activate
+    def test_fresh_response_is_used(self):
+        responses.add(responses.GET, self.url, body='{"slug": "p"}')
+        h = HttpRequest('http://a.org', cache=MemoryCache(default_ttl=60))
+        h.get('/api/2/project/p/?details')
+        assert h.get('/api/2/project/p/?details') == {'slug': 'p'}
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_stale_response_is_revalidated(self):
+        responses.add(responses.GET, self.url, body='{"slug": "p"}',
+                      headers={'ETag': '"v1"'})
+        responses.add(responses.GET, self.url, status=304)
+        cache = MemoryCache(default_ttl=60)
+        h = HttpRequest('http://a.org', cache=cache)
+        h.get('/api/2/project/p/?details')
+        cache.get(self.url).expires = 0
+        assert h.get('/api/2/project/p/?details') == {'slug': 'p'}
+        assert len(responses.calls) == 2
+        # Fresh again
+        assert cache.get(self.url).is_fresh()
+
+    @responses.activate
+    def test_writes_invalidate(self):
+        responses.add(responses.GET, self.url, body='{"slug": "p"}')
+        responses.add(responses.PUT, self.url, status=500)
+        h = HttpRequest('http://a.org', cache=MemoryCache(default_ttl=60))
+        h.get('/api/2/project/p/?details')
+        with pytest.raises(RemoteServerError):
+            h.put('/api/2/project/p/?details', '{}')
+        h.get('/api/2/project/p/?details')
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_writes_invalidate_stats(self):
+        stats = 'http://a.org/api/2/project/p/resource/r/stats/'
+        translation = 'http://a.org/api/2/project/p/resource/r/translation/el'
+        responses.add(responses.GET, stats, json={'el': {'completed': '0%'}})
+        responses.add(responses.GET, stats, json={'el': {'completed': '1%'}})
+        responses.add(responses.PUT, translation, json={})
+        h = HttpRequest('http://a.org',
+                        cache=MemoryCache(ttls={'/stats/': 600}))
+        h.get('/api/2/project/p/resource/r/stats/')
+        h.put('/api/2/project/p/resource/r/translation/el', '{}')
+        assert h.get('/api/2/project/p/resource/r/stats/') == \
+            {'el': {'completed': '1%'}}
+
+    @responses.activate
+    def test_users_do_not_share_responses(self):
+        responses.add(responses.GET, self.url, body='{"slug": "p"}')
+        cache = MemoryCache(default_ttl=60)
+        for username in ('user1', 'user1', 'user2'):
+            h = HttpRequest('http://a.org', auth=AuthInfo.get(username, 'p'),
+                            cache=cache)
+            assert h.get('/api/2/project/p/?details') == {'slug': 'p'}
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    def test_write_during_get(self):
+        url = 'http://a.org/api/2/project/p/'
+        started = threading.Event()
+        written = threading.Event()
+
+        def get(request):
+            started.set()
+            written.wait(5)
+            return (200, {}, '{"name": "Old"}')
+
+        responses.add_callback(responses.GET, url, callback=get)
+        responses.add(responses.PUT, url, json={})
+        cache = MemoryCache(default_ttl=60)
+        h = HttpRequest('http://a.org', cache=cache)
+        thread = threading.Thread(target=h.get, args=('/api/2/project/p/', ))
+        thread.start()
+        assert started.wait(5)
+        h.put('/api/2/project/p/', '{"name": "New"}')
+        written.set()
+        thread.join()
+        # The response may predate the write
+        assert cache.get(url) is None
+
+
+def _write_entries(directory, start):
+    """Write some entries to a disk cache (in a separate process)."""
+    cache = DiskCache(directory)
+    for i in range(start, start + 50):
+        cache.set('http://a/%s/' % i, CacheEntry('{}', etag='"%s"' % i))
+
+
+class TestDiskCache():
+    """Test the DiskCache class."""
+
+    def test_get_set_delete(self, tmpdir):
+        cache = DiskCache(str(tmpdir))
+        cache.set('http://a/p/', CacheEntry('{}', '"1"', 'date', 100))
+        entry = cache.get('http://a/p/')
+        assert (entry.content, entry.etag, entry.last_modified,
+                entry.expires) == ('{}', '"1"', 'date', 100)
+        cache.delete('http://a/p/')
+        assert cache.get('http://a/p/') is None
+
+    def test_entries_persist(self, tmpdir):
+        DiskCache(str(tmpdir)).set('http://a/p/', CacheEntry('{}', '"1"'))
+        assert DiskCache(str(tmpdir)).get('http://a/p/').etag == '"1"'
+
+    def test_creates_directory(self, tmpdir):
+        directory = str(tmpdir.join('a', 'b'))
+        DiskCache(directory)
+        assert os.path.isfile(os.path.join(directory, DiskCache.filename))
+
+    def test_least_recently_used_are_evicted(self, tmpdir):
+        cache = DiskCache(str(tmpdir), max_bytes=10)
+        # Access times are only updated every `access_resolution` seconds
+        with patch('txlib.http.cache.time.time', return_value=100):
+            cache.set('a', CacheEntry('12345'))
+        with patch('txlib.http.cache.time.time', return_value=200):
+            cache.set('b', CacheEntry('12345'))
+        with patch('txlib.http.cache.time.time', return_value=300):
+            cache.get('a')
+        with patch('txlib.http.cache.time.time', return_value=400):
+            cache.set('c', CacheEntry('123'))
+        assert cache.get('b') is None
+        assert cache.get('a') is not None
+        assert cache.size == 8
+
+    def test_invalidate(self, tmpdir):
+        cache = DiskCache(str(tmpdir))
+        keys = [
+            'http://a/api/2/project/p/?details',
+            'http://a/api/2/project/p/resource/r/?details',
+            'http://a/api/2/project/p/resource/r/content/',
+            'http://a/api/2/project/p/resource/s/?details',
+            'http://a/api/2/project/q/?details',
+        ]
+        for key in keys:
+            cache.set(key, CacheEntry('{}'))
+        cache.invalidate('http://a/api/2/project/p/resource/r/content/')
+        assert [k for k in keys if cache.get(k) is not None] == [
+            'http://a/api/2/project/p/resource/s/?details',
+            'http://a/api/2/project/q/?details',
+        ]
+
+    @responses.activate
+    def test_locked_database(self, tmpdir):
+        url = 'http://a.org/api/2/project/p/?details'
+        responses.add(responses.GET, url, body='{"slug": "p"}')
+        cache = DiskCache(str(tmpdir), ttls={'project/*/': 60}, timeout=30)
+        handler = HttpRequest('http://a.org', cache=cache)
+        assert handler.get('/api/2/project/p/?details') == {'slug': 'p'}
+
+        # Another process is writing to the database
+        lock = sqlite3.connect(cache.path)
+        lock.execute('BEGIN IMMEDIATE')
+        try:
+            start = time.time()
+            with patch('txlib.http.cache.time.time',
+                       return_value=start + 600):
+                # The entry is stale, so it is fetched and stored again
+                assert handler.get('/api/2/project/p/?details') == \
+                    {'slug': 'p'}
+            assert handler.get('/api/2/project/p/?details') == {'slug': 'p'}
+            assert time.time() - start < 5
+        finally:
+            lock.rollback()
+            lock.close()
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    def test_locked_database_does_not_stall_writes(self, tmpdir):
+        url = 'http://a.org/api/2/project/p/'
+        responses.add(responses.GET, url, body='{"slug": "p"}')
+        responses.add(responses.PUT, url, body='{}')
+        cache = DiskCache(str(tmpdir), timeout=30)
+        cache.set(url, CacheEntry('{}'))
+        handler = HttpRequest('http://a.org', cache=cache)
+
+        lock = sqlite3.connect(cache.path)
+        lock.execute('BEGIN IMMEDIATE')
+        try:
+            start = time.time()
+            # Neither the removal of the stale entry, nor the
+            # invalidation waits for long
+            assert handler.get('/api/2/project/p/') == {'slug': 'p'}
+            handler.put('/api/2/project/p/', {'name': 'P'})
+            assert time.time() - start < 5
+        finally:
+            lock.rollback()
+            lock.close()
+
+    def test_contains(self, tmpdir):
+        for cache in (MemoryCache(), DiskCache(str(tmpdir))):
+            cache.set('http://a/p/', CacheEntry('{}'))
+            assert 'http://a/p/' in cache
+            assert 'http://a/q/' not in cache
+
+    def test_database_errors_are_misses(self, tmpdir):
+        cache = DiskCache(str(tmpdir))
+        cache.set('http://a/p/', CacheEntry('{}'))
+        os.remove(cache.path)
+        os.mkdir(cache.path)
+        cache._local = threading.local()
+        assert cache.get('http://a/p/') is None
+        cache.set('http://a/p/', CacheEntry('{}'))
+        cache.delete('http://a/p/')
+        cache.invalidate('http://a/p/')
+
+    def test_concurrent_processes(self, tmpdir):
+        processes = [
+            multiprocessing.Process(target=_write_entries,
+                                    args=(str(tmpdir), i * 50))
+            for i in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert all(process.exitcode == 0 for process in processes)
+        assert len(DiskCache(str(tmpdir))) == 200
+
+    @responses.activate
+    def test_revalidation_across_handlers(self, tmpdir):
+        url = 'http://a.org/api/2/project/p/?details'
+        responses.add(responses.GET, url, body='{"slug": "p"}',
+                      headers={'ETag': '"v1"'})
+        responses.add(responses.GET, url, status=304)
+        for _ in range(2):
+            h = HttpRequest('http://a.org', cache=DiskCache(str(tmpdir)))
+            assert h.get('/api/2/project/p/?details') == {'slug': 'p'}
+        assert responses.calls[1].request.headers['If-None-Match'] == '"v1"'
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the circuit breaker.
+"""
+import pytest
+import requests
+
+from txlib.api.tests import utils
+from txlib.http.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from txlib.http.exceptions import CircuitOpenError, NoResponseError, \
+    NotFoundError, RemoteServerError, ServerError
+from txlib.http.http_requests import HttpRequest
+from txlib.http.instrumentation import Instrumentation
+from txlib.tests.compat import patch
+
+
+URL = 'https://www.transifex.com/api/2/projects/'
+HOST = 'www.transifex.com'
+
+
+class Clock(object):
+    """A fake `time.time()`."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    clock = Clock()
+    with patch('txlib.http.circuit.time.time', clock):
+        yield clock
+
+
+def fail(breaker, times=1, exception=None):
+    """Record failed requests."""
+    for _ in range(times):
+        breaker.allow(URL)
+        breaker.record(URL, exception or RemoteServerError('error'))
+
+
+def succeed(breaker, times=1):
+    """Record successful requests."""
+    for _ in range(times):
+        breaker.allow(URL)
+        breaker.record(URL)
+
+
+class TestCircuitBreaker():
+    """Test the CircuitBreaker class."""
+
+    def test_opens_after_consecutive_failures(self, clock):
+        breaker = CircuitBreaker(consecutive_failures=3)
+        fail(breaker, 2)
+        succeed(breaker)
+        fail(breaker, 2)
+        assert breaker.state(URL) == CLOSED
+        fail(breaker)
+        assert breaker.state(URL) == OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.allow(URL)
+
+    def test_opens_on_error_rate(self, clock):
+        breaker = CircuitBreaker(consecutive_failures=None, error_rate=0.5,
+                                 window=4)
+        fail(breaker)
+        succeed(breaker, 2)
+        assert breaker.state(URL) == CLOSED
+        fail(breaker)
+        assert breaker.state(URL) == OPEN
+
+    def test_client_errors_are_not_failures(self, clock):
+        breaker = CircuitBreaker(consecutive_failures=1)
+        fail(breaker, 3, NotFoundError('missing'))
+        assert breaker.state(URL) == CLOSED
+        fail(breaker, 1, NoResponseError('timeout'))
+        assert breaker.state(URL) == OPEN
+
+    def test_half_open_probe_success(self, clock):
+        breaker = CircuitBreaker(consecutive_failures=1, reset_timeout=30,
+                                 half_open_probes=2)
+        fail(breaker)
+        clock.now += 29
+        with pytest.raises(CircuitOpenError):
+            breaker.allow(URL)
+        clock.now += 1
+        assert breaker.state(URL) == HALF_OPEN
+
+        breaker.allow(URL)
+        breaker.allow(URL)
+        # Only as many probes as needed are let through
+        with pytest.raises(CircuitOpenError):
+            breaker.allow(URL)
+        breaker.record(URL)
+        assert breaker.state(URL) == HALF_OPEN
+        breaker.record(URL)
+        assert breaker.state(URL) == CLOSED
+        # Old failures are forgotten
+        succeed(breaker)
+        assert breaker.state(URL) == CLOSED
+
+    def test_half_open_probe_failure(self, clock):
+        breaker = CircuitBreaker(consecutive_failures=1, reset_timeout=30)
+        fail(breaker)
+        clock.now += 30
+        fail(breaker)
+        assert breaker.state(URL) == OPEN
+        clock.now += 29
+        with pytest.raises(CircuitOpenError):
+            breaker.allow(URL)
+
+    def test_hosts_are_separate(self, clock):
+        breaker = CircuitBreaker(consecutive_failures=1)
+        fail(breaker)
+        breaker.allow('https://other.com/api/2/projects/')
+        assert breaker.states() == {HOST: OPEN, 'other.com': CLOSED}
+
+    def test_state_change_callback(self, clock):
+        changes = []
+        breaker = CircuitBreaker(
+            consecutive_failures=1, reset_timeout=1,
+            on_state_change=lambda *args: changes.append(
+                args + (breaker.state(args[0]), )
+            )
+        )
+        fail(breaker)
+        clock.now += 1
+        succeed(breaker)
+        assert changes == [
+            (HOST, CLOSED, OPEN, OPEN),
+            (HOST, OPEN, HALF_OPEN, HALF_OPEN),
+            (HOST, HALF_OPEN, CLOSED, CLOSED),
+        ]
+
+    def test_reset(self, clock):
+        breaker = CircuitBreaker(consecutive_failures=1)
+        fail(breaker)
+        breaker.reset()
+        assert breaker.states() == {}
+        breaker.allow(URL)
+
+
+class TestHandlerCircuitBreaker():
+    """Test the circuit breaker of HttpRequest."""
+
+    def test_fails_fast_when_open(self, clock):
+        events = []
+        breaker = CircuitBreaker(consecutive_failures=2)
+        h = HttpRequest('https://www.transifex.com', circuit_breaker=breaker,
+                        instrumentation=Instrumentation(
+                            after_response=[events.append]
+                        ))
+        with patch('requests.Session.request',
+                   side_effect=requests.ConnectionError) as request:
+            for _ in range(2):
+                with pytest.raises(NoResponseError):
+                    h.get('/api/2/projects/')
+            with pytest.raises(CircuitOpenError) as excinfo:
+                h.get('/api/2/projects/')
+        assert request.call_count == 2
+        assert isinstance(excinfo.value, ServerError)
+        assert [e.circuit_state for e in events] == [CLOSED, OPEN, OPEN]
+
+    def test_probe_closes_the_circuit(self, clock):
+        breaker = CircuitBreaker(consecutive_failures=1, reset_timeout=10)
+        h = HttpRequest('https://www.transifex.com', circuit_breaker=breaker)
+        with patch('requests.Session.request',
+                   return_value=utils.TestResponse(503, b'')):
+            with pytest.raises(RemoteServerError):
+                h.get('/api/2/projects/')
+        clock.now += 10
+        with patch('requests.Session.request',
+                   return_value=utils.TestResponse(200, b'[]')):
+            assert h.get('/api/2/projects/') == []
+        assert breaker.state(HOST) == CLOSED
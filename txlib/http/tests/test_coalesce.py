@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the coalescing of concurrent requests.
+"""
+import threading
+import time
+
+import pytest
+
+from txlib.api.tests import utils
+from txlib.http.coalesce import SingleFlight
+from txlib.http.exceptions import NotFoundError
+from txlib.http.http_requests import HttpRequest
+from txlib.tests.compat import patch
+
+
+def run_threads(target, count=5):
+    """Run `target()` in `count` threads and return their results."""
+    results = [None] * count
+
+    def run(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i, ))
+               for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class SlowCall(object):
+    """A function that blocks until released and counts its calls."""
+
+    def __init__(self, result=None, exception=None):
+        self.calls = 0
+        self.result = result
+        self.exception = exception
+        self.released = threading.Event()
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        self.released.wait(5)
+        if self.exception is not None:
+            raise self.exception
+        return self.result
+
+    def release_later(self, delay=0.1):
+        threading.Timer(delay, self.released.set).start()
+
+
+class TestSingleFlight():
+    """Test the SingleFlight class."""
+
+    def test_concurrent_calls_share_the_result(self):
+        flight = SingleFlight()
+        func = SlowCall(result=b'content')
+        func.release_later()
+        results = run_threads(lambda: flight.do('key', func))
+        assert func.calls == 1
+        assert results == [b'content'] * 5
+
+    def test_concurrent_calls_share_the_exception(self):
+        flight = SingleFlight()
+        error = NotFoundError('missing', http_code=404)
+        func = SlowCall(exception=error)
+        func.release_later()
+        results = run_threads(lambda: flight.do('key', func))
+        assert func.calls == 1
+        assert all(result is error for result in results)
+
+    def test_different_keys(self):
+        flight = SingleFlight()
+        func = SlowCall(result=1)
+        func.release_later()
+        keys = iter(range(3))
+        lock = threading.Lock()
+
+        def call():
+            with lock:
+                key = next(keys)
+            return flight.do(key, func)
+        run_threads(call, count=3)
+        assert func.calls == 3
+
+    def test_sequential_calls_are_not_shared(self):
+        flight = SingleFlight()
+        func = SlowCall(result=1)
+        func.released.set()
+        flight.do('key', func)
+        flight.do('key', func)
+        assert func.calls == 2
+
+    def test_forget(self):
+        flight = SingleFlight()
+        slow = SlowCall(result='old')
+        leader = threading.Thread(target=flight.do, args=('key', slow))
+        leader.start()
+        time.sleep(0.05)
+        flight.forget()
+        fast = SlowCall(result='new')
+        fast.released.set()
+        assert flight.do('key', fast) == 'new'
+        slow.released.set()
+        leader.join()
+        assert fast.calls == 1
+
+
+class TestHandlerCoalescing():
+    """Test the coalescing of the GET requests of HttpRequest."""
+
+    def test_identical_gets_are_coalesced(self):
+        request = SlowCall(result=utils.TestResponse(200, b'{"a": 1}'))
+        request.release_later()
+        h = HttpRequest('http://test.com')
+        with patch('requests.Session.request', side_effect=request):
+            results = run_threads(lambda: h.get('/api/2/projects/'))
+        assert request.calls == 1
+        assert results == [{'a': 1}] * 5
+        # Every caller gets its own object
+        assert len(set(id(result) for result in results)) == 5
+
+    def test_different_params_are_not_coalesced(self):
+        request = SlowCall(result=utils.TestResponse(200, b'{}'))
+        request.release_later()
+        h = HttpRequest('http://test.com')
+        pages = iter(range(3))
+        lock = threading.Lock()
+
+        def get():
+            with lock:
+                page = next(pages)
+            return h.get('/api/2/projects/', params={'page': page})
+        with patch('requests.Session.request', side_effect=request):
+            run_threads(get, count=3)
+        assert request.calls == 3
+
+    def test_coalescing_can_be_disabled(self):
+        request = SlowCall(result=utils.TestResponse(200, b'{}'))
+        request.release_later()
+        h = HttpRequest('http://test.com', coalesce=False)
+        with patch('requests.Session.request', side_effect=request):
+            run_threads(lambda: h.get('/api/2/projects/'))
+        assert request.calls == 5
+
+    @pytest.mark.parametrize('method', ['put', 'post'])
+    def test_writes_are_not_coalesced(self, method):
+        request = SlowCall(result=utils.TestResponse(200, b'{}'))
+        request.release_later()
+        h = HttpRequest('http://test.com')
+        with patch('requests.Session.request', side_effect=request):
+            run_threads(lambda: getattr(h, method)('/api/2/projects/',
+                                                   b'{}'))
+        assert request.calls == 5
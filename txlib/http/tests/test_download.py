@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for streaming downloads.
+"""
+import io
+
+import pytest
+import responses
+from requests.exceptions import ChunkedEncodingError
+
+from txlib.http.exceptions import NotFoundError, RemoteServerError
+from txlib.http.http_requests import HttpRequest
+from txlib.http.retry import RetryPolicy
+from txlib.tests.compat import patch
+
+
+class UnseekableFile(object):
+    """A file object that can only be written to."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+
+
+class StreamResponse(object):
+    """A streamed response, which yields (or raises) the given chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for chunk in self.chunks:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+class TestDownload():
+    """Test the downloads of the HttpRequest class."""
+
+    url = 'http://a.org/api/2/project/p/resource/r/content/?file'
+    path = '/api/2/project/p/resource/r/content/?file'
+
+    @responses.activate
+    def test_download_in_chunks(self):
+        body = b'x' * 1000
+        responses.add(responses.GET, self.url, body=body)
+        fileobj = UnseekableFile()
+        h = HttpRequest('http://a.org')
+        assert h.download(self.path, fileobj, chunk_size=100) == 1000
+        assert len(fileobj.chunks) == 10
+        assert b''.join(fileobj.chunks) == body
+
+    @responses.activate
+    def test_download_params(self):
+        responses.add(responses.GET, self.url + '&mode=reviewed', body=b'data')
+        h = HttpRequest('http://a.org')
+        h.download(self.path, io.BytesIO(), params={'mode': 'reviewed'})
+        assert responses.calls[0].request.url.endswith('?file&mode=reviewed')
+
+    @responses.activate
+    def test_download_error(self):
+        responses.add(responses.GET, self.url, status=404)
+        h = HttpRequest('http://a.org')
+        fileobj = io.BytesIO()
+        with pytest.raises(NotFoundError):
+            h.download(self.path, fileobj)
+        assert fileobj.getvalue() == b''
+
+    @patch('txlib.http.http_requests.time.sleep')
+    def test_interrupted_download_starts_over(self, mock_sleep):
+        h = HttpRequest('http://a.org', retry=RetryPolicy())
+        attempts = [
+            StreamResponse([b'garbage', ChunkedEncodingError()]),
+            StreamResponse([b'da', b'ta']),
+        ]
+        fileobj = io.BytesIO()
+        fileobj.write(b'header')
+        with patch.object(HttpRequest, '_request_once',
+                          side_effect=attempts):
+            assert h.download(self.path, fileobj) == 4
+        assert fileobj.getvalue() == b'headerdata'
+        assert all(attempt.closed for attempt in attempts)
+
+    @responses.activate
+    @patch('txlib.http.http_requests.time.sleep')
+    def test_unseekable_download_is_not_retried(self, mock_sleep):
+        responses.add(responses.GET, self.url, status=503)
+        h = HttpRequest('http://a.org', retry=RetryPolicy())
+        with pytest.raises(RemoteServerError):
+            h.download(self.path, UnseekableFile())
+        assert len(responses.calls) == 1
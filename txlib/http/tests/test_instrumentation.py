@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the instrumentation of requests.
+"""
+import io
+
+import pytest
+import requests
+import responses
+
+from txlib.http.exceptions import NoResponseError, NotFoundError
+from txlib.http.http_requests import HttpRequest
+from txlib.http.instrumentation import Instrumentation, LatencyAggregator, \
+    RequestEvent
+from txlib.http.retry import RetryPolicy
+from txlib.tests.compat import patch
+
+
+STATS = 'project/%(project_slug)s/resource/%(slug)s/stats/'
+STATS_URL = 'http://test.com/api/2/project/p1/resource/r1/stats/'
+
+
+def instrumented_handler(**kwargs):
+    """Return a handler and the list of events reported by it."""
+    events = []
+    instrumentation = Instrumentation(
+        before_request=[lambda e: events.append(('before', e))],
+        after_response=[lambda e: events.append(('after', e))],
+    )
+    handler = HttpRequest('http://test.com',
+                          instrumentation=instrumentation, **kwargs)
+    return handler, events
+
+
+class TestInstrumentation():
+    """Test the events reported by the handlers."""
+
+    @responses.activate
+    def test_successful_request(self):
+        responses.add(responses.PUT, STATS_URL, body=b'{"a": 1}')
+        handler, events = instrumented_handler()
+        handler.put('/api/2/project/p1/resource/r1/stats/', b'{}')
+
+        assert [when for when, _ in events] == ['before', 'after']
+        event = events[0][1]
+        assert event is events[1][1]
+        assert event.method == 'PUT'
+        assert event.url == STATS_URL
+        assert event.template == STATS
+        assert event.status == 200
+        assert event.request_bytes == 2
+        assert event.response_bytes == 8
+        assert event.retries == 0
+        assert event.latency >= 0
+        assert event.exception is None
+
+    @responses.activate
+    def test_failed_request(self):
+        responses.add(responses.GET, STATS_URL, body=b'missing', status=404)
+        handler, events = instrumented_handler()
+        with pytest.raises(NotFoundError) as excinfo:
+            handler.get('/api/2/project/p1/resource/r1/stats/')
+
+        event = events[-1][1]
+        assert event.status == 404
+        assert event.response_bytes == 7
+        assert event.exception is excinfo.value
+
+    def test_no_response(self):
+        handler, events = instrumented_handler()
+        with patch('requests.Session.request',
+                   side_effect=requests.ConnectionError):
+            with pytest.raises(NoResponseError):
+                handler.get('/api/2/projects/')
+        event = events[-1][1]
+        assert event.status is None
+        assert isinstance(event.exception, NoResponseError)
+
+    @responses.activate
+    def test_retries_are_counted(self):
+        responses.add(responses.GET, STATS_URL, status=503)
+        responses.add(responses.GET, STATS_URL, status=503)
+        responses.add(responses.GET, STATS_URL, body=b'{}')
+        handler, events = instrumented_handler(
+            retry=RetryPolicy(jitter=False)
+        )
+        with patch('txlib.http.http_requests.time.sleep'):
+            handler.get('/api/2/project/p1/resource/r1/stats/')
+
+        assert len(events) == 2
+        assert events[-1][1].retries == 2
+        assert events[-1][1].status == 200
+
+    @responses.activate
+    def test_download(self):
+        url = 'http://test.com/api/2/project/p1/resource/r1/content/?file'
+        responses.add(responses.GET, url, body=b'content',
+                      match_querystring=True)
+        handler, events = instrumented_handler()
+        handler.download('/api/2/project/p1/resource/r1/content/?file',
+                         io.BytesIO())
+
+        event = events[-1][1]
+        assert event.template == \
+            'project/%(project_slug)s/resource/%(slug)s/content/?file'
+        assert event.response_bytes == 7
+
+    @responses.activate
+    def test_failing_callbacks_are_ignored(self):
+        responses.add(responses.GET, STATS_URL, body=b'{}')
+
+        def fail(event):
+            raise ValueError()
+
+        handler = HttpRequest('http://test.com', instrumentation=(
+            Instrumentation(before_request=[fail], after_response=[fail])
+        ))
+        assert handler.get('/api/2/project/p1/resource/r1/stats/') == {}
+
+    def test_custom_templates(self):
+        instrumentation = Instrumentation(templates=['projects/', 'x/*/'])
+        assert instrumentation.template_for(
+            'https://test.com/api/2/x/1/'
+        ) == 'x/*/'
+        assert instrumentation.template_for(
+            'https://test.com/api/2/project/p1/?details'
+        ) == '/api/2/project/p1/?details'
+
+
+class TestLatencyAggregator():
+    """Test the LatencyAggregator class."""
+
+    def event(self, template, latency):
+        event = RequestEvent('GET', 'http://test.com/', template)
+        event.latency = latency
+        return event
+
+    def test_percentiles(self):
+        aggregator = LatencyAggregator()
+        for latency in range(100, 0, -1):
+            aggregator(self.event('a', latency))
+        aggregator(self.event('b', 3))
+
+        result = aggregator.percentiles()
+        assert result['a'] == {'count': 100, 'p50': 50, 'p95': 95,
+                               'p99': 99}
+        assert result['b'] == {'count': 1, 'p50': 3, 'p95': 3, 'p99': 3}
+        assert aggregator.percentiles([90])['a'] == {'count': 100,
+                                                     'p90': 90}
+
+    def test_max_samples(self):
+        aggregator = LatencyAggregator(max_samples=10)
+        for latency in range(100):
+            aggregator(self.event('a', latency))
+        assert aggregator.percentiles()['a']['count'] == 10
+        assert aggregator.percentiles()['a']['p50'] == 94
+
+    def test_reset(self):
+        aggregator = LatencyAggregator()
+        aggregator(self.event('a', 1))
+        aggregator.reset()
+        assert aggregator.percentiles() == {}
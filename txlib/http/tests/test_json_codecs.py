@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the JSON codecs.
+"""
+import pytest
+import responses
+
+from txlib.http.http_requests import HttpRequest
+from txlib.http.json_codecs import JsonCodec, OrjsonCodec, UjsonCodec, \
+    fastest_codec, get_codec
+from txlib.registry import registry
+from txlib.tests.compat import MagicMock, patch
+
+
+DOCUMENT = {u'name': u'Ελληνικά', u'stats': {u'el': 12}}
+
+
+@pytest.fixture(autouse=True)
+def clean_codec():
+    """Remove any codec set up by a test."""
+    yield
+    registry.remove('json_codec')
+
+
+@pytest.mark.parametrize('codec_class', [JsonCodec, OrjsonCodec, UjsonCodec])
+class TestCodecs():
+    """Test that all codecs behave the same, whether their module is
+    installed or not."""
+
+    def test_loads(self, codec_class):
+        codec = codec_class()
+        data = u'{"name": "Ελληνικά", "stats": {"el": 12}}'
+        assert codec.loads(data.encode('utf-8')) == DOCUMENT
+        assert codec.loads(data) == DOCUMENT
+
+    def test_dumps(self, codec_class):
+        codec = codec_class()
+        data = codec.dumps(DOCUMENT)
+        assert isinstance(data, bytes)
+        assert JsonCodec().loads(data) == DOCUMENT
+
+    def test_fallback(self, codec_class):
+        with patch.object(codec_class, 'module_name', 'doesnotexist',
+                          create=True):
+            codec = codec_class()
+        assert codec.loads(codec.dumps(DOCUMENT)) == DOCUMENT
+
+
+def test_fastest_codec():
+    with patch.object(OrjsonCodec, 'module_name', 'doesnotexist'), \
+            patch.object(UjsonCodec, 'module_name', 'doesnotexist'):
+        assert type(fastest_codec()) is JsonCodec
+    pytest.importorskip('orjson')
+    assert type(fastest_codec()) is OrjsonCodec
+
+
+def test_registry_codec():
+    assert type(get_codec()) is JsonCodec
+    codec = JsonCodec()
+    registry.setup({'json_codec': codec})
+    assert get_codec() is codec
+
+
+@responses.activate
+def test_handler_uses_registry_codec():
+    responses.add(responses.GET, 'http://test.com/api/2/projects/',
+                  body=b'[]')
+    codec = MagicMock()
+    codec.loads.return_value = ['decoded']
+    registry.setup({'json_codec': codec})
+
+    assert HttpRequest('http://test.com').get('/api/2/projects/') == \
+        ['decoded']
+    codec.loads.assert_called_once_with(b'[]')
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for streamed multipart bodies.
+"""
+import io
+import mmap
+import pytest
+import responses
+import six
+
+from txlib.http.exceptions import RemoteServerError
+from txlib.http.http_requests import HttpRequest
+from txlib.http.multipart import MultipartEncoder, open_content
+from txlib.http.retry import RetryPolicy
+from txlib.tests.compat import patch
+
+
+py3_only = pytest.mark.skipif(six.PY2, reason='pathlib requires Python 3')
+
+EXPECTED = (
+    b'--b\r\n'
+    b'Content-Disposition: form-data; name="name"\r\n\r\n'
+    b'Name\r\n'
+    b'--b\r\n'
+    b'Content-Disposition: form-data; name="file"; filename="file"\r\n\r\n'
+    b'content\r\n'
+    b'--b--\r\n'
+)
+
+
+class Unseekable(io.RawIOBase):
+    """A binary stream that can only be read, like a pipe."""
+
+    def __init__(self, content):
+        self._content = io.BytesIO(content)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        chunk = self._content.read(len(buf))
+        buf[:len(chunk)] = chunk
+        return len(chunk)
+
+
+class TestMultipartEncoder():
+    """Test the MultipartEncoder class."""
+
+    @pytest.mark.parametrize('content', [
+        b'content',
+        bytearray(b'content'),
+        memoryview(b'content'),
+        io.BytesIO(b'content'),
+    ])
+    def test_body(self, content):
+        body = MultipartEncoder({'name': 'Name'}, {'file': content},
+                                boundary='b')
+        assert len(body) == len(EXPECTED)
+        assert body.read() == EXPECTED
+        assert body.read() == b''
+        assert body.content_type == 'multipart/form-data; boundary=b'
+
+    def test_list_fields(self):
+        body = MultipartEncoder({'categories': ['a', 'b'], 'tags': ()},
+                                {'file': b'content'}, boundary='b')
+        assert body.read() == (
+            b'--b\r\n'
+            b'Content-Disposition: form-data; name="categories"\r\n\r\n'
+            b'a\r\n'
+            b'--b\r\n'
+            b'Content-Disposition: form-data; name="categories"\r\n\r\n'
+            b'b\r\n'
+            b'--b\r\n'
+            b'Content-Disposition: form-data; name="file"; '
+            b'filename="file"\r\n\r\n'
+            b'content\r\n'
+            b'--b--\r\n'
+        )
+
+    def test_read_in_chunks(self):
+        body = MultipartEncoder({'name': 'Name'}, {'file': b'content'},
+                                boundary='b')
+        chunks = []
+        while True:
+            chunk = body.read(5)
+            if not chunk:
+                break
+            assert len(chunk) <= 5
+            chunks.append(chunk)
+        assert b''.join(chunks) == EXPECTED
+
+    def test_rewind(self):
+        body = MultipartEncoder({'name': 'Name'},
+                                {'file': io.BytesIO(b'content')},
+                                boundary='b')
+        body.read(60)
+        body.rewind()
+        assert b''.join(body) == EXPECTED
+
+    def test_file_is_sent_from_current_position(self):
+        fileobj = io.BytesIO(b'skipped|content')
+        fileobj.seek(8)
+        body = MultipartEncoder({'name': 'Name'}, {'file': fileobj},
+                                boundary='b')
+        assert len(body) == len(EXPECTED)
+        body.read()
+        body.rewind()
+        assert body.read() == EXPECTED
+
+    def test_none_fields_are_skipped(self):
+        body = MultipartEncoder({'name': 'Name', 'slug': None},
+                                {'file': b'content'}, boundary='b')
+        assert body.read() == EXPECTED
+
+    def test_mmap(self, tmpdir):
+        path = tmpdir.join('file')
+        path.write_binary(b'content')
+        with path.open('rb') as f:
+            content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            body = MultipartEncoder({'name': 'Name'}, {'file': content},
+                                    boundary='b')
+            assert body.read() == EXPECTED
+            content.close()
+
+    def test_text_files_are_rejected(self):
+        with pytest.raises(ValueError):
+            MultipartEncoder({}, {'file': io.StringIO(u'content')})
+
+
+class TestOpenContent():
+    """Test the open_content() function."""
+
+    @py3_only
+    def test_path(self, tmpdir):
+        from pathlib import Path
+
+        path = tmpdir.join('file')
+        path.write_binary(b'content')
+        with open_content(Path(str(path))) as fileobj:
+            assert fileobj.read() == b'content'
+        assert fileobj.closed
+
+    def test_strings_are_not_paths(self):
+        with open_content('content') as content:
+            assert content == 'content'
+
+    def test_unseekable_file(self):
+        with open_content(Unseekable(b'content')) as fileobj:
+            assert fileobj.seekable()
+            assert fileobj.read() == b'content'
+
+
+class TestStreamedUploads():
+    """Test uploads with the HttpRequest handler."""
+
+    hostname = 'http://test.com'
+    url = 'http://test.com/api/2/project/txlib/resources/'
+
+    @responses.activate
+    @py3_only
+    def test_upload_path(self, tmpdir):
+        from pathlib import Path
+
+        path = tmpdir.join('messages.po')
+        path.write_binary(b'msgid ""')
+        responses.add(responses.POST, self.url, json={}, status=201)
+
+        h = HttpRequest(self.hostname)
+        h.post('/api/2/project/txlib/resources/', {'slug': 'messages'},
+               Path(str(path)))
+
+        request = responses.calls[0].request
+        content = request.body
+        assert request.headers['Content-Length'] == str(len(content))
+        assert 'Transfer-Encoding' not in request.headers
+        assert request.headers['Content-type'].startswith(
+            'multipart/form-data; boundary='
+        )
+        assert b'name="slug"\r\n\r\nmessages\r\n' in content
+        assert b'filename="file"\r\n\r\nmsgid ""\r\n' in content
+
+    @responses.activate
+    def test_retried_upload_is_sent_again(self):
+        bodies = []
+
+        def read_body(request):
+            bodies.append(request.body)
+            return (503 if len(bodies) == 1 else 200, {}, '{}')
+
+        responses.add_callback(responses.PUT, self.url, callback=read_body)
+        h = HttpRequest(self.hostname, retry=RetryPolicy(jitter=False))
+        with patch('txlib.http.http_requests.time.sleep'):
+            h.put('/api/2/project/txlib/resources/', {},
+                  io.BytesIO(b'content'))
+        assert len(bodies) == 2
+        assert bodies[0] == bodies[1]
+        assert b'\r\ncontent\r\n' in bodies[1]
+
+    @responses.activate
+    def test_failed_upload(self):
+        responses.add(responses.PUT, self.url, status=500)
+        h = HttpRequest(self.hostname)
+        with pytest.raises(RemoteServerError):
+            h.put('/api/2/project/txlib/resources/', {}, b'content')
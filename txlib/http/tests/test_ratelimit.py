@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for client-side rate limiting.
+"""
+import threading
+
+import pytest
+import responses
+
+from txlib.http.exceptions import RateLimitExceededError
+from txlib.http.http_requests import HttpRequest
+from txlib.http.ratelimit import RateLimiter, TokenBucket
+from txlib.tests.compat import patch
+
+
+class FakeClock(object):
+    """A clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    clock = FakeClock()
+    with patch('txlib.http.ratelimit.time.time', clock):
+        yield clock
+
+
+class TestTokenBucket():
+    """Test the TokenBucket class."""
+
+    def test_burst(self, clock):
+        bucket = TokenBucket(rate=2, burst=3)
+        assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+        assert bucket.reserve() == 0.5
+        assert bucket.reserve() == 1
+
+    def test_refill(self, clock):
+        bucket = TokenBucket(rate=2, burst=2)
+        bucket.reserve()
+        bucket.reserve()
+        clock.now += 0.5
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0.5
+
+    def test_timeout(self, clock):
+        bucket = TokenBucket(rate=1, burst=1)
+        assert bucket.reserve(timeout=0) == 0
+        assert bucket.reserve(timeout=0) is None
+        assert bucket.reserve(timeout=1) == 1
+
+    def test_refund(self, clock):
+        bucket = TokenBucket(rate=1, burst=1)
+        bucket.reserve()
+        bucket.refund()
+        assert bucket.reserve(timeout=0) == 0
+
+    def test_invalid_rate(self):
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0)
+
+    def test_thread_safety(self, clock):
+        bucket = TokenBucket(rate=1, burst=1)
+        waits = []
+
+        def reserve():
+            for _ in range(100):
+                waits.append(bucket.reserve())
+        threads = [threading.Thread(target=reserve) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(waits) == list(range(400))
+
+
+class TestRateLimiter():
+    """Test the RateLimiter class."""
+
+    def test_global_limit(self, clock):
+        limiter = RateLimiter(rate=1, burst=1)
+        assert limiter.reserve('GET', 'http://a/api/2/projects/') == 0
+        assert limiter.reserve('PUT', 'http://a/api/2/projects/') == 1
+
+    def test_per_method_limit(self, clock):
+        limiter = RateLimiter(methods={'put': (1, 1)})
+        assert limiter.reserve('PUT', 'http://a/') == 0
+        assert limiter.reserve('PUT', 'http://a/') == 1
+        assert limiter.reserve('GET', 'http://a/') == 0
+
+    def test_per_path_limit(self, clock):
+        limiter = RateLimiter(paths={
+            'project/*/resource/*/translation/': (1, 1),
+        })
+        url = 'http://a/api/2/project/p/resource/r/translation/el'
+        assert limiter.reserve('GET', url) == 0
+        assert limiter.reserve('GET', url.replace('/el', '/fr')) == 1
+        assert limiter.reserve('GET', 'http://a/api/2/project/p/') == 0
+
+    def test_fail_fast(self, clock):
+        limiter = RateLimiter(rate=1, burst=1, methods={'GET': (10, 10)},
+                              block=False)
+        limiter.reserve('GET', 'http://a/')
+        with pytest.raises(RateLimitExceededError):
+            limiter.reserve('GET', 'http://a/')
+        # The token of the method bucket was given back
+        assert limiter._method_buckets['GET']._tokens == 9
+
+
+class TestHttpRequestRateLimit():
+    """Test the rate limiting of the HttpRequest class."""
+
+    @responses.activate
+    @patch('txlib.http.http_requests.time.sleep')
+    def test_requests_wait(self, mock_sleep, clock):
+        responses.add(responses.GET, 'http://a.org/api/2/projects/',
+                      body='{}')
+        h = HttpRequest('http://a.org', rate_limiter=RateLimiter(rate=4))
+        for _ in range(6):
+            h.get('/api/2/projects/')
+        assert [c[0][0] for c in mock_sleep.call_args_list] == [0.25, 0.5]
+
+    @responses.activate
+    def test_requests_fail_fast(self, clock):
+        responses.add(responses.GET, 'http://a.org/api/2/projects/',
+                      body='{}')
+        limiter = RateLimiter(rate=1, block=False)
+        h = HttpRequest('http://a.org', rate_limiter=limiter)
+        h.get('/api/2/projects/')
+        with pytest.raises(RateLimitExceededError):
+            h.get('/api/2/projects/')
+        assert len(responses.calls) == 1
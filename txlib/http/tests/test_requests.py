@@ -9,6 +9,7 @@ import pytest
 from txlib.http.base import BaseRequest
 from txlib.http.http_requests import HttpRequest
 from txlib.http.auth import AnonymousAuth, BasicAuth
+from txlib.tests.compat import patch
 from txlib.http.exceptions import UnknownError, RemoteServerError, \
         AuthorizationError, ConflictError, NotFoundError, RequestError
 
@@ -244,3 +245,61 @@ class TestHttpRequest():
 
             # delete the project
             h.delete(path)
+
+
+class TestConnectionPool():
+    """Test the connection pooling of the HttpRequest class."""
+
+    @pytest.fixture(autouse=True)
+    def auto_init(self):
+        self.hostname = 'http://127.0.0.1:8000'
+        self.url = '{}/api/2/projects/'.format(self.hostname)
+
+    @responses.activate
+    def test_session_is_reused(self):
+        responses.add(responses.GET, self.url, body='{}')
+        h = HttpRequest(self.hostname)
+        h.get('/api/2/projects/')
+        session = h._session
+        h.get('/api/2/projects/')
+        assert session is not None
+        assert h._session is session
+
+    def test_pool_configuration(self):
+        h = HttpRequest(self.hostname, pool_connections=2, pool_maxsize=30,
+                        pool_block=True)
+        adapter = h._get_session().get_adapter(self.url)
+        assert adapter._pool_connections == 2
+        assert adapter._pool_maxsize == 30
+        assert adapter._pool_block is True
+
+    def test_reset(self):
+        h = HttpRequest(self.hostname)
+        session = h._get_session()
+        h.reset()
+        assert h._session is None
+        assert h._get_session() is not session
+
+    def test_new_session_after_fork(self):
+        h = HttpRequest(self.hostname)
+        session = h._get_session()
+        with patch('txlib.http.http_requests.os.getpid', return_value=-1):
+            assert h._get_session() is not session
+
+    def test_new_lock_after_fork(self):
+        h = HttpRequest(self.hostname)
+        # Another thread held the lock when the process was forked
+        h._session_lock.acquire()
+        with patch('txlib.http.http_requests.os.getpid', return_value=-1):
+            h.reset()
+            assert h._get_session() is not None
+        assert not h._session_lock.locked()
+
+    def test_idle_connections_are_discarded(self):
+        h = HttpRequest(self.hostname, idle_timeout=10)
+        with patch('txlib.http.http_requests.time.time', return_value=100):
+            session = h._get_session()
+        with patch('txlib.http.http_requests.time.time', return_value=105):
+            assert h._get_session() is session
+        with patch('txlib.http.http_requests.time.time', return_value=120):
+            assert h._get_session() is not session
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for retry policies.
+"""
+import json
+import time
+from email.utils import formatdate
+
+import pytest
+import responses
+from requests.exceptions import ChunkedEncodingError, ContentDecodingError
+
+from txlib.http.exceptions import ConflictError, NoResponseError, \
+    RemoteServerError, TooManyRequestsError
+from txlib.http.http_requests import HttpRequest
+from txlib.http.retry import RetryPolicy
+from txlib.tests.compat import patch
+
+
+class TestRetryPolicy():
+    """Test the RetryPolicy class."""
+
+    def test_retryable_errors(self):
+        policy = RetryPolicy()
+        assert policy.is_retryable(RemoteServerError(http_code=503))
+        assert policy.is_retryable(TooManyRequestsError(http_code=429))
+        assert policy.is_retryable(NoResponseError())
+        assert not policy.is_retryable(ConflictError(http_code=409))
+
+    def test_max_attempts(self):
+        policy = RetryPolicy(max_attempts=3, jitter=False)
+        exc = RemoteServerError(http_code=503)
+        assert policy.get_delay('GET', exc, 1, 0) is not None
+        assert policy.get_delay('GET', exc, 2, 0) is not None
+        assert policy.get_delay('GET', exc, 3, 0) is None
+
+    def test_post_is_opt_in(self):
+        exc = RemoteServerError(http_code=503)
+        assert RetryPolicy().get_delay('POST', exc, 1, 0) is None
+        assert RetryPolicy(retry_post=True).get_delay(
+            'POST', exc, 1, 0
+        ) is not None
+
+    def test_exponential_backoff(self):
+        policy = RetryPolicy(max_attempts=10, backoff_factor=1,
+                             max_backoff=5, jitter=False)
+        exc = NoResponseError()
+        delays = [policy.get_delay('GET', exc, n, 0) for n in range(1, 6)]
+        assert delays == [1, 2, 4, 5, 5]
+
+    def test_jitter(self):
+        policy = RetryPolicy(max_attempts=10, backoff_factor=1)
+        for _ in range(100):
+            assert 0 <= policy.get_delay('GET', NoResponseError(), 3, 0) <= 4
+
+    def test_retry_after_seconds(self):
+        policy = RetryPolicy()
+        exc = TooManyRequestsError(http_code=429, headers={'Retry-After': '7'})
+        assert policy.get_delay('GET', exc, 1, 0) == 7
+
+        policy = RetryPolicy(respect_retry_after=False, jitter=False)
+        assert policy.get_delay('GET', exc, 1, 0) == 0.5
+
+    def test_retry_after_date(self):
+        policy = RetryPolicy()
+        date = formatdate(time.time() + 60, usegmt=True)
+        exc = TooManyRequestsError(http_code=429,
+                                   headers={'Retry-After': date})
+        assert 55 < policy.get_delay('GET', exc, 1, 0) <= 60
+
+    def test_total_timeout(self):
+        policy = RetryPolicy(max_attempts=10, backoff_factor=1,
+                             jitter=False, total_timeout=10)
+        exc = NoResponseError()
+        assert policy.get_delay('GET', exc, 1, 8) == 1
+        assert policy.get_delay('GET', exc, 2, 9) is None
+
+
+class TestHttpRequestRetries():
+    """Test the retries of the HttpRequest class."""
+
+    hostname = 'http://127.0.0.1:8000'
+    url = 'http://127.0.0.1:8000/api/2/projects/'
+
+    @responses.activate
+    @patch('txlib.http.http_requests.time.sleep')
+    def test_retries_until_success(self, mock_sleep):
+        responses.add(responses.GET, self.url, status=503)
+        responses.add(responses.GET, self.url, status=429,
+                      headers={'Retry-After': '3'})
+        responses.add(responses.GET, self.url, body='{"ok": true}')
+        h = HttpRequest(self.hostname, retry=RetryPolicy(jitter=False))
+        assert h.get('/api/2/projects/') == {'ok': True}
+        assert len(responses.calls) == 3
+        assert [c[0][0] for c in mock_sleep.call_args_list] == [0.5, 3]
+
+    @responses.activate
+    @patch('txlib.http.http_requests.time.sleep')
+    def test_gives_up(self, mock_sleep):
+        responses.add(responses.GET, self.url, status=503)
+        h = HttpRequest(self.hostname, retry=RetryPolicy(max_attempts=2))
+        with pytest.raises(RemoteServerError):
+            h.get('/api/2/projects/')
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    def test_no_retries_by_default(self):
+        responses.add(responses.GET, self.url, status=503)
+        h = HttpRequest(self.hostname)
+        with pytest.raises(RemoteServerError):
+            h.get('/api/2/projects/')
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    @patch('txlib.http.http_requests.time.sleep')
+    def test_post_not_retried(self, mock_sleep):
+        responses.add(responses.POST, self.url, status=503)
+        h = HttpRequest(self.hostname, retry=RetryPolicy())
+        with pytest.raises(RemoteServerError):
+            h.post('/api/2/projects/', json.dumps({}))
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    @patch('txlib.http.http_requests.time.sleep')
+    def test_file_is_resent(self, mock_sleep):
+        responses.add(responses.PUT, self.url, status=503)
+        responses.add(responses.PUT, self.url, body='{}')
+        h = HttpRequest(self.hostname, retry=RetryPolicy())
+        h.put('/api/2/projects/', {}, b'content')
+        assert b'content' in responses.calls[1].request.body
+
+    @patch('txlib.http.http_requests.time.sleep')
+    def test_connection_errors(self, mock_sleep):
+        h = HttpRequest('http://127.0.0.1:1', retry=RetryPolicy())
+        with pytest.raises(NoResponseError):
+            h.get('/api/2/projects/')
+        assert mock_sleep.call_count == 2
+
+    @responses.activate
+    @pytest.mark.parametrize('exception', [
+        ChunkedEncodingError, ContentDecodingError,
+    ])
+    @patch('txlib.http.http_requests.time.sleep')
+    def test_broken_bodies(self, mock_sleep, exception):
+        responses.add(responses.GET, self.url, body=exception('broken'))
+        responses.add(responses.GET, self.url, body='{"ok": true}')
+        h = HttpRequest(self.hostname, retry=RetryPolicy())
+        assert h.get('/api/2/projects/') == {'ok': True}
+        assert len(responses.calls) == 2
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the timeouts and deadlines of requests.
+"""
+import threading
+import time
+
+import pytest
+import requests
+
+from txlib.api.resources import Resource
+from txlib.api.tests import utils
+from txlib.http.coalesce import SingleFlight
+from txlib.http.exceptions import DeadlineExceededError, NoResponseError
+from txlib.http.http_requests import HttpRequest
+from txlib.http.retry import RetryPolicy
+from txlib.http.timeouts import Deadline
+from txlib.registry import registry
+from txlib.tests.compat import patch
+
+
+@pytest.fixture(autouse=True)
+def auto_clean_registry():
+    """Run the test and the remove the `http_handler` entry from
+    the registry."""
+    yield
+    utils.clean_registry()
+
+
+class TestDeadline():
+    """Test the Deadline class."""
+
+    def test_remaining(self):
+        deadline = Deadline(10)
+        assert 9 < deadline.remaining() <= 10
+        assert not deadline.expired()
+
+    def test_expired(self):
+        deadline = Deadline(-1)
+        assert deadline.remaining() == 0
+        assert deadline.expired()
+
+    def test_coerce(self):
+        deadline = Deadline(5)
+        assert Deadline.coerce(deadline) is deadline
+        assert Deadline.coerce(None) is None
+        assert 4 < Deadline.coerce(5).remaining() <= 5
+
+
+@patch('txlib.http.http_requests.requests.Session.request')
+class TestHttpRequestTimeouts():
+    """Test the timeouts of the requests of the HttpRequest class."""
+
+    hostname = 'http://127.0.0.1:8000'
+
+    def test_default_timeouts(self, mock_request):
+        mock_request.return_value = utils.TestResponse(200, b'{}')
+        HttpRequest(self.hostname).get('/api/2/projects/')
+        assert mock_request.call_args[1]['timeout'] == (10, 60)
+
+    def test_custom_timeouts(self, mock_request):
+        mock_request.return_value = utils.TestResponse(200, b'{}')
+        h = HttpRequest(self.hostname, connect_timeout=2, read_timeout=None)
+        h.get('/api/2/projects/')
+        assert mock_request.call_args[1]['timeout'] == (2, None)
+
+    def test_deadline_clips_the_timeouts(self, mock_request):
+        mock_request.return_value = utils.TestResponse(200, b'{}')
+        h = HttpRequest(self.hostname, connect_timeout=1)
+        h.get('/api/2/projects/', deadline=Deadline(5))
+        connect, read = mock_request.call_args[1]['timeout']
+        assert connect == 1
+        assert 4 < read <= 5
+
+    def test_expired_deadline(self, mock_request):
+        h = HttpRequest(self.hostname)
+        with pytest.raises(DeadlineExceededError):
+            h.get('/api/2/projects/', deadline=Deadline(-1))
+        assert not mock_request.called
+
+    def test_timeout_past_the_deadline(self, mock_request):
+        deadline = Deadline(1)
+
+        def request(*args, **kwargs):
+            deadline.expires = 0
+            raise requests.Timeout('timed out')
+        mock_request.side_effect = request
+        h = HttpRequest(self.hostname, retry=RetryPolicy())
+        with pytest.raises(DeadlineExceededError):
+            h.get('/api/2/projects/', deadline=deadline)
+        assert mock_request.call_count == 1
+
+    def test_timeout_before_the_deadline(self, mock_request):
+        mock_request.side_effect = requests.Timeout('timed out')
+        h = HttpRequest(self.hostname)
+        with pytest.raises(NoResponseError):
+            h.get('/api/2/projects/', deadline=Deadline(10))
+
+    @patch('txlib.http.http_requests.time.sleep')
+    def test_no_retries_past_the_deadline(self, mock_sleep, mock_request):
+        mock_request.return_value = utils.TestResponse(503, b'')
+        h = HttpRequest(self.hostname, retry=RetryPolicy(
+            max_attempts=5, backoff_factor=1, jitter=False
+        ))
+        with pytest.raises(Exception) as exc_info:
+            h.get('/api/2/projects/', deadline=Deadline(1.5))
+        assert getattr(exc_info.value, 'http_code', None) == 503
+        # Only the 1 second backoff fits in the deadline
+        assert [c[0][0] for c in mock_sleep.call_args_list] == [1]
+        assert mock_request.call_count == 2
+
+    def test_model_deadline(self, mock_request):
+        mock_request.return_value = utils.TestResponse(
+            200, b'{"content": "text"}'
+        )
+        registry.setup({'http_handler': HttpRequest(self.hostname)})
+        deadline = Deadline(5)
+        resource = Resource(project_slug='project', slug='resource')
+        assert resource.retrieve_content(deadline=deadline) == 'text'
+        connect, read = mock_request.call_args[1]['timeout']
+        assert 4 < read <= 5
+        assert resource._deadline is None
+
+    def test_model_get_deadline(self, mock_request):
+        mock_request.return_value = utils.TestResponse(200, b'{"id": 1}')
+        registry.setup({'http_handler': HttpRequest(self.hostname)})
+        with pytest.raises(DeadlineExceededError):
+            Resource.get(project_slug='project', slug='resource',
+                         deadline=-1)
+        resource = Resource.get(project_slug='project', slug='resource',
+                                deadline=5)
+        assert resource._populate_kwargs == {}
+        resource.refresh()
+        assert mock_request.call_args[1]['timeout'] == (10, 60)
+
+
+class TestCoalescedDeadline():
+    """Test the deadlines of the requests that wait for a request in
+    flight."""
+
+    def test_wait_timeout(self):
+        flight = SingleFlight()
+        released = threading.Event()
+        leader = threading.Thread(
+            target=flight.do, args=('key', released.wait, 5)
+        )
+        leader.start()
+        while not flight._calls:
+            time.sleep(0.01)
+        try:
+            with pytest.raises(DeadlineExceededError):
+                flight.do('key', lambda: None, timeout=0.05)
+        finally:
+            released.set()
+            leader.join()
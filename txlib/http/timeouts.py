@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Timeouts and deadlines of requests.
+
+Every request made by a handler has a connect and a read timeout, which
+can be set when the handler is created. In addition, a call can be given
+a `Deadline`, the latest time by which it has to complete, including all
+of its retries and waits:
+
+>>> Resource.get(project_slug='project', slug='resource', deadline=2.5)
+
+A deadline can also be shared by several calls that make up a single
+logical operation:
+
+>>> deadline = Deadline(5)
+>>> resource = Resource.get(project_slug='project', slug='resource',
+>>>                         deadline=deadline)
+>>> resource.retrieve_content(deadline=deadline)
+
+Calls that run out of time raise a `DeadlineExceededError`.
+"""
+
+import time
+
+
+# The default number of seconds to wait for a connection to the server
+DEFAULT_CONNECT_TIMEOUT = 10
+
+# The default number of seconds to wait for the server to send data
+DEFAULT_READ_TIMEOUT = 60
+
+
+class Deadline(object):
+    """The latest time by which a call has to complete."""
+
+    def __init__(self, timeout):
+        """Initializer.
+
+        Args:
+            `timeout`: The number of seconds from now until the deadline.
+        """
+        self.expires = time.time() + timeout
+
+    @classmethod
+    def coerce(cls, deadline):
+        """Return a `Deadline` for the given number of seconds; deadlines
+        and None are returned as is.
+        """
+        if deadline is None or isinstance(deadline, Deadline):
+            return deadline
+        return cls(deadline)
+
+    def remaining(self):
+        """Return the number of seconds left until the deadline."""
+        return max(0.0, self.expires - time.time())
+
+    def expired(self):
+        """Return whether the deadline has passed."""
+        return time.time() >= self.expires
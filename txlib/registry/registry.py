@@ -20,6 +20,15 @@ class _Registry(object):
             _logger.warning(msg)
         return res
 
+    def get(self, name, default=None):
+        """Return the given responsibility, or `default` if it has not
+        been set up.
+
+        Unlike attribute access, no warning is logged for missing
+        responsibilities, so this is meant for optional ones.
+        """
+        return self.responsibilities.get(name, default)
+
     def setup(self, responsibilities):
         """Initial setup of the responsibilities.
 
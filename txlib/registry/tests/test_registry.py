@@ -56,3 +56,10 @@ class TestRegistry():
 
         self.r.remove('three')
         assert len(self.r.responsibilities.keys()) == 0
+
+    def test_get_with_default(self):
+        """Test fetching an optional responsibility."""
+        self.r.setup({'one': 1})
+        assert self.r.get('one') == 1
+        assert self.r.get('two') is None
+        assert self.r.get('two', 2) == 2
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Import-time regression tests.
+
+They run `python -X importtime` in a subprocess and check which modules
+importing txlib pulls in, so that slow imports do not creep back in.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+import txlib
+
+
+pytestmark = pytest.mark.skipif(
+    sys.version_info < (3, 7), reason='-X importtime requires Python 3.7'
+)
+
+
+def import_times(statement):
+    """Run `statement` in a new interpreter and return the import times
+    of the modules it imported.
+
+    Returns:
+        A dictionary from the names of the modules to their cumulative
+        import times, in microseconds.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(txlib.__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    output = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stderr=subprocess.STDOUT, env=env, cwd=root,
+    ).decode('utf-8')
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def imported_modules(statement):
+    """Return the modules that `statement` imports, besides the ones
+    imported on startup."""
+    return set(import_times(statement)) - set(import_times('pass'))
+
+
+class TestImportTime():
+    """Test that importing txlib stays cheap."""
+
+    def test_package(self):
+        modules = imported_modules('import txlib')
+        assert 'txlib' in modules
+        assert 'txlib._version' not in modules
+        assert 'subprocess' not in modules
+
+    def test_models(self):
+        modules = imported_modules(
+            'import txlib.api.project, txlib.api.resources, '
+            'txlib.api.translations'
+        )
+        assert 'txlib.api.resources' in modules
+        assert 'requests' not in modules
+        assert 'txlib.http.http_requests' not in modules
+
+    def test_version(self):
+        assert txlib.__version__
+        with pytest.raises(AttributeError):
+            txlib.missing
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the utilities of txlib.
+"""
+import os
+import stat
+import subprocess
+import sys
+
+import pytest
+
+import txlib
+from txlib.utils import atomic_write
+
+
+def file_mode(path):
+    return stat.S_IMODE(os.stat(str(path)).st_mode)
+
+
+class TestAtomicWrite():
+    """Test the atomic_write() function."""
+
+    def test_write(self, tmpdir):
+        path = tmpdir.join('file')
+        with atomic_write(str(path)) as f:
+            f.write(b'content')
+        assert path.read_binary() == b'content'
+        assert tmpdir.listdir() == [path]
+
+    def test_new_file_mode(self, tmpdir, monkeypatch):
+        monkeypatch.setattr('txlib.utils._umask', None)
+        umask = os.umask(0o027)
+        try:
+            with atomic_write(str(tmpdir.join('file'))) as f:
+                f.write(b'content')
+        finally:
+            os.umask(umask)
+        assert file_mode(tmpdir.join('file')) == 0o640
+
+    def test_existing_file_keeps_its_mode(self, tmpdir):
+        path = tmpdir.join('file')
+        path.write_binary(b'old')
+        os.chmod(str(path), 0o600)
+        with atomic_write(str(path)) as f:
+            f.write(b'new')
+        assert path.read_binary() == b'new'
+        assert file_mode(path) == 0o600
+
+    def test_failure_keeps_existing_file(self, tmpdir):
+        path = tmpdir.join('file')
+        path.write_binary(b'old')
+        with pytest.raises(ValueError):
+            with atomic_write(str(path)) as f:
+                f.write(b'new')
+                raise ValueError()
+        assert path.read_binary() == b'old'
+        assert tmpdir.listdir() == [path]
+
+    def test_import_does_not_change_the_umask(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(
+            txlib.__file__
+        )))
+        statement = (
+            'import os\n'
+            'calls = []\n'
+            'umask = os.umask\n'
+            'os.umask = lambda mask: calls.append(mask) or umask(mask)\n'
+            'import txlib.utils\n'
+            'assert calls == [], calls\n'
+        )
+        subprocess.check_call([sys.executable, '-c', statement], cwd=root,
+                              env=dict(os.environ, PYTHONPATH=root))
@@ -5,4 +5,100 @@ Package for various utilities used by txlib.
 """
 
 import logging
+import os
+import re
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
 _logger = logging.getLogger('txlib')
+
+# The default size of the chunks of downloads, in bytes
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# The umask of the process, read on the first `atomic_write()`
+_umask = None
+_umask_lock = threading.Lock()
+
+
+def compile_path_pattern(pattern):
+    """Compile a path pattern to a regular expression.
+
+    The pattern matches any part of a URL that starts after a slash.
+    A `*` segment, as well as a `%(name)s` placeholder like the ones in the
+    URL templates of the models, matches exactly one path segment.
+    For example, `project/*/resource/*/translation/` matches the
+    translations of all resources.
+
+    Args:
+        `pattern`: The path pattern.
+    Returns:
+        The compiled regular expression; use `search()` to match it.
+    """
+    segments = []
+    for segment in pattern.strip('/').split('/'):
+        if segment == '*':
+            segments.append('[^/?]+')
+        else:
+            parts = re.split(r'%\([^)]*\)s', segment)
+            segments.append('[^/?]+'.join(re.escape(p) for p in parts))
+    regex = '/' + '/'.join(segments)
+    if pattern.endswith('/'):
+        regex += '/'
+    return re.compile(regex)
+
+
+@contextmanager
+def atomic_write(path, mode='wb'):
+    """Open a file for writing, so that it is replaced atomically.
+
+    The data are written to a temporary file in the same directory,
+    which replaces the file at `path` only if the block exits without
+    an exception. Readers never see a partially written file. An existing
+    file keeps its permissions.
+
+    Args:
+        `path`: The path of the file.
+        `mode`: The mode to open the temporary file with.
+    Yields:
+        The file object of the temporary file.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix='.%s.' % name, suffix='.part'
+    )
+    try:
+        with os.fdopen(fd, mode) as fileobj:
+            yield fileobj
+        os.chmod(tmp_path, _file_mode(path))
+        if hasattr(os, 'replace'):
+            os.replace(tmp_path, path)
+        else:  # pragma: no cover
+            os.rename(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _file_mode(path):
+    """Return the permissions for a file written at `path`.
+
+    An existing file keeps its permissions; a new one gets the ones a file
+    created with `open()` would get.
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666 & ~_get_umask()
+
+
+def _get_umask():
+    """Return the umask of the process, reading it only once."""
+    global _umask
+    with _umask_lock:
+        if _umask is None:
+            # The umask can only be read by changing it; a restrictive one
+            # keeps any file created by another thread meanwhile private
+            _umask = os.umask(0o077)
+            os.umask(_umask)
+        return _umask